@@ -1,12 +1,36 @@
 import datetime
 from datetime import date
-from typing import List
-
-import pandas as pd
+from typing import List, Optional
+
+from sqlalchemy import (
+    Float,
+    bindparam,
+    case,
+    cast,
+    delete,
+    func,
+    literal,
+    null,
+    select,
+    union_all,
+    update,
+)
 from sqlalchemy.orm import Session
 
+from app.services.constants import (
+    DONE_WEIGHT,
+    LIKE_WEIGHT,
+    RATING_SCORES,
+    RATING_WEIGHT,
+    SAVE_WEIGHT,
+    SENTIMENT_WEIGHT,
+)
+from app.services.lazy import lazy_import
+
 from . import models
 
+pd = lazy_import("pandas")
+
 
 # ATTRACTIONS TABLE
 def get_attraction_by_id(db: Session, attraction_id: str):
@@ -49,6 +73,7 @@ def get_saved_attraction(db: Session, user_id: int, attraction_id: str):
 def save_attraction(db: Session, user_id: int, attraction_id: str):
     new_record = models.Saved(user_id=user_id, attraction_id=attraction_id)
     db.add(new_record)
+    record_interaction_changes(db=db, user_ids=[user_id])
     db.commit()
     db.refresh(new_record)
 
@@ -63,6 +88,7 @@ def save_attraction(db: Session, user_id: int, attraction_id: str):
 
 
 def unsave_attraction(db: Session, attraction_to_unsave: models.Saved):
+    record_interaction_changes(db=db, user_ids=[attraction_to_unsave.user_id])
     db.delete(attraction_to_unsave)
     db.commit()
     db.flush()
@@ -121,6 +147,7 @@ def get_liked_attraction(db: Session, user_id: int, attraction_id: str):
 def like_attraction(db: Session, user_id: int, attraction_id: str):
     new_record = models.Likes(user_id=user_id, attraction_id=attraction_id)
     db.add(new_record)
+    record_interaction_changes(db=db, user_ids=[user_id])
     db.commit()
     db.refresh(new_record)
 
@@ -135,6 +162,7 @@ def like_attraction(db: Session, user_id: int, attraction_id: str):
 
 
 def unlike_attraction(db: Session, attraction_to_unlike: models.Likes):
+    record_interaction_changes(db=db, user_ids=[attraction_to_unlike.user_id])
     db.delete(attraction_to_unlike)
     db.commit()
     db.flush()
@@ -179,6 +207,7 @@ def get_done_attraction(db: Session, user_id: int, attraction_id: str):
 def mark_as_done_attraction(db: Session, user_id: int, attraction_id: str):
     new_record = models.Done(user_id=user_id, attraction_id=attraction_id)
     db.add(new_record)
+    record_interaction_changes(db=db, user_ids=[user_id])
     db.commit()
     db.refresh(new_record)
 
@@ -193,6 +222,9 @@ def mark_as_done_attraction(db: Session, user_id: int, attraction_id: str):
 
 
 def mark_as_undone_attraction(db: Session, attraction_to_mark_as_undone: models.Done):
+    record_interaction_changes(
+        db=db, user_ids=[attraction_to_mark_as_undone.user_id]
+    )
     db.delete(attraction_to_mark_as_undone)
     db.commit()
     db.flush()
@@ -259,6 +291,8 @@ def update_rating(db: Session, rating_to_update: models.Ratings, new_rating: flo
     db.refresh(attraction)
 
     rating_to_update.rating = new_rating
+    rating_to_update.rated_at = datetime.datetime.utcnow()
+    record_interaction_changes(db=db, user_ids=[rating_to_update.user_id])
     db.commit()
     db.refresh(rating_to_update)
 
@@ -270,6 +304,7 @@ def rate_attraction(db: Session, user_id: int, attraction_id: str, rating: float
         user_id=user_id, attraction_id=attraction_id, rating=rating
     )
     db.add(new_record)
+    record_interaction_changes(db=db, user_ids=[user_id])
     db.commit()
     db.refresh(new_record)
 
@@ -398,11 +433,112 @@ def number_of_interactions_of_user(db: Session, user_id: int, city=None):
     )
 
 
+def number_of_interactions_of_users(db: Session, user_ids: Optional[List[int]] = None):
+    interactions = union_all(
+        select(models.Ratings.user_id),
+        select(models.Likes.user_id),
+        select(models.Saved.user_id),
+        select(models.Done.user_id),
+        select(models.Comments.user_id),
+    ).subquery()
+
+    query = db.query(interactions.c.user_id, func.count()).group_by(
+        interactions.c.user_id
+    )
+
+    if user_ids is not None:
+        query = query.filter(interactions.c.user_id.in_(user_ids))
+
+    return {user_id: count for user_id, count in query.all()}
+
+
+# Calcula en la base el score de cada par (usuario, atracción) con interacciones
+# y devuelve solamente las tuplas (user_id, attraction_id, score). Con user_id se
+# calculan solo los de ese usuario y con city solo los de atracciones de la ciudad.
+def get_interaction_scores(
+    db: Session, user_id: Optional[int] = None, city: Optional[str] = None
+):
+    rating_score = case(
+        *[
+            (models.Ratings.rating == rating, score)
+            for rating, score in RATING_SCORES.items()
+        ],
+        else_=0,
+    )
+
+    interactions = union_all(
+        select(
+            models.Ratings.user_id,
+            models.Ratings.attraction_id,
+            cast(RATING_WEIGHT * rating_score, Float).label("score"),
+            cast(null(), Float).label("sentiment_metric"),
+        ),
+        select(
+            models.Likes.user_id,
+            models.Likes.attraction_id,
+            cast(literal(LIKE_WEIGHT), Float),
+            cast(null(), Float),
+        ),
+        select(
+            models.Saved.user_id,
+            models.Saved.attraction_id,
+            cast(literal(SAVE_WEIGHT), Float),
+            cast(null(), Float),
+        ),
+        select(
+            models.Done.user_id,
+            models.Done.attraction_id,
+            cast(literal(DONE_WEIGHT), Float),
+            cast(null(), Float),
+        ),
+        select(
+            models.Comments.user_id,
+            models.Comments.attraction_id,
+            cast(literal(0), Float),
+            models.Comments.sentiment_metric,
+        ),
+    ).subquery()
+
+    score = func.sum(interactions.c.score) + SENTIMENT_WEIGHT * func.coalesce(
+        func.avg(interactions.c.sentiment_metric), 0
+    )
+
+    query = db.query(
+        interactions.c.user_id,
+        interactions.c.attraction_id,
+        cast(score, Float).label("score"),
+    )
+
+    if user_id is not None:
+        query = query.filter(interactions.c.user_id == user_id)
+
+    if city is not None:
+        query = query.join(
+            models.Attractions,
+            models.Attractions.attraction_id == interactions.c.attraction_id,
+        ).filter(models.Attractions.city == city)
+
+    return query.group_by(interactions.c.user_id, interactions.c.attraction_id)
+
+
+# Devuelve los scores de get_interaction_scores en listas de a lo sumo chunk_size
+# filas, leyéndolos con un cursor del lado del servidor
+def stream_interaction_scores(db: Session, chunk_size: int):
+    return db.execute(
+        get_interaction_scores(db=db).statement,
+        execution_options={"yield_per": chunk_size},
+    ).partitions()
+
+
 # COMMENT
 
 
 def add_comment(
-    db: Session, user_id: int, attraction_id: str, comment: str, sentiment_metric: float
+    db: Session,
+    user_id: int,
+    attraction_id: str,
+    comment: str,
+    sentiment_metric: Optional[float] = None,
 ):
     new_record = models.Comments(
         user_id=user_id,
@@ -411,12 +547,80 @@ def add_comment(
         sentiment_metric=sentiment_metric,
     )
     db.add(new_record)
+    record_interaction_changes(db=db, user_ids=[user_id])
     db.commit()
     db.refresh(new_record)
 
     return new_record
 
 
+# Guarda el sentimiento de varios comentarios con un único UPDATE ejecutado para
+# todas las filas. Solo se actualizan los comentarios cuyo texto sigue siendo el
+# que se puntuó, para no pisar el de una edición posterior.
+def update_sentiment_metrics(db: Session, scored_comments: List[tuple]):
+    comments = models.Comments.__table__
+
+    db.execute(
+        update(comments)
+        .where(
+            comments.c.comment_id == bindparam("scored_comment_id"),
+            comments.c.comment == bindparam("scored_comment"),
+        )
+        .values(sentiment_metric=bindparam("scored_sentiment_metric")),
+        [
+            {
+                "scored_comment_id": comment_id,
+                "scored_comment": comment,
+                "scored_sentiment_metric": sentiment_metric,
+            }
+            for comment_id, comment, sentiment_metric in scored_comments
+        ],
+    )
+
+    # El sentimiento cambia el score de los autores de los comentarios
+    record_interaction_changes(
+        db=db,
+        user_ids=[
+            user_id
+            for (user_id,) in db.query(models.Comments.user_id).filter(
+                models.Comments.comment_id.in_(
+                    [comment_id for comment_id, _, _ in scored_comments]
+                )
+            )
+        ],
+    )
+    db.commit()
+
+
+# Devuelve los comentarios sin sentimiento calculado. Con created_before solo los
+# creados antes de ese momento.
+def get_unscored_comments(
+    db: Session, created_before: Optional[datetime.datetime] = None
+):
+    query = db.query(
+        models.Comments.comment_id,
+        models.Comments.user_id,
+        models.Comments.comment,
+    ).filter(models.Comments.sentiment_metric.is_(None))
+
+    if created_before is not None:
+        query = query.filter(models.Comments.created_at < created_before)
+
+    return query.all()
+
+
+# Devuelve hasta limit comentarios con comment_id mayor a after_comment_id,
+# ordenados por comment_id, para recorrer la tabla por tandas
+def get_comments_after(db: Session, after_comment_id: int, limit: int):
+    return (
+        db.query(models.Comments.comment_id, models.Comments.comment)
+        .filter(models.Comments.comment_id > after_comment_id)
+        .order_by(models.Comments.comment_id)
+        .limit(limit)
+        .all()
+    )
+
+
 def get_comment_by_id(db: Session, comment_id: int):
     return (
         db.query(models.Comments)
@@ -431,10 +635,11 @@ def update_comment(
     db: Session,
     comment_to_edit: models.Comments,
     updated_comment: str,
-    updated_sentiment_metric: float,
+    updated_sentiment_metric: Optional[float] = None,
 ):
     comment_to_edit.comment = updated_comment
     comment_to_edit.sentiment_metric = updated_sentiment_metric
+    record_interaction_changes(db=db, user_ids=[comment_to_edit.user_id])
 
     db.commit()
     db.refresh(comment_to_edit)
@@ -443,6 +648,7 @@ def update_comment(
 
 
 def delete_comment(db: Session, comment_to_delete: models.Comments):
+    record_interaction_changes(db=db, user_ids=[comment_to_delete.user_id])
     db.delete(comment_to_delete)
     db.commit()
     db.flush()
@@ -545,3 +751,84 @@ def get_user_scheduled_list(db: Session, user_id: int, page: int, size: int):
     return get_attractions_by_ids(
         db=db, attractions_ids=[x.attraction_id for x in scheduled_list]
     ), [x.day for x in scheduled_list]
+
+
+# RECOMMENDATION RUNS
+
+
+def get_last_recommendation_run(db: Session):
+    return (
+        db.query(models.RecommendationRuns)
+        .order_by(models.RecommendationRuns.started_at.desc())
+        .first()
+    )
+
+
+# Guarda la corrida y borra los cambios de interacciones anteriores a su inicio,
+# que ya no va a leer ninguna corrida incremental
+def add_recommendation_run(
+    db: Session,
+    started_at: datetime.datetime,
+    incremental: bool,
+    users_updated: int,
+):
+    new_record = models.RecommendationRuns(
+        started_at=started_at, incremental=incremental, users_updated=users_updated
+    )
+    db.add(new_record)
+    db.execute(
+        delete(models.InteractionChanges).where(
+            models.InteractionChanges.changed_at < started_at
+        )
+    )
+    db.commit()
+    db.refresh(new_record)
+
+    return new_record
+
+
+# Registra que cambiaron las interacciones de los usuarios. Se guarda en el mismo
+# commit que el cambio.
+def record_interaction_changes(db: Session, user_ids: List[int]):
+    db.add_all(
+        [models.InteractionChanges(user_id=user_id) for user_id in set(user_ids)]
+    )
+
+
+# Devuelve los usuarios que agregaron, borraron o editaron alguna interacción, o
+# a los que se les calculó el sentimiento de un comentario, desde since
+def get_users_with_interactions_since(db: Session, since: datetime.datetime):
+    return {
+        user_id
+        for (user_id,) in db.query(models.InteractionChanges.user_id)
+        .filter(models.InteractionChanges.changed_at >= since)
+        .distinct()
+    }
+
+
+# LOCKS
+
+
+# Intenta tomar el advisory lock de Postgres lock_id sin esperar. Queda tomado
+# mientras la conexión siga abierta, aunque termine su transacción.
+def try_advisory_lock(connection, lock_id: int) -> bool:
+    return bool(connection.execute(select(func.pg_try_advisory_lock(lock_id))).scalar())
+
+
+# TRANSLATIONS
+
+
+def get_translations(db: Session, text_hashes: List[str]):
+    translations = db.query(models.Translations).filter(
+        models.Translations.text_hash.in_(text_hashes)
+    )
+
+    return {
+        translation.text_hash: translation.translation for translation in translations
+    }
+
+
+def add_translations(db: Session, translations: dict):
+    for text_hash, translation in translations.items():
+        db.merge(models.Translations(text_hash=text_hash, translation=translation))
+    db.commit()
@@ -1,10 +1,15 @@
+import asyncio
+import functools
 import os
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
 
+from app.services.constants import DB_EXECUTOR_WORKERS
+
 db_user = urllib.parse.quote_plus(os.getenv("POSTGRES_USER"))
 db_password = urllib.parse.quote_plus(os.getenv("POSTGRES_PASSWORD"))
 db_name = urllib.parse.quote_plus(os.getenv("POSTGRES_DB"))
@@ -29,3 +34,16 @@ def get_db():
 
 def get_db_session() -> Session:
     return next(get_db())
+
+
+_db_executor = ThreadPoolExecutor(
+    max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db"
+)
+
+
+# Ejecuta una función que usa la base desde una ruta async, en un pool de hilos
+# acotado, para no bloquear el event loop mientras espera la consulta
+async def run_in_db_executor(function, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(
+        _db_executor, functools.partial(function, *args, **kwargs)
+    )
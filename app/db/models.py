@@ -1,6 +1,15 @@
 import datetime
 
-from sqlalchemy import CheckConstraint, Column, DateTime, Float, Index, Integer, String
+from sqlalchemy import (
+    Boolean,
+    CheckConstraint,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+)
 
 from .database import Base
 
@@ -81,3 +90,29 @@ class Scheduled(Base):
     attraction_id = Column(String)
     day = Column(DateTime)
     scheduled_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class RecommendationRuns(Base):
+    __tablename__ = "recommendation_runs"
+    run_id = Column(Integer, primary_key=True, autoincrement=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime, default=datetime.datetime.utcnow)
+    incremental = Column(Boolean, default=False)
+    users_updated = Column(Integer, default=0)
+
+
+# Cada alta, baja o edición de una interacción de un usuario, incluido el
+# sentimiento calculado para sus comentarios. Las corridas incrementales
+# recalculan a los usuarios con cambios desde el inicio de la última corrida.
+class InteractionChanges(Base):
+    __tablename__ = "interaction_changes"
+    change_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer)
+    changed_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+
+class Translations(Base):
+    __tablename__ = "translations"
+    text_hash = Column(String, primary_key=True)
+    translation = Column(String)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -1,3 +1,5 @@
+import importlib
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
@@ -5,6 +7,12 @@ from fastapi.responses import RedirectResponse
 from app.db import models
 from app.db.database import engine
 from app.routes.routes import router as attractions
+from app.services import comment_scoring, places
+from app.services.constants import WARM_UP_ON_STARTUP
+from app.services.lazy import lazy_import
+
+sentiment = lazy_import("app.services.sentiment")
+snapshot = lazy_import("app.services.snapshot")
 
 models.Base.metadata.create_all(bind=engine)
 
@@ -24,6 +32,38 @@ app.add_middleware(
 app.include_router(attractions)
 
 
+# Carga de antemano lo que el primer pedido de recomendaciones o comentarios
+# tendría que cargar: las librerías de esos servicios, el léxico de VADER y el
+# último snapshot del modelo de recomendación, si existe
+def warm_up():
+    importlib.import_module("app.services.recommendations")
+    sentiment.get_sentiment_service()
+    snapshot.load_snapshot()
+
+
+@app.on_event("startup")
+def warm_up_on_startup():
+    if WARM_UP_ON_STARTUP:
+        warm_up()
+
+
+# Busca periódicamente los comentarios que quedaron sin sentimiento calculado
+@app.on_event("startup")
+def start_unscored_comments_sweeper():
+    comment_scoring.start_sweeper()
+
+
+@app.on_event("shutdown")
+def stop_unscored_comments_sweeper():
+    comment_scoring.stop_sweeper()
+
+
+# Cierra las conexiones abiertas con la API de Places
+@app.on_event("shutdown")
+async def close_places_client():
+    await places.close_async_places_client()
+
+
 @app.get("/", include_in_schema=False)
 async def docs_redirect():
     return RedirectResponse(url="/docs")
@@ -1,19 +1,27 @@
 import datetime
 import json
-import os
 from typing import List, Optional
 
-import requests
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
 from requests import Session
 
 from app.db import crud, models
-from app.db.database import get_db
+from app.db.database import get_db, run_in_db_executor
 from app.routes import schemas
-from app.services import attractions_service, mappers, recommendations
+from app.services import mappers, places
 from app.services.constants import ATTRACTION_TYPES, MINIMUM_NUMBER_OF_INTERACTIONS
+from app.services.lazy import lazy_import
 from app.services.logger import Logger
 
+# Estos servicios cargan pandas, scikit-learn, boto3 o nltk, así que se importan
+# recién en el primer pedido que los usa
+attractions_service = lazy_import("app.services.attractions_service")
+comment_scoring = lazy_import("app.services.comment_scoring")
+events = lazy_import("app.services.events")
+jobs = lazy_import("app.services.jobs")
+recommendations = lazy_import("app.services.recommendations")
+sentiment = lazy_import("app.services.sentiment")
+
 router = APIRouter()
 
 
@@ -50,6 +58,45 @@ def get_attraction_and_add_it_if_not_cached(
     return attraction_db
 
 
+# Same as get_attraction_by_id_and_add_it_if_not_cached, for async routes.
+# The external API is called without blocking a thread and DB work runs
+# in the DB executor.
+async def get_attraction_by_id_and_add_it_if_not_cached_async(
+    db: Session, attraction_id: str
+):
+    attraction_db = await run_in_db_executor(
+        crud.get_attraction_by_id, db=db, attraction_id=attraction_id
+    )
+
+    if not attraction_db:
+        attraction = await attractions_service.get_attraction_by_id_async(
+            attraction_id=attraction_id
+        )
+        attraction_db = await run_in_db_executor(
+            crud.add_attraction, db=db, attraction_db=attraction
+        )
+
+    return attraction_db
+
+
+# Adds to DB the attractions that are not cached yet and returns them
+# sorted by rating.
+def add_attractions_if_not_cached(db: Session, attractions: List[models.Attractions]):
+    formatted_response = []
+
+    for attraction_db in attractions:
+
+        attraction_db = get_attraction_and_add_it_if_not_cached(
+            db=db, attraction=attraction_db
+        )
+
+        formatted_response.append(
+            mappers.map_to_attraction_schema(attraction_db=attraction_db)
+        )
+
+    return attractions_service.sort_attractions_by_rating(formatted_response)
+
+
 # ATTRACTIONS
 
 
@@ -69,7 +116,7 @@ def get_metadata():
     tags=["Get Attractions"],
     description="Gets an attraction given its ID. Can optionally send user ID to get additional information.",
 )
-def get_attraction(
+async def get_attraction(
     attraction_id: str = Path(
         ..., title="Attraction ID", description="The ID of the attraction to get"
     ),
@@ -77,17 +124,22 @@ def get_attraction(
     db=Depends(get_db),
 ):
 
-    attraction_db = get_attraction_by_id_and_add_it_if_not_cached(
+    attraction_db = await get_attraction_by_id_and_add_it_if_not_cached_async(
         db=db, attraction_id=attraction_id
     )
 
     if user_id != None:
-        return mappers.map_to_attraction_with_comments_by_user_schema(
-            db=db, attraction_db=attraction_db, user_id=user_id
+        return await run_in_db_executor(
+            mappers.map_to_attraction_with_comments_by_user_schema,
+            db=db,
+            attraction_db=attraction_db,
+            user_id=user_id,
         )
 
-    return mappers.map_to_attraction_schema_with_comments(
-        db=db, attraction_db=attraction_db
+    return await run_in_db_executor(
+        mappers.map_to_attraction_schema_with_comments,
+        db=db,
+        attraction_db=attraction_db,
     )
 
 
@@ -97,7 +149,7 @@ def get_attraction(
     tags=["Get Attractions"],
     description="Gets nearby attractions given a latitude, longitude and radius. Can optionally filter by a list of attraction types.",
 )
-def get_nearby_attractions(
+async def get_nearby_attractions(
     attractions_filter: Optional[
         schemas.AttractionsFilter
     ] = schemas.AttractionsFilter(),
@@ -112,26 +164,16 @@ def get_nearby_attractions(
     ),
     db=Depends(get_db),
 ):
-    attractions = attractions_service.get_nearby_attractions(
+    attractions = await attractions_service.get_nearby_attractions_async(
         latitude=latitude,
         longitude=longitude,
         radius=radius,
         attraction_types=attractions_filter.attraction_types,
     )
 
-    formatted_response = []
-
-    for attraction_db in attractions:
-
-        attraction_db = get_attraction_and_add_it_if_not_cached(
-            db=db, attraction=attraction_db
-        )
-
-        formatted_response.append(
-            mappers.map_to_attraction_schema(attraction_db=attraction_db)
-        )
-
-    return attractions_service.sort_attractions_by_rating(formatted_response)
+    return await run_in_db_executor(
+        add_attractions_if_not_cached, db=db, attractions=attractions
+    )
 
 
 @router.post(
@@ -140,30 +182,20 @@ def get_nearby_attractions(
     tags=["Get Attractions"],
     description="Searches attractions given a text query. Can optionally filter by a certain attraction type.",
 )
-def search_attractions(
+async def search_attractions(
     data: schemas.SearchAttractionsByText,
     type: Optional[str] = None,
     latitude: Optional[float] = None,
     longitude: Optional[float] = None,
     db=Depends(get_db),
 ):
-    attractions = attractions_service.search_attractions(
+    attractions = await attractions_service.search_attractions_async(
         query=data.query, type=type, latitude=latitude, longitude=longitude
     )
 
-    formatted_response = []
-
-    for attraction_db in attractions:
-
-        attraction_db = get_attraction_and_add_it_if_not_cached(
-            db=db, attraction=attraction_db
-        )
-
-        formatted_response.append(
-            mappers.map_to_attraction_schema(attraction_db=attraction_db)
-        )
-
-    return attractions_service.sort_attractions_by_rating(formatted_response)
+    return await run_in_db_executor(
+        add_attractions_if_not_cached, db=db, attractions=attractions
+    )
 
 
 @router.get(
@@ -171,16 +203,10 @@ def search_attractions(
     status_code=200,
     tags=["Get attractions location"],
 )
-def get_attraction_location(text: str):
-    url = "https://places.googleapis.com/v1/places:searchText"
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": os.getenv("ATTRACTIONS_API_KEY"),
-        "X-Goog-FieldMask": "places.location",
-    }
-
-    response = requests.post(url, json={"textQuery": text}, headers=headers)
+async def get_attraction_location(text: str):
+    response = await places.get_async_places_client().post(
+        "places:searchText", field_mask="places.location", json={"textQuery": text}
+    )
 
     if response.status_code != 200:
         raise HTTPException(
@@ -194,6 +220,19 @@ def get_attraction_location(text: str):
     return response.json()
 
 
+@router.get(
+    "/attractions/places-client",
+    status_code=200,
+    tags=["Get attractions location"],
+    description="Returns the requests, retries, failures and connection usage of the sync and async Places API clients",
+)
+async def get_places_client_stats():
+    return {
+        "sync": places.get_places_client().stats(),
+        "async": places.get_async_places_client().stats(),
+    }
+
+
 @router.get(
     "/attractions/recommendations/{user_id}",
     status_code=200,
@@ -227,10 +266,35 @@ def get_feed(
     "/attractions/run-recommendation-system",
     status_code=201,
     tags=["Recommendations"],
-    description="Runs the recommendation system",
+    description="Starts a run of the recommendation system in the background and returns its job. If a run is already in progress, returns that run instead of starting another one. If incremental is true, only recomputes the users affected by interactions made since the last run.",
 )
-def run_recommendation_system(db=Depends(get_db)):
-    recommendations.run_recommendation_system(db=db)
+def run_recommendation_system(
+    incremental: bool = Query(
+        False, description="Only recompute users affected since the last run"
+    ),
+):
+    return jobs.submit_recommendation_job(incremental=incremental).to_dict()
+
+
+@router.get(
+    "/attractions/run-recommendation-system/{job_id}",
+    status_code=200,
+    tags=["Recommendations"],
+    description="Gets the status of a recommendation system run: phase, users scored, elapsed time and peak memory",
+)
+def get_recommendation_system_run(
+    job_id: str = Path(..., title="Job ID", description="The ID of the run"),
+):
+    job = jobs.get_recommendation_job(job_id=job_id)
+
+    if not job:
+        Logger().err("Recommendation job not found")
+        raise HTTPException(
+            status_code=404,
+            detail={"status": "error", "message": "Recommendation job not found"},
+        )
+
+    return job.to_dict()
 
 
 @router.put(
@@ -367,10 +431,14 @@ def save_attraction(data: schemas.SaveAttraction, db=Depends(get_db)):
             status_code=404,
             detail={"status": "error", "message": "Attraction already saved by user"},
         )
-    return crud.save_attraction(
+    saved = crud.save_attraction(
         db=db, user_id=data.user_id, attraction_id=data.attraction_id
     )
 
+    events.publish_interaction(user_id=data.user_id)
+
+    return saved
+
 
 @router.delete(
     "/attractions/unsave",
@@ -393,6 +461,8 @@ def unsave_attraction(data: schemas.SaveAttraction, db=Depends(get_db)):
         )
     crud.unsave_attraction(db=db, attraction_to_unsave=saved_attraction)
 
+    events.publish_interaction(user_id=data.user_id)
+
 
 @router.get(
     "/attractions/save-list",
@@ -441,10 +511,14 @@ def like_attraction(data: schemas.LikeAttraction, db=Depends(get_db)):
             status_code=404,
             detail={"status": "error", "message": "Attraction already liked by user"},
         )
-    return crud.like_attraction(
+    liked = crud.like_attraction(
         db=db, user_id=data.user_id, attraction_id=data.attraction_id
     )
 
+    events.publish_interaction(user_id=data.user_id)
+
+    return liked
+
 
 @router.delete(
     "/attractions/unlike",
@@ -467,6 +541,8 @@ def unlike_attraction(data: schemas.LikeAttraction, db=Depends(get_db)):
         )
     crud.unlike_attraction(db=db, attraction_to_unlike=liked_attraction)
 
+    events.publish_interaction(user_id=data.user_id)
+
 
 # DONE
 
@@ -493,10 +569,14 @@ def mark_as_done_attraction(data: schemas.MarkAsDoneAttraction, db=Depends(get_d
                 "message": "Attraction already marked as done by user",
             },
         )
-    return crud.mark_as_done_attraction(
+    done = crud.mark_as_done_attraction(
         db=db, user_id=data.user_id, attraction_id=data.attraction_id
     )
 
+    events.publish_interaction(user_id=data.user_id)
+
+    return done
+
 
 @router.delete(
     "/attractions/undone",
@@ -519,6 +599,8 @@ def mark_as_undone_attraction(data: schemas.MarkAsDoneAttraction, db=Depends(get
         )
     crud.mark_as_undone_attraction(db=db, attraction_to_mark_as_undone=done_attraction)
 
+    events.publish_interaction(user_id=data.user_id)
+
 
 @router.get(
     "/attractions/done-list",
@@ -574,14 +656,20 @@ def rate_attraction(data: schemas.AddRating, db=Depends(get_db)):
     )
 
     if not rating:
-        return crud.rate_attraction(
+        rating = crud.rate_attraction(
             db=db,
             user_id=data.user_id,
             attraction_id=data.attraction_id,
             rating=data.rating,
         )
+    else:
+        rating = crud.update_rating(
+            db=db, rating_to_update=rating, new_rating=data.rating
+        )
+
+    events.publish_interaction(user_id=data.user_id)
 
-    return crud.update_rating(db=db, rating_to_update=rating, new_rating=data.rating)
+    return rating
 
 
 # COMMENT
@@ -598,16 +686,21 @@ def comment_attraction(data: schemas.AddComment, db=Depends(get_db)):
         db=db, attraction_id=data.attraction_id
     )
 
-    sentiment_metric = recommendations.get_sentiment_metric(data.comment)
-
-    return crud.add_comment(
+    # El sentimiento se calcula después, en segundo plano
+    comment = crud.add_comment(
         db=db,
         user_id=data.user_id,
         attraction_id=data.attraction_id,
         comment=data.comment,
-        sentiment_metric=sentiment_metric,
     )
 
+    comment_scoring.enqueue_comment(
+        comment_id=comment.comment_id, user_id=comment.user_id, comment=comment.comment
+    )
+    events.publish_interaction(user_id=data.user_id)
+
+    return comment
+
 
 @router.delete(
     "/attractions/comment",
@@ -625,6 +718,8 @@ def delete_comment(data: schemas.DeleteComment, db=Depends(get_db)):
         )
     crud.delete_comment(db=db, comment_to_delete=comment)
 
+    events.publish_interaction(user_id=comment.user_id)
+
 
 @router.put(
     "/attractions/comment",
@@ -644,15 +739,31 @@ def update_comment(
             status_code=404, detail={"status": "error", "message": "Comment not found"}
         )
 
-    sentiment_metric = recommendations.get_sentiment_metric(data.new_comment)
-
-    return crud.update_comment(
+    # El sentimiento se calcula después, en segundo plano
+    comment = crud.update_comment(
         db=db,
         comment_to_edit=comment,
         updated_comment=data.new_comment,
-        updated_sentiment_metric=sentiment_metric,
     )
 
+    comment_scoring.enqueue_comment(
+        comment_id=comment.comment_id, user_id=comment.user_id, comment=comment.comment
+    )
+
+    events.publish_interaction(user_id=comment.user_id)
+
+    return comment
+
+
+@router.get(
+    "/attractions/comment/translation-cache",
+    status_code=200,
+    tags=["Comment Attraction"],
+    description="Returns the hits and misses of the cache of comment translations used for sentiment analysis, and how many comments skipped translation because they were already in English",
+)
+def get_translation_cache_stats():
+    return sentiment.get_sentiment_service().stats()
+
 
 # SCHEDULE
 
@@ -1,13 +1,18 @@
 import os
 
-import boto3
-import requests
 from fastapi import HTTPException
 
+from app.services import places
+from app.services.lazy import lazy_import
 from app.services.logger import Logger
 
 from . import mappers
 
+boto3 = lazy_import("boto3")
+
+PLACE_FIELD_MASK = "displayName,id,addressComponents,photos,location,types,rating,formattedAddress,googleMapsUri,editorialSummary"
+PLACES_FIELD_MASK = ",".join(f"places.{field}" for field in PLACE_FIELD_MASK.split(","))
+
 
 def sort_attractions_by_rating(attractions):
     return sorted(
@@ -17,17 +22,7 @@ def sort_attractions_by_rating(attractions):
     )
 
 
-def get_attraction_by_id(attraction_id: str) -> dict:
-    url = f"https://places.googleapis.com/v1/places/{attraction_id}"
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": os.getenv("ATTRACTIONS_API_KEY"),
-        "X-Goog-FieldMask": "displayName,id,addressComponents,photos,location,types,rating,formattedAddress,googleMapsUri,editorialSummary",
-    }
-
-    response = requests.get(url, headers=headers)
-
+def check_places_response(response):
     if response.status_code != 200:
         raise HTTPException(
             status_code=404,
@@ -37,21 +32,25 @@ def get_attraction_by_id(attraction_id: str) -> dict:
             },
         )
 
-    return mappers.map_to_attraction_db(attraction=response.json())
 
+def map_places_response(response):
+    check_places_response(response)
 
-def get_nearby_attractions(
-    latitude: float, longitude: float, radius: float, attraction_types
-):
-    url = "https://places.googleapis.com/v1/places:searchNearby"
+    formatted_attractions = []
+
+    if "places" in response.json().keys():
+        for attraction in response.json()["places"]:
+            formatted_attractions.append(
+                mappers.map_to_attraction_db(attraction=attraction)
+            )
+
+    return formatted_attractions
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": os.getenv("ATTRACTIONS_API_KEY"),
-        "X-Goog-FieldMask": "places.displayName,places.id,places.addressComponents,places.photos,places.location,places.types,places.rating,places.formattedAddress,places.googleMapsUri,places.editorialSummary",
-    }
 
-    data = {
+def nearby_attractions_request(
+    latitude: float, longitude: float, radius: float, attraction_types
+) -> dict:
+    return {
         "includedTypes": attraction_types,
         "maxResultCount": 20,
         "locationRestriction": {
@@ -62,76 +61,96 @@ def get_nearby_attractions(
         },
     }
 
-    response = requests.post(url, json=data, headers=headers)
 
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status": "error",
-                "message": f"External API error: {response.status_code}",
+def search_attractions_request(query: str, type=None, latitude=None, longitude=None):
+    if latitude and longitude:
+        return {
+            "textQuery": query,
+            "includedType": type,
+            "locationBias": {
+                "circle": {
+                    "center": {"latitude": latitude, "longitude": longitude},
+                    "radius": 500.0,
+                }
             },
-        )
+            "rankPreference": "RELEVANCE",
+        }
 
-    formatted_attractions = []
+    return {"textQuery": query, "includedType": type}
 
-    if "places" in response.json().keys():
-        for attraction in response.json()["places"]:
-            formatted_attractions.append(
-                mappers.map_to_attraction_db(attraction=attraction)
-            )
 
-    return formatted_attractions
+def get_attraction_by_id(attraction_id: str) -> dict:
+    response = places.get_places_client().get(
+        f"places/{attraction_id}", field_mask=PLACE_FIELD_MASK
+    )
+
+    check_places_response(response)
+
+    return mappers.map_to_attraction_db(attraction=response.json())
+
+
+def get_nearby_attractions(
+    latitude: float, longitude: float, radius: float, attraction_types
+):
+    response = places.get_places_client().post(
+        "places:searchNearby",
+        field_mask=PLACES_FIELD_MASK,
+        json=nearby_attractions_request(
+            latitude, longitude, radius, attraction_types
+        ),
+    )
+
+    return map_places_response(response)
 
 
 def search_attractions(query: str, type=None, latitude=None, longitude=None):
-    url = "https://places.googleapis.com/v1/places:searchText"
+    response = places.get_places_client().post(
+        "places:searchText",
+        field_mask=PLACES_FIELD_MASK,
+        json=search_attractions_request(query, type, latitude, longitude),
+    )
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": os.getenv("ATTRACTIONS_API_KEY"),
-        "X-Goog-FieldMask": "places.displayName,places.id,places.addressComponents,places.photos,places.location,places.types,places.rating,places.formattedAddress,places.googleMapsUri,places.editorialSummary",
-    }
+    return map_places_response(response)
 
-    if latitude and longitude:
-        response = requests.post(
-            url,
-            json={
-                "textQuery": query,
-                "includedType": type,
-                "locationBias": {
-                    "circle": {
-                        "center": {"latitude": latitude, "longitude": longitude},
-                        "radius": 500.0,
-                    }
-                },
-                "rankPreference": "RELEVANCE",
-            },
-            headers=headers,
-        )
-    else:
-        response = requests.post(
-            url, json={"textQuery": query, "includedType": type}, headers=headers
-        )
 
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status": "error",
-                "message": f"External API error: {response.status_code}",
-            },
-        )
+# Versiones asíncronas de las funciones anteriores, para las rutas async. Usan el
+# cliente asíncrono de la API de Places, así la espera no ocupa un hilo.
 
-    formatted_attractions = []
 
-    if "places" in response.json().keys():
-        for attraction in response.json()["places"]:
-            formatted_attractions.append(
-                mappers.map_to_attraction_db(attraction=attraction)
-            )
+async def get_attraction_by_id_async(attraction_id: str) -> dict:
+    response = await places.get_async_places_client().get(
+        f"places/{attraction_id}", field_mask=PLACE_FIELD_MASK
+    )
 
-    return formatted_attractions
+    check_places_response(response)
+
+    return mappers.map_to_attraction_db(attraction=response.json())
+
+
+async def get_nearby_attractions_async(
+    latitude: float, longitude: float, radius: float, attraction_types
+):
+    response = await places.get_async_places_client().post(
+        "places:searchNearby",
+        field_mask=PLACES_FIELD_MASK,
+        json=nearby_attractions_request(
+            latitude, longitude, radius, attraction_types
+        ),
+    )
+
+    return map_places_response(response)
+
+
+async def search_attractions_async(
+    query: str, type=None, latitude=None, longitude=None
+):
+    response = await places.get_async_places_client().post(
+        "places:searchText",
+        field_mask=PLACES_FIELD_MASK,
+        json=search_attractions_request(query, type, latitude, longitude),
+    )
+
+    return map_places_response(response)
 
 
 def get_feed(user_id: int, page: int, size: int):
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from app.services.constants import CITY_MODEL_TTL
+from app.services.logger import Logger
+
+# Cantidad de ciudades cuyo modelo se mantiene en memoria
+MAX_CITY_MODELS = 32
+
+_lock = threading.Lock()
+_models = OrderedDict()
+_build_locks = defaultdict(threading.Lock)
+
+
+# Matriz usuarios-atracciones de una ciudad. Guarda además la norma de cada fila
+# para que la similitud coseno de un usuario con el resto sea un único producto.
+class CityModel:
+    def __init__(self, matrix, user_ids, attraction_ids, watermark=None):
+        self.matrix = matrix.tocsr()
+        self.row_norms = np.sqrt(
+            np.asarray(self.matrix.multiply(self.matrix).sum(axis=1)).ravel()
+        )
+        self.user_ids = np.asarray(user_ids)
+        self.attraction_ids = np.asarray(attraction_ids)
+        self.watermark = watermark
+        self.built_at = time.monotonic()
+        self._attraction_index = pd.Index(self.attraction_ids)
+
+    # Devuelve la fila del usuario o None si no está en el modelo. Los user_ids
+    # están ordenados.
+    def user_position(self, user_id: int):
+        position = int(np.searchsorted(self.user_ids, user_id))
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return position
+        return None
+
+    # Devuelve la columna de cada atracción o None si no está en el modelo
+    def attraction_positions(self, attraction_ids):
+        positions = self._attraction_index.get_indexer(list(attraction_ids))
+        return [int(position) if position >= 0 else None for position in positions]
+
+    # Un modelo construido desde la base (sin watermark) está al menos tan al día
+    # como cualquier snapshot, así que solo vence por CITY_MODEL_TTL
+    def is_fresh(self, watermark) -> bool:
+        return (
+            self.watermark in (None, watermark)
+            and time.monotonic() - self.built_at <= CITY_MODEL_TTL
+        )
+
+
+# Devuelve el modelo de la ciudad, construyéndolo con build() si no está en
+# memoria, si tiene más de CITY_MODEL_TTL segundos o si se construyó con otro
+# watermark
+def get_city_model(city: str, build, watermark=None) -> CityModel:
+    model = _get_fresh(city, watermark)
+    if model is not None:
+        return model
+
+    with _lock:
+        build_lock = _build_locks[city]
+
+    # Un solo pedido construye el modelo de cada ciudad, el resto lo espera
+    with build_lock:
+        cached = _get_fresh(city, watermark)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        model = build()
+        model.watermark = watermark
+
+        Logger().info(
+            msg=f"Built model of {city} with {model.matrix.shape[0]} users and {model.matrix.shape[1]} attractions in {time.perf_counter() - start:.2f}s"
+        )
+
+        with _lock:
+            _models[city] = model
+            _models.move_to_end(city)
+            while len(_models) > MAX_CITY_MODELS:
+                _models.popitem(last=False)
+
+        return model
+
+
+def _get_fresh(city: str, watermark):
+    with _lock:
+        model = _models.get(city)
+        if model is None or not model.is_fresh(watermark):
+            return None
+        _models.move_to_end(city)
+        return model
+
+
+def clear_city_models():
+    with _lock:
+        _models.clear()
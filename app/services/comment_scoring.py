@@ -0,0 +1,260 @@
+import datetime
+import queue
+import threading
+import time
+from typing import Callable, List
+
+from app.db import crud
+from app.db.database import engine, get_db_session
+from app.services import events
+from app.services.constants import (
+    SENTIMENT_BATCH_SIZE,
+    SENTIMENT_BATCH_WAIT,
+    SENTIMENT_MAX_RETRIES,
+    SENTIMENT_RETRY_BACKOFF,
+    SENTIMENT_SWEEP_INTERVAL,
+)
+from app.services.lazy import lazy_import
+from app.services.logger import Logger
+
+sentiment = lazy_import("app.services.sentiment")
+
+# Advisory lock de Postgres que toma el único proceso que busca los comentarios
+# sin sentimiento
+SWEEP_LOCK_ID = 720_431
+
+
+def _score_with_sentiment_service(texts: List[str]) -> List[float]:
+    return sentiment.get_sentiment_service().score_batch(texts)
+
+
+# Calcula en un hilo aparte el sentimiento de los comentarios que se guardaron
+# sin él. Junta hasta batch_size comentarios, esperando a lo sumo batch_wait
+# segundos a que lleguen más, los puntúa juntos y los guarda con un único UPDATE.
+# Si una tanda falla se vuelve a encolar hasta max_retries veces.
+class CommentScorer:
+    def __init__(
+        self,
+        score_batch: Callable[[List[str]], List[float]] = _score_with_sentiment_service,
+        batch_size: int = SENTIMENT_BATCH_SIZE,
+        batch_wait: float = SENTIMENT_BATCH_WAIT,
+        max_retries: int = SENTIMENT_MAX_RETRIES,
+        retry_backoff: float = SENTIMENT_RETRY_BACKOFF,
+    ):
+        self.score_batch = score_batch
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.scored = 0
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # Encola un comentario, salvo que ya esté encolado o reintentándose
+    def enqueue(self, comment_id: int, user_id: int, comment: str):
+        with self._lock:
+            if comment_id in self._pending:
+                return
+            self._pending.add(comment_id)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._consume, daemon=True)
+                self._thread.start()
+
+        self._queue.put((comment_id, user_id, comment, 0))
+
+    # Espera a que se puntúen todos los comentarios encolados
+    def flush(self):
+        self._queue.join()
+
+    def _consume(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(
+                        self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                    )
+                except queue.Empty:
+                    break
+
+            finished = batch
+            try:
+                self._score(batch)
+            except Exception as error:
+                finished = self._retry(batch, error)
+            finally:
+                with self._lock:
+                    self._pending.difference_update(
+                        comment_id for comment_id, *_ in finished
+                    )
+                # Los reintentos se encolan antes de marcar la tanda como
+                # terminada, así flush también los espera
+                for _ in batch:
+                    self._queue.task_done()
+
+    # Espera retry_backoff * 2^intento segundos y vuelve a encolar los comentarios
+    # de la tanda que todavía tienen reintentos. Devuelve los que se descartan, que
+    # quedan sin sentimiento hasta que los encuentre el barrido periódico.
+    def _retry(self, batch, error):
+        retries = [
+            (comment_id, user_id, comment, attempt + 1)
+            for comment_id, user_id, comment, attempt in batch
+            if attempt < self.max_retries
+        ]
+        Logger().err(
+            f"Could not score {len(batch)} comments, retrying {len(retries)}: {error}"
+        )
+
+        if retries:
+            time.sleep(self.retry_backoff * 2 ** max(item[3] for item in batch))
+            for item in retries:
+                self._queue.put(item)
+
+        return [item for item in batch if item[3] >= self.max_retries]
+
+    def _score(self, batch):
+        start = time.perf_counter()
+        metrics = self.score_batch([comment for _, _, comment, _ in batch])
+
+        db = get_db_session()
+        try:
+            crud.update_sentiment_metrics(
+                db=db,
+                scored_comments=[
+                    (comment_id, comment, metric)
+                    for (comment_id, _, comment, _), metric in zip(batch, metrics)
+                ],
+            )
+        finally:
+            db.close()
+
+        self.scored += len(batch)
+
+        Logger().debug(
+            msg=f"Scored {len(batch)} comments in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+
+        # El sentimiento cambia el score de cada usuario con esas atracciones
+        for user_id in {user_id for _, user_id, _, _ in batch}:
+            events.publish_interaction(user_id=user_id)
+
+
+_scorer = CommentScorer()
+
+
+def enqueue_comment(comment_id: int, user_id: int, comment: str):
+    _scorer.enqueue(comment_id=comment_id, user_id=user_id, comment=comment)
+
+
+def flush():
+    _scorer.flush()
+
+
+# Encola los comentarios que quedaron sin sentimiento, por ejemplo porque el
+# proceso se reinició antes de puntuarlos o se agotaron sus reintentos
+def enqueue_unscored_comments(created_before: datetime.datetime = None):
+    db = get_db_session()
+    try:
+        comments = crud.get_unscored_comments(db=db, created_before=created_before)
+    finally:
+        db.close()
+
+    for comment_id, user_id, comment in comments:
+        enqueue_comment(comment_id=comment_id, user_id=user_id, comment=comment)
+
+    return len(comments)
+
+
+# Cada interval segundos encola los comentarios sin sentimiento creados antes de
+# ese intervalo. Con varios workers de la API solo barre el que tiene el advisory
+# lock SWEEP_LOCK_ID, que se mantiene tomado en una conexión propia; los demás
+# vuelven a intentar tomarlo en cada intervalo, por si el que lo tenía terminó.
+class UnscoredCommentsSweeper:
+    def __init__(
+        self,
+        interval: float = SENTIMENT_SWEEP_INTERVAL,
+        connect: Callable = engine.connect,
+    ):
+        self.interval = interval
+        self.connect = connect
+        self._connection = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._release()
+
+    def sweep(self):
+        if not self._hold_lock():
+            return 0
+
+        return enqueue_unscored_comments(
+            created_before=datetime.datetime.utcnow()
+            - datetime.timedelta(seconds=self.interval)
+        )
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as error:
+                Logger().err(f"Could not sweep unscored comments: {error}")
+
+            if self._stopped.wait(self.interval):
+                break
+
+    # Devuelve si este proceso tiene el lock. Si la conexión que lo tenía se
+    # cortó, el lock se liberó y se vuelve a intentar tomarlo.
+    def _hold_lock(self):
+        if self._connection is not None:
+            try:
+                self._connection.exec_driver_sql("SELECT 1")
+                self._connection.commit()
+                return True
+            except Exception:
+                self._release()
+
+        connection = self.connect()
+        try:
+            if crud.try_advisory_lock(connection, SWEEP_LOCK_ID):
+                connection.commit()
+                self._connection = connection
+                return True
+        except Exception:
+            connection.close()
+            raise
+
+        connection.close()
+        return False
+
+    def _release(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+
+_sweeper = UnscoredCommentsSweeper()
+
+
+def start_sweeper():
+    _sweeper.start()
+
+
+def stop_sweeper():
+    _sweeper.stop()
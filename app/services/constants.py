@@ -1,11 +1,179 @@
+import os
+import tempfile
+
 # Cantidad de interacciones mínimas para usar el algoritmo
 MINIMUM_NUMBER_OF_INTERACTIONS = 5
 
+# Pesos de cada tipo de interacción en el score de un usuario sobre una atracción
+LIKE_WEIGHT = 100
+SAVE_WEIGHT = 50
+DONE_WEIGHT = 20
+RATING_WEIGHT = 200
+SENTIMENT_WEIGHT = 50
+
+# Score asociado a cada rating (de 1 a 5 estrellas)
+RATING_SCORES = {1: -1, 2: -0.5, 3: 0.1, 4: 0.5, 5: 1}
+
+# Forma de cargar los scores de las interacciones: "sql" los calcula en Postgres,
+# "pandas" carga cada tabla y los calcula con merges de pandas
+INTERACTIONS_LOADER = os.getenv("INTERACTIONS_LOADER") or "sql"
+
+# Cantidad de filas que se leen de la base por vez al cargar los scores
+INTERACTIONS_CHUNK_SIZE = 50000
+
 # Cantidad de atracciones que se quieren recomendar
 N_RECOMMENDATIONS = 30
 
-# Valor para rellenar a los nulos en el algortimo de recomendación
-FILLNA_VALUE = 0
+# Cantidad de usuarios más similares que contribuyen a los scores de cada usuario.
+# Sin configurar contribuyen todos los usuarios con similitud distinta de cero
+N_SIMILAR_USERS = int(os.getenv("N_SIMILAR_USERS") or 0) or None
+
+# Memoria en MB que pueden ocupar los bloques de similitudes y scores que se
+# calculan juntos. Define cuántos usuarios se procesan en cada bloque.
+RECOMMENDATIONS_MEMORY_BUDGET_MB = int(
+    os.getenv("RECOMMENDATIONS_MEMORY_BUDGET_MB") or 256
+)
+
+# Algoritmo para calcular la similitud entre usuarios: "blockwise" (coseno exacto
+# calculado por bloques de usuarios a medida que se necesitan), "exact" (matriz
+# de coseno exacto completa) o "lsh" (coseno aproximado con LSH de hiperplanos
+# aleatorios)
+SIMILARITY_BACKEND = os.getenv("SIMILARITY_BACKEND") or "blockwise"
+
+# Cantidad de tablas del índice LSH y cantidad promedio de usuarios por grupo de
+# cada tabla, que define cuántos hiperplanos se usan. Los grupos con más de
+# LSH_MAX_BUCKET_SIZE usuarios se parten. De cada usuario se guardan sus
+# LSH_NEIGHBOURS usuarios más similares entre todos los candidatos.
+LSH_TABLES = 16
+LSH_BUCKET_SIZE = 64
+LSH_MAX_BUCKET_SIZE = 256
+LSH_NEIGHBOURS = 50
+
+# Cantidad de procesos que calculan las recomendaciones en paralelo
+RECOMMENDATIONS_WORKERS = int(os.getenv("RECOMMENDATIONS_WORKERS") or 1)
+
+# Cantidad de shards de usuarios en los que se reparte el trabajo de cada proceso
+SHARDS_PER_WORKER = 4
+
+# Directorio donde se guardan los snapshots del modelo de recomendación, cuántos
+# se conservan y la antigüedad máxima en segundos para usar uno
+SNAPSHOT_DIR = os.getenv("RECOMMENDATIONS_SNAPSHOT_DIR") or os.path.join(
+    tempfile.gettempdir(), "attractions-recommendations"
+)
+SNAPSHOT_KEEP = 2
+SNAPSHOT_MAX_AGE = 24 * 60 * 60
+
+# Si es "true", al iniciar el proceso se importan los servicios de recomendación
+# y sentimiento, se carga VADER y se mapea el último snapshot, en lugar de hacerlo
+# en el primer pedido que los necesita
+WARM_UP_ON_STARTUP = (os.getenv("WARM_UP_ON_STARTUP") or "false").lower() == "true"
+
+# Cantidad de comentarios que lee cada tanda del recálculo masivo de sentimiento,
+# cantidad de procesos que los puntúan y archivo donde se guarda el último
+# comment_id recalculado para poder retomarlo. El archivo está por defecto en el
+# directorio data del proyecto, que docker-compose monta como volumen, para que
+# sobreviva a un reinicio del contenedor.
+RESCORING_CHUNK_SIZE = 2000
+RESCORING_WORKERS = int(os.getenv("RESCORING_WORKERS") or 1)
+RESCORING_WATERMARK_FILE = os.getenv("RESCORING_WATERMARK_FILE") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "rescoring-watermark",
+)
+
+# Motor con el que se calculan las recomendaciones: "cosine" (usuarios similares)
+# o "als" (factorización de la matriz de scores)
+RECOMMENDATIONS_ENGINE = os.getenv("RECOMMENDATIONS_ENGINE") or "cosine"
+
+# Parámetros de la factorización ALS: cantidad de factores, iteraciones,
+# regularización y peso de cada score en la confianza
+ALS_FACTORS = 32
+ALS_ITERATIONS = 15
+ALS_REGULARIZATION = 0.1
+ALS_ALPHA = 0.05
+
+# Cantidad de atracciones similares que se guardan para cada atracción
+ITEM_NEIGHBOURS = 20
+
+# Modelo con el que se arman los planes: "user" (usuarios similares), "item"
+# (atracciones similares al historial del usuario) o "als" (factores del usuario
+# y de las atracciones)
+PLAN_RECOMMENDER = os.getenv("PLAN_RECOMMENDER") or "user"
+
+# Cantidad máxima de comentarios cuyo sentimiento se calcula junto y segundos
+# que se espera a que lleguen más antes de calcularlo
+SENTIMENT_BATCH_SIZE = 32
+SENTIMENT_BATCH_WAIT = 0.5
+
+# Reintentos y espera inicial en segundos para las tandas de comentarios cuyo
+# sentimiento no se pudo calcular, por ejemplo porque no respondió el traductor
+SENTIMENT_MAX_RETRIES = 3
+SENTIMENT_RETRY_BACKOFF = 2
+
+# Cada cuántos segundos se buscan los comentarios que quedaron sin sentimiento.
+# Solo se toman los creados antes de ese intervalo, porque los más nuevos todavía
+# pueden estar en la cola del proceso que los guardó.
+SENTIMENT_SWEEP_INTERVAL = 5 * 60
+
+# Recurso de nltk con el léxico de VADER, que se busca en los directorios de
+# nltk.data.path
+VADER_LEXICON = "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+
+# Cantidad de traducciones de comentarios que se guardan en memoria
+TRANSLATION_CACHE_SIZE = 10000
+
+# Tamaño de los n-gramas de caracteres con los que se identifica el idioma de un
+# comentario y diferencia mínima del puntaje promedio por n-grama del inglés
+# respecto del siguiente idioma para no traducirlo
+LANGUAGE_NGRAM_SIZE = 3
+MIN_ENGLISH_MARGIN = 0.1
+
+# Segundos que se esperan después de la primera interacción de un usuario para
+# actualizar sus recomendaciones, agrupando las que lleguen mientras tanto
+REFRESH_DEBOUNCE = 5
+
+# Segundos que se usa el modelo en memoria de una ciudad antes de reconstruirlo
+CITY_MODEL_TTL = 10 * 60
+
+# Cantidad de items por cada BatchWriteItem de DynamoDB (máximo permitido: 25)
+DYNAMODB_BATCH_SIZE = 25
+
+# Reintentos y espera inicial en segundos para los items no procesados por DynamoDB
+DYNAMODB_MAX_RETRIES = 5
+DYNAMODB_RETRY_BACKOFF = 0.05
+
+# Si las recomendaciones se escriben en DynamoDB desde un hilo aparte
+WRITE_RECOMMENDATIONS_IN_BACKGROUND = True
+
+# Cantidad de hilos en los que las rutas async hacen las consultas a la base. Es
+# igual a la cantidad máxima de conexiones del pool de SQLAlchemy (5 + 10 extra),
+# así ninguna consulta espera una conexión ocupando un hilo
+DB_EXECUTOR_WORKERS = 15
+
+# URL base de la API de Places, que se puede cambiar para apuntar a un servidor
+# local, y cantidad de conexiones que se mantienen abiertas con ella
+PLACES_API_URL = os.getenv("PLACES_API_URL") or "https://places.googleapis.com/v1"
+PLACES_POOL_SIZE = 40
+
+# Cantidad máxima de conexiones simultáneas del cliente asíncrono de la API de
+# Places. Como las llamadas en curso no ocupan hilos, puede ser mayor que
+# PLACES_POOL_SIZE, que sigue siendo la cantidad que se mantiene abierta
+PLACES_ASYNC_MAX_CONNECTIONS = 100
+
+# Segundos máximos para conectarse a la API de Places y para recibir cada respuesta
+PLACES_CONNECT_TIMEOUT = 3.05
+PLACES_READ_TIMEOUT = 10
+
+# Reintentos y espera inicial en segundos ante respuestas 429 o 5xx de la API de
+# Places o errores de conexión
+PLACES_MAX_RETRIES = 3
+PLACES_RETRY_BACKOFF = 0.25
+
+# Segundos máximos que se espera entre dos intentos aunque la API pida más con
+# Retry-After, y segundos máximos que puede durar un pedido contando los
+# reintentos. No se hace un nuevo intento que pueda terminar después del límite.
+PLACES_MAX_RETRY_DELAY = 2
+PLACES_REQUEST_DEADLINE = 20
 
 ATTRACTION_TYPES = [
     "airport",
@@ -0,0 +1,125 @@
+import os
+import queue
+import threading
+import time
+
+import boto3
+
+from app.services.constants import (
+    DYNAMODB_BATCH_SIZE,
+    DYNAMODB_MAX_RETRIES,
+    DYNAMODB_RETRY_BACKOFF,
+)
+from app.services.logger import Logger
+
+
+def get_recommendations_table():
+    session = boto3.Session(
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    )
+
+    dynamodb = session.resource("dynamodb", region_name="us-east-2")
+
+    table_name = "recommendations"
+    return dynamodb.Table(table_name)
+
+
+# Escribe hasta DYNAMODB_BATCH_SIZE items con un único BatchWriteItem. Los items
+# que DynamoDB no procesa se reintentan con backoff exponencial.
+def batch_put_items(table, items):
+    client = table.meta.client
+    put_requests = [{"PutRequest": {"Item": item}} for item in items]
+
+    for attempt in range(DYNAMODB_MAX_RETRIES + 1):
+        response = client.batch_write_item(RequestItems={table.name: put_requests})
+        put_requests = response.get("UnprocessedItems", {}).get(table.name, [])
+
+        if not put_requests:
+            return
+
+        if attempt < DYNAMODB_MAX_RETRIES:
+            time.sleep(DYNAMODB_RETRY_BACKOFF * 2**attempt)
+
+    raise RuntimeError(
+        f"{len(put_requests)} items could not be written to {table.name}"
+    )
+
+
+# Acumula las recomendaciones de cada usuario y las escribe en DynamoDB en lotes.
+# Con background=True las escrituras se hacen en un hilo aparte, de forma que se
+# solapan con el cálculo de los scores.
+class RecommendationsWriter:
+    def __init__(self, table, background: bool = True):
+        self.table = table
+        self.background = background
+        self.items_written = 0
+        self._items = []
+        self._error = None
+        self._started_at = time.perf_counter()
+
+        if background:
+            self._queue = queue.Queue(maxsize=DYNAMODB_BATCH_SIZE * 100)
+            self._thread = threading.Thread(target=self._consume, daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def put(self, user_id: int, attraction_ids):
+        item = {"user_id": user_id, "attraction_ids": attraction_ids}
+
+        if self.background:
+            if self._error:
+                raise self._error
+            self._queue.put(item)
+        else:
+            self._add(item)
+
+    def close(self):
+        if self.background:
+            self._queue.put(None)
+            self._thread.join()
+            if self._error:
+                raise self._error
+        else:
+            self._flush()
+
+        elapsed = time.perf_counter() - self._started_at
+        Logger().info(
+            msg=f"Wrote {self.items_written} recommendations in {elapsed:.2f}s ({self.items_written / elapsed if elapsed else 0:.1f} items/s)"
+        )
+
+        return self.items_written
+
+    def _add(self, item):
+        self._items.append(item)
+        if len(self._items) >= DYNAMODB_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._items:
+            batch_put_items(self.table, self._items)
+            self.items_written += len(self._items)
+            self._items = []
+
+    def _consume(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error:
+                continue
+            try:
+                self._add(item)
+            except Exception as error:
+                self._error = error
+
+        if not self._error:
+            try:
+                self._flush()
+            except Exception as error:
+                self._error = error
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from app.services.constants import REFRESH_DEBOUNCE
+from app.services.lazy import lazy_import
+from app.services.logger import Logger
+
+recommendations = lazy_import("app.services.recommendations")
+
+
+# Recibe los usuarios que interactuaron con alguna atracción y actualiza sus
+# recomendaciones en un hilo aparte. Las interacciones de un mismo usuario que
+# llegan dentro de los debounce segundos posteriores a la primera se agrupan en
+# una única actualización.
+class RecommendationRefresher:
+    def __init__(self, refresh, debounce: float = REFRESH_DEBOUNCE):
+        self.refresh = refresh
+        self.debounce = debounce
+        self.refreshed = 0
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def publish(self, user_id: int):
+        with self._condition:
+            self._pending.setdefault(user_id, time.monotonic() + self.debounce)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._consume, daemon=True)
+                self._thread.start()
+
+            self._condition.notify()
+
+    # Actualiza en el momento a todos los usuarios pendientes
+    def flush(self):
+        with self._condition:
+            user_ids = list(self._pending)
+            self._pending.clear()
+
+        for user_id in user_ids:
+            self._refresh_user(user_id)
+
+    def _consume(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+
+                now = time.monotonic()
+                due = [
+                    user_id
+                    for user_id, refresh_at in self._pending.items()
+                    if refresh_at <= now
+                ]
+
+                if not due:
+                    self._condition.wait(min(self._pending.values()) - now)
+                    continue
+
+                for user_id in due:
+                    del self._pending[user_id]
+
+            for user_id in due:
+                self._refresh_user(user_id)
+
+    def _refresh_user(self, user_id: int):
+        start = time.perf_counter()
+        try:
+            if self.refresh(user_id):
+                self.refreshed += 1
+                Logger().debug(
+                    msg=f"Refreshed recommendations of user {user_id} in {(time.perf_counter() - start) * 1000:.1f}ms"
+                )
+        except Exception as error:
+            Logger().err(
+                f"Could not refresh recommendations of user {user_id}: {error}"
+            )
+
+
+def _refresh_user_recommendations(user_id: int):
+    return recommendations.refresh_user_recommendations(user_id)
+
+
+_refresher = RecommendationRefresher(_refresh_user_recommendations)
+
+
+# Avisa que el usuario tuvo una interacción nueva para que se actualicen sus
+# recomendaciones sin esperar a la próxima corrida completa
+def publish_interaction(user_id: int):
+    _refresher.publish(user_id)
@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+from scipy import sparse
+
+from app.services.constants import (
+    ALS_ALPHA,
+    ALS_FACTORS,
+    ALS_ITERATIONS,
+    ALS_REGULARIZATION,
+)
+from app.services.logger import Logger
+
+
+# Factorización por mínimos cuadrados alternados para feedback implícito. Cada
+# score se toma como una preferencia (1 si es positivo, 0 si no) con confianza
+# 1 + alpha * |score|, y se aprenden factores de usuarios y atracciones cuyo
+# producto aproxima las preferencias. Devuelve ambas matrices de factores en
+# float32.
+def als(
+    matrix,
+    factors=ALS_FACTORS,
+    iterations=ALS_ITERATIONS,
+    regularization=ALS_REGULARIZATION,
+    alpha=ALS_ALPHA,
+    seed=0,
+):
+    start = time.perf_counter()
+
+    user_items = sparse.csr_matrix(matrix, dtype=np.float64)
+    item_users = user_items.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(scale=0.01, size=(user_items.shape[0], factors))
+    item_factors = rng.normal(scale=0.01, size=(user_items.shape[1], factors))
+
+    for _ in range(iterations):
+        user_factors = _least_squares(
+            user_items, item_factors, regularization, alpha
+        )
+        item_factors = _least_squares(
+            item_users, user_factors, regularization, alpha
+        )
+
+    Logger().info(
+        msg=f"Factorized {user_items.shape[0]}x{user_items.shape[1]} matrix with {factors} factors in {time.perf_counter() - start:.2f}s"
+    )
+
+    return user_factors.astype(np.float32), item_factors.astype(np.float32)
+
+
+# Calcula los factores de un usuario nuevo o con interacciones nuevas dejando
+# fijos los de las atracciones, sin volver a factorizar toda la matriz
+def fold_in(
+    user_row, item_factors, regularization=ALS_REGULARIZATION, alpha=ALS_ALPHA
+):
+    rows = sparse.csr_matrix(user_row, dtype=np.float64)
+    factors = _least_squares(
+        rows, np.asarray(item_factors, dtype=np.float64), regularization, alpha
+    )
+    return factors[0].astype(np.float32)
+
+
+# Resuelve los factores de cada fila dejando fijos los de las columnas. Como la
+# mayoría de las entradas tienen preferencia 0 y confianza 1, se parte de Y^T Y
+# calculado una única vez y solo se corrige con las columnas con interacciones.
+def _least_squares(rows, fixed_factors, regularization, alpha):
+    n_factors = fixed_factors.shape[1]
+    gram = fixed_factors.T @ fixed_factors + regularization * np.eye(n_factors)
+
+    solved = np.zeros((rows.shape[0], n_factors))
+
+    for row in range(rows.shape[0]):
+        start, end = rows.indptr[row], rows.indptr[row + 1]
+        if start == end:
+            continue
+
+        columns = rows.indices[start:end]
+        scores = rows.data[start:end]
+
+        confidence = 1 + alpha * np.abs(scores)
+        preference = (scores > 0).astype(np.float64)
+
+        factors = fixed_factors[columns]
+        a = gram + (factors.T * (confidence - 1)) @ factors
+        b = factors.T @ (confidence * preference)
+
+        solved[row] = np.linalg.solve(a, b)
+
+    return solved
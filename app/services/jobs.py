@@ -0,0 +1,171 @@
+import datetime
+import multiprocessing
+import queue
+import resource
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.db.database import get_db_session
+from app.services.lazy import lazy_import
+from app.services.logger import Logger
+
+recommendations = lazy_import("app.services.recommendations")
+
+# Cantidad de corridas cuyo estado se sigue guardando después de terminar
+MAX_FINISHED_JOBS = 20
+
+# Segundos mínimos entre dos envíos del progreso del proceso de una corrida,
+# salvo cuando cambia de fase
+PROGRESS_INTERVAL = 0.5
+
+# Cada corrida se hace en un proceso aparte, para que el cálculo no compita por
+# el GIL con los pedidos y para que el pool de shards no se cree desde un proceso
+# con varios hilos. Se crea con forkserver por el mismo motivo. El hilo del
+# executor solo espera al proceso y va actualizando el job con su progreso.
+_context = multiprocessing.get_context("forkserver")
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recommendations")
+_lock = threading.Lock()
+_jobs = OrderedDict()
+_active_job = None
+
+
+class RecommendationJob:
+    def __init__(self, incremental: bool):
+        self.job_id = uuid.uuid4().hex
+        self.incremental = incremental
+        self.phase = "queued"
+        self.users_scored = 0
+        self.users_total = 0
+        self.peak_memory_mb = 0.0
+        self.created_at = datetime.datetime.utcnow()
+        self.finished_at = None
+        self.error = None
+        self._started = time.perf_counter()
+        self._finished = None
+
+    def update(self, **progress):
+        for name, value in progress.items():
+            setattr(self, name, value)
+
+    def is_active(self):
+        return self.phase not in ("done", "failed")
+
+    def to_dict(self):
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return {
+            "job_id": self.job_id,
+            "incremental": self.incremental,
+            "phase": self.phase,
+            "users_scored": self.users_scored,
+            "users_total": self.users_total,
+            "elapsed_seconds": round(end - self._started, 3),
+            "peak_memory_mb": self.peak_memory_mb,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+# Memoria máxima usada por el proceso y por los procesos hijos que ya terminaron.
+# Llamada desde el proceso de una corrida es la memoria máxima de esa corrida.
+def peak_memory_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / 1024, 1)
+
+
+def run_recommendations(incremental: bool, on_progress: Callable):
+    db = get_db_session()
+    try:
+        recommendations.run_recommendation_system(
+            db=db, incremental=incremental, on_progress=on_progress
+        )
+    finally:
+        db.close()
+
+
+# Punto de entrada del proceso de una corrida. Envía por messages el progreso
+# acumulado junto con la memoria máxima usada hasta el momento, a lo sumo cada
+# PROGRESS_INTERVAL segundos o cuando cambia de fase, y al final la fase "done" o
+# "failed".
+def _run_in_process(run: Callable, incremental: bool, messages):
+    pending = {}
+    last_sent = 0.0
+
+    def on_progress(**progress):
+        nonlocal last_sent
+
+        pending.update(progress)
+        if "phase" in progress or time.monotonic() - last_sent >= PROGRESS_INTERVAL:
+            messages.put({**pending, "peak_memory_mb": peak_memory_mb()})
+            pending.clear()
+            last_sent = time.monotonic()
+
+    try:
+        run(incremental=incremental, on_progress=on_progress)
+        on_progress(phase="done")
+    except Exception as error:
+        Logger().err(f"Recommendation run failed: {error}")
+        on_progress(phase="failed", error=str(error))
+
+
+def _run(job: RecommendationJob, run: Callable):
+    messages = _context.Queue()
+    process = _context.Process(
+        target=_run_in_process,
+        args=(run, job.incremental, messages),
+        name=f"recommendations-{job.job_id}",
+    )
+
+    try:
+        process.start()
+
+        while job.is_active():
+            try:
+                job.update(**messages.get(timeout=1))
+            except queue.Empty:
+                # El proceso terminó sin avisar, por ejemplo porque lo mató el
+                # sistema por falta de memoria
+                if not process.is_alive() and messages.empty():
+                    raise RuntimeError(
+                        f"Recommendation process exited with code {process.exitcode}"
+                    )
+    except Exception as error:
+        Logger().err(f"Recommendation job {job.job_id} failed: {error}")
+        job.update(phase="failed", error=str(error))
+    finally:
+        if process.pid is not None:
+            process.join(timeout=5)
+        job.update(finished_at=datetime.datetime.utcnow(), _finished=time.perf_counter())
+
+
+# Encola una corrida del sistema de recomendación y devuelve su job. Si ya hay
+# una corrida en curso se devuelve esa en lugar de iniciar otra. run es la función
+# que se ejecuta en el proceso de la corrida.
+def submit_recommendation_job(
+    incremental: bool = False, run: Callable = run_recommendations
+) -> RecommendationJob:
+    global _active_job
+
+    with _lock:
+        if _active_job and _active_job.is_active():
+            return _active_job
+
+        job = RecommendationJob(incremental=incremental)
+        _jobs[job.job_id] = job
+        _active_job = job
+
+        while len(_jobs) > MAX_FINISHED_JOBS:
+            _jobs.popitem(last=False)
+
+        _executor.submit(_run, job, run)
+
+        return job
+
+
+def get_recommendation_job(job_id: str):
+    return _jobs.get(job_id)
@@ -0,0 +1,167 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from app.services.constants import LANGUAGE_NGRAM_SIZE, MIN_ENGLISH_MARGIN
+
+# Peso de la frecuencia de cada n-grama en la muestra frente a la distribución
+# uniforme con la que se suaviza
+NGRAM_WEIGHT = 0.9
+
+# Textos de muestra con los que se arma el perfil de n-gramas de cada idioma. Se
+# eligieron frases parecidas a las de los comentarios sobre atracciones.
+SAMPLES = {
+    "en": """
+    The place was absolutely beautiful and the views from the top were amazing.
+    We had a wonderful time with the kids, the staff were friendly and helpful.
+    It was too crowded and the queue took more than two hours, not worth the money.
+    A must see when you visit the city, highly recommended for families and friends.
+    The museum has an incredible collection of paintings and the guided tour was great.
+    Very disappointing experience, the food was cold and the toilets were dirty.
+    I would definitely come back again, this is one of the best things to do here.
+    Nothing special, just an old building with a small park around it.
+    The tickets were expensive but the show was worth every penny.
+    Lovely walk along the river at sunset, quiet and relaxing with nice restaurants.
+    Don't miss it! The guide knew everything about the history of the castle.
+    Terrible service, rude people and they closed early without telling anyone.
+    """,
+    "es": """
+    El lugar es hermoso y las vistas desde arriba son increíbles, vale la pena subir.
+    Pasamos un día excelente con los chicos, la atención fue muy buena y amable.
+    Había demasiada gente y la fila tardó más de dos horas, no vale lo que cuesta.
+    Imperdible si visitás la ciudad, muy recomendable para ir en familia o con amigos.
+    El museo tiene una colección de pinturas increíble y la visita guiada estuvo genial.
+    Una experiencia muy decepcionante, la comida estaba fría y los baños sucios.
+    Sin duda volvería, es una de las mejores cosas para hacer en la zona.
+    Nada especial, solo un edificio viejo con una plaza chiquita alrededor.
+    Las entradas son caras pero el espectáculo vale cada peso.
+    Hermoso paseo por la costanera al atardecer, tranquilo y con buenos restaurantes.
+    ¡No se lo pierdan! El guía sabía todo sobre la historia del castillo.
+    Pésima atención, gente maleducada y cerraron temprano sin avisar a nadie.
+    """,
+    "pt": """
+    O lugar é lindo e a vista lá de cima é incrível, vale muito a pena subir.
+    Passamos um dia maravilhoso com as crianças, os funcionários foram muito simpáticos.
+    Estava muito cheio e a fila demorou mais de duas horas, não vale o preço.
+    Imperdível para quem visita a cidade, recomendo muito para famílias e amigos.
+    O museu tem uma coleção de pinturas incrível e a visita guiada foi ótima.
+    Experiência muito decepcionante, a comida estava fria e os banheiros sujos.
+    Com certeza voltaria, é uma das melhores coisas para fazer aqui.
+    Nada de especial, apenas um prédio antigo com uma pracinha em volta.
+    Os ingressos são caros mas o espetáculo vale cada centavo.
+    Passeio lindo pela orla no fim da tarde, tranquilo e com bons restaurantes.
+    Não percam! O guia sabia tudo sobre a história do castelo.
+    Atendimento péssimo, pessoas grossas e fecharam cedo sem avisar ninguém.
+    """,
+    "fr": """
+    L'endroit est magnifique et la vue depuis le sommet est incroyable.
+    Nous avons passé une journée merveilleuse avec les enfants, le personnel était très gentil.
+    Il y avait beaucoup trop de monde et la file d'attente a duré plus de deux heures.
+    À voir absolument si vous visitez la ville, je le recommande aux familles et aux amis.
+    Le musée possède une collection de tableaux incroyable et la visite guidée était géniale.
+    Expérience très décevante, la nourriture était froide et les toilettes sales.
+    Je reviendrai sans hésiter, c'est une des meilleures choses à faire ici.
+    Rien de spécial, juste un vieux bâtiment avec un petit parc autour.
+    Les billets sont chers mais le spectacle vaut vraiment le coup.
+    Belle promenade le long de la rivière au coucher du soleil, calme et agréable.
+    """,
+    "it": """
+    Il posto è bellissimo e la vista dalla cima è incredibile, vale la pena salire.
+    Abbiamo passato una giornata meravigliosa con i bambini, il personale era gentile.
+    C'era troppa gente e la coda è durata più di due ore, non vale il prezzo.
+    Da vedere assolutamente se visitate la città, consigliato a famiglie e amici.
+    Il museo ha una collezione di quadri incredibile e la visita guidata era fantastica.
+    Esperienza molto deludente, il cibo era freddo e i bagni sporchi.
+    Ci tornerei sicuramente, è una delle cose migliori da fare qui.
+    Niente di speciale, solo un vecchio edificio con un piccolo parco intorno.
+    """,
+    "de": """
+    Der Ort ist wunderschön und die Aussicht von oben ist unglaublich.
+    Wir hatten einen herrlichen Tag mit den Kindern, das Personal war sehr freundlich.
+    Es war viel zu voll und die Warteschlange dauerte mehr als zwei Stunden.
+    Ein Muss, wenn man die Stadt besucht, sehr empfehlenswert für Familien und Freunde.
+    Das Museum hat eine unglaubliche Sammlung von Gemälden und die Führung war toll.
+    Sehr enttäuschend, das Essen war kalt und die Toiletten schmutzig.
+    Ich würde auf jeden Fall wiederkommen, eines der besten Dinge hier.
+    Nichts Besonderes, nur ein altes Gebäude mit einem kleinen Park drumherum.
+    """,
+}
+
+_lock = threading.Lock()
+_profiles = None
+
+
+# Deja solo letras en minúscula separadas por un espacio, con un espacio al
+# principio y al final para que los n-gramas marquen el inicio y fin de palabra
+def _clean(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower()
+    return " " + " ".join(re.findall(r"[^\W\d_]+", text)) + " "
+
+
+def ngrams(text: str, size: int = LANGUAGE_NGRAM_SIZE):
+    cleaned = _clean(text)
+    return [
+        cleaned[start : start + size]
+        for start in range(len(cleaned) - size + 1)
+        if cleaned[start : start + size].strip()
+    ]
+
+
+# Perfil de cada idioma: logaritmo de la probabilidad de cada n-grama de la
+# muestra y la de un n-grama que no aparece. Cada frecuencia se mezcla con una
+# distribución uniforme sobre todos los n-gramas de todas las muestras, así un
+# n-grama desconocido cuesta lo mismo en todos los idiomas aunque las muestras
+# tengan distinto largo.
+def _build_profiles():
+    counts = {language: Counter(ngrams(sample)) for language, sample in SAMPLES.items()}
+    uniform = (1 - NGRAM_WEIGHT) / len(set().union(*counts.values()))
+
+    profiles = {}
+    for language, language_counts in counts.items():
+        total = sum(language_counts.values())
+        profiles[language] = (
+            {
+                ngram: math.log(NGRAM_WEIGHT * count / total + uniform)
+                for ngram, count in language_counts.items()
+            },
+            math.log(uniform),
+        )
+    return profiles
+
+
+def _get_profiles():
+    global _profiles
+
+    with _lock:
+        if _profiles is None:
+            _profiles = _build_profiles()
+        return _profiles
+
+
+# Devuelve el logaritmo de la probabilidad promedio por n-grama del texto en cada
+# idioma, o un diccionario vacío si el texto no tiene letras
+def language_scores(text: str) -> dict:
+    text_ngrams = ngrams(text)
+    if not text_ngrams:
+        return {}
+
+    return {
+        language: sum(probabilities.get(ngram, unseen) for ngram in text_ngrams)
+        / len(text_ngrams)
+        for language, (probabilities, unseen) in _get_profiles().items()
+    }
+
+
+# Identifica localmente si un texto está en inglés comparando sus n-gramas de
+# caracteres con los de cada idioma. Ante la duda devuelve False, porque traducir
+# un texto en inglés solo cuesta tiempo y no traducir uno en otro idioma da un
+# sentimiento equivocado.
+def is_english(text: str, min_margin: float = MIN_ENGLISH_MARGIN) -> bool:
+    scores = language_scores(text)
+    if not scores:
+        return False
+
+    english = scores.pop("en")
+    return english - max(scores.values()) >= min_margin
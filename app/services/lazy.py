@@ -0,0 +1,28 @@
+import importlib
+import types
+
+
+# Módulo que se importa recién la primera vez que se usa uno de sus atributos.
+# Sirve para que las dependencias pesadas (pandas, scikit-learn, boto3, nltk) no
+# se carguen al iniciar el proceso sino en el primer pedido que las necesita. La
+# importación pasa por importlib, así que es segura entre hilos. Asignar o borrar
+# atributos se hace sobre el módulo real, para que se pueda usar patch con ellos.
+class LazyModule(types.ModuleType):
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def _load(self):
+        return importlib.import_module(self.__name__)
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,391 @@
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+import requests
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from app.services.constants import (
+    PLACES_API_URL,
+    PLACES_ASYNC_MAX_CONNECTIONS,
+    PLACES_CONNECT_TIMEOUT,
+    PLACES_MAX_RETRIES,
+    PLACES_MAX_RETRY_DELAY,
+    PLACES_POOL_SIZE,
+    PLACES_READ_TIMEOUT,
+    PLACES_REQUEST_DEADLINE,
+    PLACES_RETRY_BACKOFF,
+)
+from app.services.logger import Logger
+
+# Respuestas de la API de Places que se reintentan
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+
+
+# Sin clave configurada no se envía el header, como hace requests con los
+# headers en None
+def _headers(api_key: str, field_mask: str) -> dict:
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": api_key or os.getenv("ATTRACTIONS_API_KEY"),
+        "X-Goog-FieldMask": field_mask,
+    }
+    return {name: value for name, value in headers.items() if value is not None}
+
+
+def _unavailable(path: str, error: Exception) -> HTTPException:
+    Logger().err(f"Places API request to {path} failed: {error}")
+    return HTTPException(
+        status_code=503,
+        detail={
+            "status": "error",
+            "message": f"External API unavailable: {type(error).__name__}",
+        },
+    )
+
+
+# Si después de esperar delay segundos todavía entra un intento completo, de
+# attempt_timeout segundos, antes de que el pedido iniciado en started supere
+# deadline segundos
+def _within_deadline(started, delay, attempt_timeout, deadline) -> bool:
+    return time.perf_counter() - started + delay + attempt_timeout <= deadline
+
+
+# Retry de urllib3 que espera a lo sumo max_delay segundos entre intentos, aunque
+# Retry-After pida más, y que deja de reintentar cuando el siguiente intento
+# podría terminar después del deadline del pedido. El inicio de cada pedido se
+# guarda por hilo en requests_started, ya que el Retry lo comparten todos.
+class DeadlineRetry(Retry):
+    max_delay = PLACES_MAX_RETRY_DELAY
+    deadline = PLACES_REQUEST_DEADLINE
+    attempt_timeout = 0.0
+    requests_started = None
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.max_delay = self.max_delay
+        retry.deadline = self.deadline
+        retry.attempt_timeout = self.attempt_timeout
+        retry.requests_started = self.requests_started
+        return retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, self.max_delay)
+
+    def get_backoff_time(self):
+        return min(super().get_backoff_time(), self.max_delay)
+
+    def increment(self, method=None, url=None, response=None, error=None, **kwargs):
+        retry = super().increment(
+            method=method, url=url, response=response, error=error, **kwargs
+        )
+
+        started = getattr(self.requests_started, "value", None)
+        delay = (
+            retry.get_retry_after(response) if response is not None else None
+        ) or retry.get_backoff_time()
+
+        if started is not None and not _within_deadline(
+            started, delay, self.attempt_timeout, self.deadline
+        ):
+            raise MaxRetryError(
+                kwargs.get("_pool"), url, error or "Request deadline exceeded"
+            )
+
+        return retry
+
+
+# Pedidos hechos a la API de Places, reintentos, fallas y latencia promedio
+class RequestStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, start: float, retries: int, failed: bool):
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+            self.failures += failed
+            self.elapsed += time.perf_counter() - start
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "average_latency_ms": (
+                    round(self.elapsed / self.requests * 1000, 1)
+                    if self.requests
+                    else 0.0
+                ),
+            }
+
+
+# Cliente HTTP de la API de Places compartido por todos los pedidos. Mantiene un
+# pool de hasta pool_size conexiones abiertas por host, así cada llamada no tiene
+# que volver a hacer el handshake TCP y TLS, y corta las llamadas que tardan más
+# que los timeouts. Las respuestas 429 y 5xx y los errores de conexión se
+# reintentan hasta max_retries veces con backoff exponencial, esperando a lo sumo
+# max_retry_delay segundos entre intentos y sin pasar los deadline segundos.
+class PlacesClient:
+    def __init__(
+        self,
+        base_url: str = PLACES_API_URL,
+        api_key: str = None,
+        pool_size: int = PLACES_POOL_SIZE,
+        connect_timeout: float = PLACES_CONNECT_TIMEOUT,
+        read_timeout: float = PLACES_READ_TIMEOUT,
+        max_retries: int = PLACES_MAX_RETRIES,
+        retry_backoff: float = PLACES_RETRY_BACKOFF,
+        max_retry_delay: float = PLACES_MAX_RETRY_DELAY,
+        deadline: float = PLACES_REQUEST_DEADLINE,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.stats_counter = RequestStats()
+        self._requests_started = threading.local()
+
+        retry = DeadlineRetry(
+            total=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        retry.max_delay = max_retry_delay
+        retry.deadline = deadline
+        retry.attempt_timeout = connect_timeout + read_timeout
+        retry.requests_started = self._requests_started
+        self.adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.mount(self.base_url, self.adapter)
+
+    def get(self, path: str, field_mask: str) -> requests.Response:
+        return self.request("GET", path, field_mask)
+
+    def post(self, path: str, field_mask: str, json: dict) -> requests.Response:
+        return self.request("POST", path, field_mask, json=json)
+
+    def request(self, method: str, path: str, field_mask: str, **kwargs):
+        start = self._requests_started.value = time.perf_counter()
+        try:
+            response = self.session.request(
+                method,
+                f"{self.base_url}/{path}",
+                headers=_headers(self.api_key, field_mask),
+                timeout=self.timeout,
+                **kwargs,
+            )
+        except requests.RequestException as error:
+            self.stats_counter.record(start, retries=0, failed=True)
+            raise _unavailable(path, error)
+
+        retries = getattr(getattr(response.raw, "retries", None), "history", ())
+        self.stats_counter.record(start, retries=len(retries), failed=not response.ok)
+
+        return response
+
+    # Pedidos hechos, reintentos, fallas y latencia promedio, junto con cuántas
+    # conexiones se abrieron para atenderlos y cuántas siguen abiertas en el pool
+    def stats(self):
+        pools = [
+            self.adapter.poolmanager.pools[key]
+            for key in self.adapter.poolmanager.pools.keys()
+        ]
+        connections_opened = sum(pool.num_connections for pool in pools)
+        pool_requests = sum(pool.num_requests for pool in pools)
+
+        return {
+            **self.stats_counter.to_dict(),
+            "connections_opened": connections_opened,
+            "idle_connections": sum(
+                connection is not None
+                for pool in pools
+                for connection in list(pool.pool.queue)
+            ),
+            "connection_reuse_rate": (
+                1 - connections_opened / pool_requests if pool_requests else 0.0
+            ),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+# Versión asíncrona de PlacesClient para las rutas async, sobre httpx. Mientras
+# espera la respuesta no ocupa ningún hilo, así la cantidad de llamadas en curso
+# solo está limitada por las max_connections conexiones, de las cuales se
+# mantienen abiertas hasta pool_size entre pedidos. Reintenta las mismas
+# respuestas y errores que PlacesClient, esperando lo que indique Retry-After si
+# la API lo envía, con los mismos límites de espera y de duración del pedido.
+class AsyncPlacesClient:
+    def __init__(
+        self,
+        base_url: str = PLACES_API_URL,
+        api_key: str = None,
+        pool_size: int = PLACES_POOL_SIZE,
+        max_connections: int = PLACES_ASYNC_MAX_CONNECTIONS,
+        connect_timeout: float = PLACES_CONNECT_TIMEOUT,
+        read_timeout: float = PLACES_READ_TIMEOUT,
+        max_retries: int = PLACES_MAX_RETRIES,
+        retry_backoff: float = PLACES_RETRY_BACKOFF,
+        max_retry_delay: float = PLACES_MAX_RETRY_DELAY,
+        deadline: float = PLACES_REQUEST_DEADLINE,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_delay = max_retry_delay
+        self.deadline = deadline
+        self.attempt_timeout = connect_timeout + read_timeout
+        self.stats_counter = RequestStats()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(pool_size, max_connections),
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+
+    async def get(self, path: str, field_mask: str) -> httpx.Response:
+        return await self.request("GET", path, field_mask)
+
+    async def post(self, path: str, field_mask: str, json: dict) -> httpx.Response:
+        return await self.request("POST", path, field_mask, json=json)
+
+    async def request(self, method: str, path: str, field_mask: str, **kwargs):
+        start = time.perf_counter()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self.client.request(
+                        method,
+                        f"{self.base_url}/{path}",
+                        headers=_headers(self.api_key, field_mask),
+                        **kwargs,
+                    )
+                except httpx.TransportError as error:
+                    delay = self._retry_delay(None, attempt)
+                    if attempt == self.max_retries or not self._can_retry(
+                        start, delay
+                    ):
+                        self.stats_counter.record(start, retries=attempt, failed=True)
+                        raise _unavailable(path, error)
+                    await asyncio.sleep(delay)
+                    continue
+
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or attempt == self.max_retries
+                ):
+                    break
+
+                delay = self._retry_delay(response, attempt)
+                if not self._can_retry(start, delay):
+                    break
+
+                await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+
+        self.stats_counter.record(
+            start, retries=attempt, failed=not response.is_success
+        )
+        return response
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After", "") if response else ""
+        if retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.retry_backoff * 2**attempt
+        return min(delay, self.max_retry_delay)
+
+    def _can_retry(self, start: float, delay: float) -> bool:
+        return _within_deadline(start, delay, self.attempt_timeout, self.deadline)
+
+    # Pedidos hechos, reintentos, fallas y latencia promedio, junto con cuántos
+    # pedidos hay en curso y el máximo que hubo a la vez
+    def stats(self):
+        return {
+            **self.stats_counter.to_dict(),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+# Devuelve el cliente de la API de Places del proceso, creándolo la primera vez
+def get_places_client() -> PlacesClient:
+    global _client
+
+    with _lock:
+        if _client is None:
+            _client = PlacesClient()
+        return _client
+
+
+# Reemplaza el cliente del proceso, por ejemplo por uno que apunta a un servidor
+# local en tests o benchmarks. Devuelve el cliente anterior.
+def set_places_client(client: PlacesClient) -> PlacesClient:
+    global _client
+
+    with _lock:
+        previous, _client = _client, client
+        return previous
+
+
+# Devuelve el cliente asíncrono del proceso, creándolo la primera vez. Se crea
+# dentro del event loop del servidor, que es el único que lo usa.
+def get_async_places_client() -> AsyncPlacesClient:
+    global _async_client
+
+    with _lock:
+        if _async_client is None:
+            _async_client = AsyncPlacesClient()
+        return _async_client
+
+
+def set_async_places_client(client: AsyncPlacesClient) -> AsyncPlacesClient:
+    global _async_client
+
+    with _lock:
+        previous, _async_client = _async_client, client
+        return previous
+
+
+async def close_async_places_client():
+    global _async_client
+
+    with _lock:
+        client, _async_client = _async_client, None
+
+    if client is not None:
+        await client.close()
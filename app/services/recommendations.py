@@ -1,68 +1,65 @@
-import os
-from typing import List
+import datetime
+from typing import Callable, List, Optional
 
-import boto3
-import nltk
 import numpy as np
 import pandas as pd
-from deep_translator import GoogleTranslator
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 from sqlalchemy.orm import Session
 
 from app.db import crud
 from app.db.database import get_db_session
+from app.services import (
+    city_models,
+    dynamodb,
+    factorization,
+    shards,
+    similarity,
+    snapshot,
+)
 from app.services.constants import (
-    FILLNA_VALUE,
+    DONE_WEIGHT,
+    INTERACTIONS_CHUNK_SIZE,
+    INTERACTIONS_LOADER,
+    ITEM_NEIGHBOURS,
+    LIKE_WEIGHT,
     MINIMUM_NUMBER_OF_INTERACTIONS,
     N_RECOMMENDATIONS,
+    N_SIMILAR_USERS,
+    PLAN_RECOMMENDER,
+    RATING_SCORES,
+    RATING_WEIGHT,
+    RECOMMENDATIONS_ENGINE,
+    RECOMMENDATIONS_WORKERS,
+    SAVE_WEIGHT,
+    SENTIMENT_WEIGHT,
+    SIMILARITY_BACKEND,
+    SNAPSHOT_MAX_AGE,
+    WRITE_RECOMMENDATIONS_IN_BACKGROUND,
 )
+from app.services.lazy import lazy_import
 from app.services.logger import Logger
 
 from ..db import models
 
-nltk.download("vader_lexicon")
+# nltk solo hace falta si se calcula el sentimiento de algún comentario
+sentiment = lazy_import("app.services.sentiment")
 
 
 # Devuelve las posiciones de los n números más grandes dado un arreglo de números
 # Ej: [8, 3, 2, 9, 7] con n=3 devuelve [3, 0, 4]
 def n_greatest_positions(numbers, n):
-    sorted_indices = sorted(range(len(numbers)), key=lambda i: numbers[i], reverse=True)
-    return sorted_indices[:n]
+    numbers = np.asarray(numbers, dtype=np.float64)
+    if numbers.size == 0 or n <= 0:
+        return []
+    return top_n_positions(numbers[np.newaxis, :], n)[0].tolist()
 
 
 def get_sentiment_metric(text):
-    sia = SentimentIntensityAnalyzer()
-    translator = GoogleTranslator(source="auto", target="en")
-    text = translator.translate(text)
-
-    sentiment = sia.polarity_scores(text)
-    positive, negative = (
-        sentiment["pos"],
-        sentiment["neg"],
-    )
-
-    if positive > negative:
-        return positive
-    elif positive < negative:
-        return -negative
-    else:
-        return 0
+    return sentiment.get_sentiment_service().score(text)
 
 
 def create_rating_score(rating: int):
-    if rating == 1:
-        return -1
-    elif rating == 2:
-        return -0.5
-    elif rating == 3:
-        return 0.1
-    elif rating == 4:
-        return 0.5
-    elif rating == 5:
-        return 1
-    else:
-        return 0
+    return RATING_SCORES.get(rating, 0)
 
 
 def get_merged_df(db: Session):
@@ -110,6 +107,12 @@ def get_merged_df(db: Session):
 
     db.close()
 
+    # Los comentarios cuyo sentimiento todavía no se calculó no suman al score
+    # hasta que los puntúe el worker de sentimiento
+    df_comments = df_comments.dropna(subset=["sentiment_metric"]).astype(
+        {"sentiment_metric": float}
+    )
+
     Logger().debug(msg=f"Group comments by user and attraction")
     df_comments = df_comments.groupby(["user_id", "attraction_id"]).agg(
         {"sentiment_metric": "mean"}
@@ -127,98 +130,378 @@ def get_merged_df(db: Session):
     df.fillna(0, inplace=True)
 
     df["score"] = (
-        100 * df["is_liked"]
-        + 50 * df["is_saved"]
-        + 20 * df["is_done"]
-        + df["rating"].apply(create_rating_score) * 200
-        + df["sentiment_metric"] * 50
+        LIKE_WEIGHT * df["is_liked"]
+        + SAVE_WEIGHT * df["is_saved"]
+        + DONE_WEIGHT * df["is_done"]
+        + df["rating"].apply(create_rating_score) * RATING_WEIGHT
+        + df["sentiment_metric"] * SENTIMENT_WEIGHT
     )
     return df
 
 
-def run_recommendation_system(db: Session):
-    df = get_merged_df(db=db)
+# Carga los scores calculados directamente en Postgres, trayendo una sola fila
+# por cada par (usuario, atracción). Las filas se leen en chunks y se van
+# guardando en columnas compactas: user_id como int32, attraction_id como
+# categoría y score como float32.
+def get_scores_df(db: Session):
+    Logger().debug(msg=f"Start loading interaction scores")
+
+    user_ids, attraction_codes, scores = [], [], []
+    attraction_categories = {}
+
+    for chunk in crud.stream_interaction_scores(
+        db=db, chunk_size=INTERACTIONS_CHUNK_SIZE
+    ):
+        chunk_user_ids, chunk_attraction_ids, chunk_scores = zip(*chunk)
+
+        user_ids.append(np.array(chunk_user_ids, dtype=np.int32))
+        attraction_codes.append(
+            np.fromiter(
+                (
+                    attraction_categories.setdefault(
+                        attraction_id, len(attraction_categories)
+                    )
+                    for attraction_id in chunk_attraction_ids
+                ),
+                dtype=np.int32,
+                count=len(chunk),
+            )
+        )
+        scores.append(np.array(chunk_scores, dtype=np.float32))
+
+    db.close()
 
-    # Matriz usuarios-atracciones
-    matrix = df.pivot(index="user_id", columns="attraction_id", values="score")
+    return pd.DataFrame(
+        {
+            "user_id": np.concatenate(user_ids or [np.empty(0, dtype=np.int32)]),
+            "attraction_id": pd.Categorical.from_codes(
+                np.concatenate(attraction_codes or [np.empty(0, dtype=np.int32)]),
+                categories=list(attraction_categories),
+            ),
+            "score": np.concatenate(scores or [np.empty(0, dtype=np.float32)]),
+        }
+    )
 
-    # Se rellenan los nulos
-    matrix = matrix.fillna(FILLNA_VALUE)
 
-    Logger().info(msg=f"Start calculating the cosine similarity matrix")
+def load_interaction_scores(db: Session):
+    if INTERACTIONS_LOADER == "sql":
+        return get_scores_df(db=db)
+    return get_merged_df(db=db)
 
-    # Se calcula la similitud coseno de todos los usuarios con todos
-    user_similarity = cosine_similarity(matrix)
-    user_similarity_df = pd.DataFrame(
-        user_similarity, index=matrix.index, columns=matrix.index
+
+# Construye la matriz usuarios-atracciones en formato CSR a partir del df de scores.
+# Devuelve la matriz junto con los ids de usuario y de atracción correspondientes
+# a cada fila y columna. Las celdas sin interacción quedan como ceros implícitos.
+def build_interaction_matrix(df: pd.DataFrame):
+    user_codes, user_ids = pd.factorize(df["user_id"], sort=True)
+    attraction_codes, attraction_ids = pd.factorize(df["attraction_id"], sort=True)
+
+    matrix = sparse.csr_matrix(
+        (df["score"].to_numpy(dtype=np.float32), (user_codes, attraction_codes)),
+        shape=(len(user_ids), len(attraction_ids)),
     )
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+
+    return matrix, np.asarray(user_ids), np.asarray(attraction_ids)
 
-    db = get_db_session()
 
-    session = boto3.Session(
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+# Calcula los scores predichos para un bloque de usuarios como el producto entre
+# su bloque de similitudes (usuarios del bloque x todos los usuarios) y la matriz
+# de interacciones. Las atracciones con las que cada usuario ya interactuó quedan
+# con score -inf para que nunca sean recomendadas. Si se indica n_similar_users
+# solo contribuyen los n_similar_users usuarios más similares a cada usuario.
+# Un bloque que ya es float32 se modifica en lugar de copiarse.
+def score_block(similarity_block, matrix, user_positions, n_similar_users=None):
+    user_positions = np.asarray(user_positions)
+    rows = np.arange(len(user_positions))
+
+    similarity_block = np.asarray(similarity_block, dtype=np.float32)
+    if similarity_block.ndim == 1:
+        similarity_block = similarity_block[np.newaxis, :]
+
+    # Se elimina la similitud de cada usuario consigo mismo
+    similarity_block[rows, user_positions] = 0
+
+    if n_similar_users:
+        similarity_block = keep_top_k(similarity_block, n_similar_users)
+
+    scores = np.asarray(matrix.T @ similarity_block.T).T
+
+    # Se descartan las atracciones con las cuales el usuario ya interactuó
+    interacted_rows, interacted_columns = matrix[user_positions].nonzero()
+    scores[interacted_rows, interacted_columns] = -np.inf
+
+    return scores
+
+
+# Deja en cada fila del bloque de similitudes solo los k valores más grandes,
+# poniendo en cero al resto. Usa selección parcial en lugar de ordenar la fila.
+def keep_top_k(similarity_block, k):
+    size = similarity_block.shape[1]
+    if k >= size:
+        return similarity_block
+
+    neighbours = np.argpartition(similarity_block, size - k, axis=1)[:, size - k :]
+
+    pruned = np.zeros_like(similarity_block)
+    np.put_along_axis(
+        pruned,
+        neighbours,
+        np.take_along_axis(similarity_block, neighbours, axis=1),
+        axis=1,
     )
 
-    dynamodb = session.resource("dynamodb", region_name="us-east-2")
+    return pruned
 
-    table_name = "recommendations"
-    table = dynamodb.Table(table_name)
 
-    for user_id in matrix.index:
-        if (
-            crud.number_of_interactions_of_user(db=db, user_id=user_id)
-            >= MINIMUM_NUMBER_OF_INTERACTIONS
-        ):
+# Devuelve, para cada fila de scores, las posiciones de los n mayores scores
+# ordenadas de mayor a menor, descartando las posiciones enmascaradas con -inf.
+# Primero se seleccionan los n mayores con argpartition y solo esos se ordenan.
+# Los empates se resuelven por posición, igual que un ordenamiento estable de la
+# fila completa.
+def top_n_positions(scores, n):
+    size = scores.shape[1]
 
-            # Se obtienen los ratings hechos por el usuario actual
-            user_ratings = matrix.loc[user_id]
+    if n < size:
+        candidates = np.argpartition(scores, size - n, axis=1)[:, size - n :]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
 
-            # Se buscan usuarios similares utilizando a los que tengan mayor similitud coseno
-            similar_users = user_similarity_df[user_id].sort_values(ascending=False)
+        # argpartition puede quedarse con cualquiera de los empatados con el
+        # n-ésimo score; en esas filas se toman los de menor posición
+        threshold = candidate_scores.min(axis=1)
+        ties = (scores == threshold[:, np.newaxis]).sum(axis=1)
+        selected_ties = (candidate_scores == threshold[:, np.newaxis]).sum(axis=1)
 
-            if similar_users[similar_users != 0].count() > 1:
+        for row in np.flatnonzero(ties > selected_ties):
+            above = np.flatnonzero(scores[row] > threshold[row])
+            tied = np.flatnonzero(scores[row] == threshold[row])
+            candidates[row] = np.concatenate([above, tied[: n - len(above)]])
+    else:
+        candidates = np.broadcast_to(np.arange(size), scores.shape)
 
-                # Se genera un vector de ceros donde se almacenarán los scores predichos
-                scores = np.zeros(matrix.shape[1])
+    candidates = np.sort(candidates, axis=1)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
 
-                # Se recorren todos los usuarios eliminando el primero por ser el propio usuario con similitud=1
-                for similar_user in similar_users.index[1:]:
-                    similarity_score = user_similarity_df[user_id][similar_user]
-                    similar_user_ratings = matrix.loc[similar_user]
-                    scores += similarity_score * similar_user_ratings
+    top = np.take_along_axis(candidates, order, axis=1)
+    top_scores = np.take_along_axis(candidate_scores, order, axis=1)
 
-                scores = pd.Series(scores, index=matrix.columns)
+    return [row[np.isfinite(row_scores)] for row, row_scores in zip(top, top_scores)]
 
-                # Se eliminan las atracciones con las cuales el usuario ya interactuó
-                scores = scores[user_ratings == 0]
 
-                # Se toman las N_RECOMMENDATIONS con mayor score
-                recommendations = (
-                    scores.sort_values(ascending=False)
-                    .head(N_RECOMMENDATIONS)
-                    .index.tolist()
-                )
+# Devuelve las posiciones de los usuarios cuyas recomendaciones pueden haber
+# cambiado: los que interactuaron desde la última corrida y los que tienen
+# similitud distinta de cero con alguno de ellos (sus vecinos).
+def get_affected_user_positions(user_similarity, user_ids, changed_user_ids):
+    changed_positions = np.flatnonzero(np.isin(user_ids, list(changed_user_ids)))
+    affected_positions = changed_positions
 
-                # Se actualiza el registro en DynamoDB
-                item_data = {
-                    "user_id": user_id,
-                    "attraction_ids": recommendations,
-                }
+    for _, neighbours in similarity.iter_blocks(user_similarity, changed_positions):
+        neighbours.eliminate_zeros()
+        affected_positions = np.union1d(affected_positions, neighbours.indices)
 
-                table.put_item(Item=item_data)
+    return affected_positions
 
 
-def update_recommendations(user_id: int, attractions_ids: List[str]):
-    session = boto3.Session(
-        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+# Bytes que ocupa cada usuario de un bloque de score_users. Por cada usuario del
+# bloque se tiene su fila de similitudes dispersa (valor e índice), densa y
+# filtrada a los usuarios con similares (4 bytes cada una) y, con
+# N_SIMILAR_USERS, los índices de argpartition y la fila podada de keep_top_k.
+# Por cada atracción, su score, el índice de argpartition y la máscara de
+# empates de top_n_positions.
+def score_users_row_bytes(n_users, n_attractions):
+    bytes_per_user = 16 + (12 if N_SIMILAR_USERS else 0)
+    return bytes_per_user * n_users + 13 * n_attractions
+
+
+# Calcula las recomendaciones de los usuarios indicados en bloques de usuarios
+# que entren en RECOMMENDATIONS_MEMORY_BUDGET_MB. Devuelve, por cada usuario que
+# tenga usuarios similares, su posición y las posiciones de las atracciones
+# recomendadas.
+def score_users(matrix, user_similarity, user_positions):
+    n_users, n_attractions = matrix.shape
+
+    size = similarity.block_size(score_users_row_bytes(n_users, n_attractions))
+
+    for start in range(0, len(user_positions), size):
+        block_positions = np.asarray(user_positions[start : start + size])
+
+        similarity_block = user_similarity[block_positions].toarray()
+
+        # Se buscan usuarios similares excluyendo al propio usuario
+        similarity_block[np.arange(len(block_positions)), block_positions] = 0
+        has_similar_users = (similarity_block != 0).any(axis=1)
+
+        block_positions = block_positions[has_similar_users]
+        if len(block_positions) == 0:
+            continue
+
+        scores = score_block(
+            similarity_block[has_similar_users],
+            matrix,
+            block_positions,
+            n_similar_users=N_SIMILAR_USERS,
+        )
+
+        yield from zip(
+            block_positions.tolist(), top_n_positions(scores, N_RECOMMENDATIONS)
+        )
+
+
+# Calcula las recomendaciones de los usuarios indicados a partir de los factores
+# de la factorización ALS: el score de cada atracción es el producto entre los
+# factores del usuario y los de la atracción.
+def score_users_with_factors(matrix, user_factors, item_factors, user_positions):
+    size = similarity.block_size(8 * matrix.shape[1])
+
+    for start in range(0, len(user_positions), size):
+        block_positions = np.asarray(user_positions[start : start + size])
+
+        scores = user_factors[block_positions] @ item_factors.T
+
+        # Se descartan las atracciones con las cuales el usuario ya interactuó
+        interacted_rows, interacted_columns = matrix[block_positions].nonzero()
+        scores[interacted_rows, interacted_columns] = -np.inf
+
+        yield from zip(
+            block_positions.tolist(), top_n_positions(scores, N_RECOMMENDATIONS)
+        )
+
+
+# Índice de atracciones similares que usan los planes con PLAN_RECOMMENDER
+# "item". Con los demás no se lee, así que no se calcula.
+def build_item_neighbours(matrix):
+    if PLAN_RECOMMENDER != "item":
+        return None
+
+    return similarity.neighbours_matrix(
+        similarity.item_similarity(matrix), ITEM_NEIGHBOURS
+    )
+
+
+# Si se indica on_progress, se lo llama con la fase actual de la corrida y con la
+# cantidad de usuarios puntuados sobre el total a medida que avanza
+def run_recommendation_system(
+    db: Session, incremental: bool = False, on_progress: Optional[Callable] = None
+):
+    on_progress = on_progress or (lambda **progress: None)
+    started_at = datetime.datetime.utcnow()
+
+    # En modo incremental solo se recalculan los usuarios afectados por
+    # interacciones posteriores al inicio de la última corrida exitosa
+    last_run = crud.get_last_recommendation_run(db=db) if incremental else None
+
+    on_progress(phase="loading")
+
+    df = load_interaction_scores(db=db)
+
+    # Matriz usuarios-atracciones
+    matrix, user_ids, attraction_ids = build_interaction_matrix(df)
+
+    user_similarity, factors = None, None
+
+    if RECOMMENDATIONS_ENGINE == "als":
+        on_progress(phase="factorization")
+
+        Logger().info(msg=f"Start factorizing the interaction matrix")
+
+        factors = factorization.als(matrix)
+    else:
+        on_progress(phase="similarity")
+
+        Logger().info(
+            msg=f"Start calculating the cosine similarity matrix using {SIMILARITY_BACKEND}"
+        )
+
+        # Se calcula la similitud coseno de todos los usuarios con todos. Con
+        # "blockwise" solo se preparan las filas normalizadas y cada bloque se
+        # calcula al puntuar sus usuarios.
+        user_similarity = similarity.get_user_similarity(
+            matrix, backend=SIMILARITY_BACKEND
+        )
+
+    db = get_db_session()
+
+    interactions = crud.number_of_interactions_of_users(db=db)
+
+    user_positions = [
+        user_position
+        for user_position, user_id in enumerate(user_ids.tolist())
+        if interactions.get(user_id, 0) >= MINIMUM_NUMBER_OF_INTERACTIONS
+    ]
+
+    # Con ALS cambian los factores de todas las atracciones, por lo que se
+    # recalculan todos los usuarios aunque la corrida sea incremental
+    if last_run and user_similarity is not None:
+        changed_user_ids = crud.get_users_with_interactions_since(
+            db=db, since=last_run.started_at
+        )
+        affected_positions = set(
+            get_affected_user_positions(
+                user_similarity, user_ids, changed_user_ids
+            ).tolist()
+        )
+        user_positions = [
+            user_position
+            for user_position in user_positions
+            if user_position in affected_positions
+        ]
+
+    Logger().info(msg=f"Start scoring {len(user_positions)} users")
+
+    on_progress(phase="scoring", users_scored=0, users_total=len(user_positions))
+
+    if factors is not None:
+        results = score_users_with_factors(matrix, *factors, user_positions)
+    elif RECOMMENDATIONS_WORKERS > 1:
+        results = shards.score_in_shards(
+            score_users,
+            matrix,
+            user_similarity,
+            user_positions,
+            workers=RECOMMENDATIONS_WORKERS,
+        )
+    else:
+        results = score_users(matrix, user_similarity, user_positions)
+
+    # Se actualizan los registros en DynamoDB
+    with dynamodb.RecommendationsWriter(
+        dynamodb.get_recommendations_table(),
+        background=WRITE_RECOMMENDATIONS_IN_BACKGROUND,
+    ) as writer:
+        for users_scored, (user_position, positions) in enumerate(results, start=1):
+            writer.put(
+                user_id=user_ids[user_position].item(),
+                attraction_ids=attraction_ids[positions].tolist(),
+            )
+            on_progress(users_scored=users_scored)
+
+        on_progress(phase="writing")
+
+    users_updated = writer.items_written
+
+    try:
+        snapshot.save_snapshot(
+            matrix,
+            user_ids,
+            attraction_ids,
+            item_neighbours=build_item_neighbours(matrix),
+            factors=factors,
+        )
+    except OSError as error:
+        Logger().err(f"Could not save the recommendations snapshot: {error}")
+
+    crud.add_recommendation_run(
+        db=db,
+        started_at=started_at,
+        incremental=incremental,
+        users_updated=users_updated,
     )
 
-    dynamodb = session.resource("dynamodb", region_name="us-east-2")
 
-    table_name = "recommendations"
-    table = dynamodb.Table(table_name)
+def update_recommendations(user_id: int, attractions_ids: List[str]):
+    table = dynamodb.get_recommendations_table()
 
     item_data = {
         "user_id": user_id,
@@ -228,70 +511,263 @@ def update_recommendations(user_id: int, attractions_ids: List[str]):
     table.put_item(Item=item_data)
 
 
+# Arma la fila de scores actual de un usuario alineada con las columnas de un
+# modelo (snapshot o modelo de ciudad) a partir de sus filas (user_id,
+# attraction_id, score) de la base. Las atracciones que no están en el modelo no
+# se pueden recomendar ni comparar.
+def build_user_row(model, rows):
+    user_row = np.zeros(len(model.attraction_ids), dtype=np.float32)
+    positions = model.attraction_positions(
+        [str(attraction_id) for _, attraction_id, _ in rows]
+    )
+    for position, (_, _, score) in zip(positions, rows):
+        if position is not None:
+            user_row[position] = score
+    return user_row
+
+
+# Calcula las recomendaciones de un usuario a partir de su fila de scores
+# actualizada, comparándola con la matriz del último snapshot. Devuelve None si
+# el usuario no tiene usuarios similares.
+def score_user_row(matrix, row_norms, user_row, user_position=None):
+    user_norm = np.linalg.norm(user_row)
+    if user_norm == 0:
+        return None
+
+    norms = row_norms * user_norm
+    user_similarity = np.divide(
+        matrix @ user_row, norms, out=np.zeros(len(norms)), where=norms != 0
+    )
+
+    # Se buscan usuarios similares excluyendo al propio usuario
+    if user_position is not None:
+        user_similarity[user_position] = 0
+
+    if N_SIMILAR_USERS:
+        user_similarity = keep_top_k(user_similarity[np.newaxis, :], N_SIMILAR_USERS)[0]
+
+    neighbours = np.flatnonzero(user_similarity)
+    if len(neighbours) == 0:
+        return None
+
+    scores = np.asarray(matrix[neighbours].T @ user_similarity[neighbours]).ravel()
+
+    # Se descartan las atracciones con las cuales el usuario ya interactuó
+    scores[user_row != 0] = -np.inf
+
+    return top_n_positions(scores[np.newaxis, :], N_RECOMMENDATIONS)[0]
+
+
+# Recalcula las recomendaciones de un único usuario con sus interacciones actuales
+# y el modelo del último snapshot, sin hacer una corrida completa. Devuelve True
+# si se actualizaron.
+def refresh_user_recommendations(user_id: int) -> bool:
+    model = snapshot.load_snapshot(
+        max_age=datetime.timedelta(seconds=SNAPSHOT_MAX_AGE)
+    )
+    if model is None:
+        return False
+
+    db = get_db_session()
+    try:
+        interactions = crud.number_of_interactions_of_users(
+            db=db, user_ids=[user_id]
+        ).get(user_id, 0)
+        if interactions < MINIMUM_NUMBER_OF_INTERACTIONS:
+            return False
+
+        rows = crud.get_interaction_scores(db=db, user_id=user_id).all()
+    finally:
+        db.close()
+
+    user_row = build_user_row(model, rows)
+
+    if RECOMMENDATIONS_ENGINE == "als" and model.item_factors is not None:
+        scores = model.item_factors @ factorization.fold_in(
+            user_row[np.newaxis, :], model.item_factors
+        )
+        scores[user_row != 0] = -np.inf
+        positions = top_n_positions(scores[np.newaxis, :], N_RECOMMENDATIONS)[0]
+    else:
+        positions = score_user_row(
+            model.matrix, model.row_norms(), user_row, model.user_position(user_id)
+        )
+
+    if positions is None:
+        return False
+
+    update_recommendations(
+        user_id=user_id,
+        attractions_ids=np.asarray(model.attraction_ids[positions]).tolist(),
+    )
+
+    return True
+
+
 def get_recommendations_for_user_in_city(db: Session, user_id: int, city: str):
-    df = get_merged_df(db=db)
+    model = snapshot.load_snapshot(
+        max_age=datetime.timedelta(seconds=SNAPSHOT_MAX_AGE)
+    )
 
-    df_attractions = pd.DataFrame(
-        (
-            db.query(models.Attractions.attraction_id, models.Attractions.city)
-            .filter(
-                models.Attractions.city == city,
+    if PLAN_RECOMMENDER in ("item", "als") and model is not None:
+        # Las interacciones del usuario se leen de la base y no del snapshot, que
+        # puede no tener las más recientes
+        user_row = build_user_row(
+            model, crud.get_interaction_scores(db=db, user_id=user_id).all()
+        )
+
+        if (
+            PLAN_RECOMMENDER == "item"
+            and model.item_neighbours is not None
+            and user_row.any()
+        ):
+            return get_item_based_recommendations_in_city(
+                db=db, model=model, user_row=user_row, city=city
             )
-            .all()
-        ),
-        columns=["attraction_id", "city"],
+
+        if (
+            PLAN_RECOMMENDER == "als"
+            and model.item_factors is not None
+            and user_row.any()
+        ):
+            return get_factor_recommendations_in_city(
+                db=db, model=model, user_row=user_row, city=city
+            )
+
+    # El modelo de la ciudad se guarda en memoria y se reconstruye cuando cambia
+    # el snapshot del sistema de recomendación o pasa CITY_MODEL_TTL
+    city_model = city_models.get_city_model(
+        city,
+        build=lambda: build_city_model(db=db, city=city, model=model),
+        watermark=model.directory if model is not None else None,
+    )
+
+    # Las interacciones del usuario se leen de la base y no del modelo, que puede
+    # no tener las más recientes. Con ellas se buscan los usuarios similares y se
+    # descartan las atracciones con las que ya interactuó.
+    user_row = build_user_row(
+        city_model,
+        crud.get_interaction_scores(db=db, user_id=user_id, city=city).all(),
     )
 
-    df_attractions["attraction_id"] = df_attractions["attraction_id"].astype(str)
-    df["attraction_id"] = df["attraction_id"].astype(str)
+    Logger().debug(msg=f"Start computing cosine similarity")
 
-    df = pd.merge(
-        df.reset_index(drop=True),
-        df_attractions.reset_index(drop=True),
-        on="attraction_id",
-        how="inner",
+    positions = score_user_row(
+        city_model.matrix,
+        city_model.row_norms,
+        user_row,
+        city_model.user_position(user_id),
     )
+    if positions is None:
+        Logger().debug(msg=f"User {user_id} has no similar users in {city}")
+        return []
 
-    # Matriz usuarios-atracciones
-    matrix = df.pivot(index="user_id", columns="attraction_id", values="score")
+    return city_model.attraction_ids[positions].tolist()
 
-    # Se rellenan los nulos
-    matrix = matrix.fillna(FILLNA_VALUE)
 
-    Logger().debug(msg=f"Start computing cosine similarity")
+# Suma las listas de vecinos de las atracciones con las que interactuó el usuario,
+# cada una ponderada por su score. Solo se recorren los k vecinos de cada
+# atracción, por lo que el costo no depende de la cantidad de usuarios. Devuelve
+# las posiciones de las atracciones candidatas y sus scores, sin incluir aquellas
+# con las que el usuario ya interactuó.
+def score_items(item_neighbours, user_row):
+    scores = (user_row @ item_neighbours).tocsr()
+    scores.sum_duplicates()
 
-    # Se calcula la similitud coseno del usuario con el resto de los usuarios
-    user_similarity = cosine_similarity([matrix.loc[user_id]], matrix)
+    candidates = ~np.isin(scores.indices, user_row.indices)
 
-    user_similarity_df = pd.DataFrame(
-        {"user_id": matrix.index, "similarity_score": user_similarity[0]}
-    ).set_index("user_id")
+    return scores.indices[candidates], scores.data[candidates]
 
-    # Se obtienen los ratings hechos por el usuario actual
-    user_ratings = matrix.loc[user_id]
 
-    # Se buscan usuarios similares utilizando a los que tengan mayor similitud coseno
-    similar_users = user_similarity_df.sort_values(
-        by="similarity_score", ascending=False
+# Recomienda atracciones de la ciudad usando el índice item-item del snapshot y
+# la fila de scores actual del usuario
+def get_item_based_recommendations_in_city(db: Session, model, user_row, city: str):
+    Logger().debug(msg=f"Using item neighbours from snapshot {model.created_at}")
+
+    positions, scores = score_items(
+        model.item_neighbours, sparse.csr_matrix(user_row[np.newaxis, :])
     )
 
-    # Se genera un vector de ceros donde se almacenarán los scores predichos
-    scores = np.zeros(matrix.shape[1])
+    city_attraction_ids = [
+        attraction_id
+        for (attraction_id,) in db.query(models.Attractions.attraction_id)
+        .filter(models.Attractions.city == city)
+        .all()
+    ]
+
+    candidate_ids = np.asarray(model.attraction_ids[positions])
+    in_city = np.isin(candidate_ids, city_attraction_ids)
+
+    best = top_n_positions(scores[in_city][np.newaxis, :], N_RECOMMENDATIONS)[0]
+
+    return candidate_ids[in_city][best].tolist()
 
-    # Se recorren todos los usuarios eliminando el primero por ser el propio usuario con similitud=1
-    for similar_user in similar_users.index[1:]:
-        similarity_score = user_similarity_df.loc[similar_user]["similarity_score"]
-        similar_user_ratings = matrix.loc[similar_user]
-        scores += similarity_score * similar_user_ratings
 
-    scores = pd.Series(scores, index=matrix.columns)
+# Recomienda atracciones de la ciudad con los factores ALS del snapshot: un único
+# producto entre los factores de las atracciones de la ciudad y los del usuario.
+# Los del usuario se calculan con su fila de scores actual en lugar de usar los
+# del snapshot.
+def get_factor_recommendations_in_city(db: Session, model, user_row, city: str):
+    Logger().debug(msg=f"Using factors from snapshot {model.created_at}")
 
-    # Se eliminan las atracciones con las cuales el usuario ya interactuó
-    scores = scores[user_ratings == 0]
+    city_attraction_ids = [
+        attraction_id
+        for (attraction_id,) in db.query(models.Attractions.attraction_id)
+        .filter(models.Attractions.city == city)
+        .all()
+    ]
 
-    # Se toman las N_RECOMMENDATIONS con mayor score
-    recommendations = (
-        scores.sort_values(ascending=False).head(N_RECOMMENDATIONS).index.tolist()
+    columns = np.flatnonzero(np.isin(model.attraction_ids, city_attraction_ids))
+
+    user_factors = factorization.fold_in(user_row[np.newaxis, :], model.item_factors)
+    scores = model.item_factors[columns] @ user_factors
+
+    # Se descartan las atracciones con las cuales el usuario ya interactuó
+    scores[user_row[columns] != 0] = -np.inf
+
+    best = top_n_positions(scores[np.newaxis, :], N_RECOMMENDATIONS)[0]
+
+    return np.asarray(model.attraction_ids[columns[best]]).tolist()
+
+
+# Construye el modelo de una ciudad con las columnas de sus atracciones en el
+# snapshot y los usuarios que interactuaron con ellas. Si no hay un snapshot
+# reciente se arma desde la base.
+def build_city_model(db: Session, city: str, model=None):
+    if model is None:
+        return city_models.CityModel(*build_city_matrix(db=db, city=city))
+
+    Logger().debug(msg=f"Using recommendations snapshot from {model.created_at}")
+
+    city_attraction_ids = [
+        attraction_id
+        for (attraction_id,) in db.query(models.Attractions.attraction_id)
+        .filter(models.Attractions.city == city)
+        .all()
+    ]
+
+    columns = np.flatnonzero(np.isin(model.attraction_ids, city_attraction_ids))
+    matrix = model.matrix[:, columns]
+
+    # Igual que al construirla desde la base, solo se dejan los usuarios con
+    # interacciones en la ciudad
+    rows = np.flatnonzero(np.diff(matrix.indptr))
+
+    return city_models.CityModel(
+        matrix[rows],
+        np.asarray(model.user_ids[rows]),
+        np.asarray(model.attraction_ids[columns]),
     )
 
-    return recommendations
+
+# Construye desde la base la matriz usuarios-atracciones de una ciudad, cargando
+# solo los scores de las atracciones de la ciudad. Devuelve la matriz y los ids
+# de sus usuarios y atracciones.
+def build_city_matrix(db: Session, city: str):
+    df = pd.DataFrame(
+        crud.get_interaction_scores(db=db, city=city).all(),
+        columns=["user_id", "attraction_id", "score"],
+    )
+
+    # Matriz usuarios-atracciones
+    return build_interaction_matrix(df)
@@ -0,0 +1,174 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from app.db import crud, database
+from app.services import sentiment
+from app.services.constants import (
+    RESCORING_CHUNK_SIZE,
+    RESCORING_WATERMARK_FILE,
+    RESCORING_WORKERS,
+)
+from app.services.logger import Logger
+from app.services.translations import normalize_text
+
+
+def _score_texts(texts: List[str]) -> List[float]:
+    return sentiment.get_sentiment_service().score_batch(texts)
+
+
+def read_watermark(watermark_file: str) -> int:
+    try:
+        with open(watermark_file) as file:
+            return int(file.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_watermark(watermark_file: str, comment_id: int):
+    os.makedirs(os.path.dirname(os.path.abspath(watermark_file)), exist_ok=True)
+    partial = f"{watermark_file}.tmp"
+    with open(partial, "w") as file:
+        file.write(str(comment_id))
+    os.replace(partial, watermark_file)
+
+
+def _score_unique_texts(executor, texts: List[str], workers: int) -> List[float]:
+    # Una tanda con todos los comentarios en NULL no tiene textos que puntuar
+    if not texts:
+        return []
+
+    if executor is None:
+        return _score_texts(texts)
+
+    size = -(-len(texts) // workers)
+    parts = [texts[start : start + size] for start in range(0, len(texts), size)]
+    return [metric for metrics in executor.map(_score_texts, parts) for metric in metrics]
+
+
+# Recalcula el sentimiento de todos los comentarios guardados, por ejemplo después
+# de cambiar cómo se calcula. Lee los comentarios en tandas de chunk_size ordenadas
+# por comment_id, puntúa una única vez cada texto distinto repartiéndolos en un
+# pool de workers procesos y guarda cada tanda con un único UPDATE. Después de
+# cada tanda guarda el último comment_id en watermark_file, así una corrida
+# interrumpida se retoma desde ahí; al terminar se borra el archivo.
+def rescore_comments(
+    db: Session,
+    workers: int = RESCORING_WORKERS,
+    chunk_size: int = RESCORING_CHUNK_SIZE,
+    watermark_file: str = RESCORING_WATERMARK_FILE,
+    restart: bool = False,
+):
+    start = time.perf_counter()
+    watermark = 0 if restart else read_watermark(watermark_file)
+    rescored = unique_texts = 0
+
+    if watermark:
+        Logger().info(msg=f"Resuming sentiment rescoring after comment {watermark}")
+
+    executor = (
+        ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+        )
+        if workers > 1
+        else None
+    )
+
+    try:
+        while True:
+            comments = crud.get_comments_after(
+                db=db, after_comment_id=watermark, limit=chunk_size
+            )
+            if not comments:
+                break
+
+            chunk_start = time.perf_counter()
+
+            # Los comentarios que solo difieren en espacios comparten la traducción
+            # y por lo tanto el sentimiento
+            texts = list(
+                dict.fromkeys(
+                    normalize_text(comment)
+                    for _, comment in comments
+                    if comment is not None
+                )
+            )
+            metrics = dict(zip(texts, _score_unique_texts(executor, texts, workers)))
+
+            crud.update_sentiment_metrics(
+                db=db,
+                scored_comments=[
+                    (comment_id, comment, metrics[normalize_text(comment)])
+                    for comment_id, comment in comments
+                    if comment is not None
+                ],
+            )
+
+            watermark = comments[-1][0]
+            write_watermark(watermark_file, watermark)
+
+            rescored += len(comments)
+            unique_texts += len(texts)
+            elapsed = time.perf_counter() - chunk_start
+
+            Logger().info(
+                msg=f"Rescored {len(comments)} comments ({len(texts)} distinct texts) up to comment {watermark} in {elapsed:.2f}s, {len(comments) / elapsed:.0f} comments/s"
+            )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if os.path.exists(watermark_file):
+        os.remove(watermark_file)
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "comments": rescored,
+        "distinct_texts": unique_texts,
+        "elapsed_seconds": round(elapsed, 3),
+        "comments_per_second": round(rescored / elapsed, 1) if elapsed else 0.0,
+    }
+
+    Logger().info(
+        msg=f"Rescored {rescored} comments in {elapsed:.2f}s ({report['comments_per_second']} comments/s). Run the recommendation system to use the new sentiment."
+    )
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recalcula el sentimiento de todos los comentarios guardados"
+    )
+    parser.add_argument("--workers", type=int, default=RESCORING_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=RESCORING_CHUNK_SIZE)
+    parser.add_argument("--watermark-file", default=RESCORING_WATERMARK_FILE)
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignora el watermark guardado y empieza desde el primer comentario",
+    )
+    args = parser.parse_args()
+
+    db = database.get_db_session()
+    try:
+        print(
+            rescore_comments(
+                db=db,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                watermark_file=args.watermark_file,
+                restart=args.restart,
+            )
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import threading
+from typing import List
+
+import nltk
+from deep_translator import GoogleTranslator
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+from app.services import language
+from app.services.constants import VADER_LEXICON
+from app.services.logger import Logger
+from app.services.translations import TranslationCache
+
+_lock = threading.Lock()
+_service = None
+
+
+# Carga VADER con el léxico instalado localmente (la imagen lo descarga al
+# construirse). Solo si no está se descarga, una única vez.
+def load_analyzer() -> SentimentIntensityAnalyzer:
+    try:
+        return SentimentIntensityAnalyzer(lexicon_file=VADER_LEXICON)
+    except LookupError:
+        Logger().info(msg="VADER lexicon not found locally, downloading it")
+        nltk.download("vader_lexicon", quiet=True)
+        return SentimentIntensityAnalyzer(lexicon_file=VADER_LEXICON)
+
+
+# Convierte los puntajes de VADER en la métrica de sentimiento de un comentario:
+# el puntaje positivo si predomina, el negativo con signo menos si predomina ese,
+# o 0 si empatan
+def sentiment_metric(polarity_scores) -> float:
+    positive, negative = (
+        polarity_scores["pos"],
+        polarity_scores["neg"],
+    )
+
+    if positive > negative:
+        return positive
+    elif positive < negative:
+        return -negative
+    else:
+        return 0
+
+
+# Calcula el sentimiento de comentarios traduciéndolos al inglés y analizándolos
+# con VADER. El analizador carga el léxico una única vez y se comparte; cada hilo
+# usa su propio traductor porque GoogleTranslator guarda estado en cada pedido.
+# Los comentarios que ya están en inglés no se traducen; el resto pasa por
+# translation_cache antes de llamar al traductor.
+class SentimentService:
+    def __init__(self, translation_cache: TranslationCache = None):
+        self.analyzer = load_analyzer()
+        self.translation_cache = translation_cache or TranslationCache()
+        self.bypassed = 0
+        self.translated = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def translator(self) -> GoogleTranslator:
+        if not hasattr(self._local, "translator"):
+            self._local.translator = GoogleTranslator(source="auto", target="en")
+        return self._local.translator
+
+    def score(self, text: str) -> float:
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        texts = list(texts)
+        english = [language.is_english(text) for text in texts]
+        to_translate = [
+            text for text, is_english in zip(texts, english) if not is_english
+        ]
+
+        translations = iter(
+            self.translation_cache.translate_batch(
+                to_translate, self.translator.translate_batch
+            )
+            if to_translate
+            else []
+        )
+
+        with self._lock:
+            self.bypassed += len(texts) - len(to_translate)
+            self.translated += len(to_translate)
+
+        return [
+            sentiment_metric(
+                self.analyzer.polarity_scores(
+                    text if is_english else next(translations)
+                )
+            )
+            for text, is_english in zip(texts, english)
+        ]
+
+    # Cantidad de comentarios que se analizaron sin traducir por estar en inglés,
+    # junto con las estadísticas de la cache de traducciones
+    def stats(self):
+        with self._lock:
+            scored = self.bypassed + self.translated
+            return {
+                **self.translation_cache.stats(),
+                "translation_bypassed": self.bypassed,
+                "bypass_rate": self.bypassed / scored if scored else 0.0,
+            }
+
+
+# Devuelve el servicio de sentimiento del proceso, creándolo la primera vez
+def get_sentiment_service() -> SentimentService:
+    global _service
+
+    with _lock:
+        if _service is None:
+            _service = SentimentService()
+        return _service
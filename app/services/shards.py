@@ -0,0 +1,74 @@
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from app.services.constants import SHARDS_PER_WORKER
+from app.services.logger import Logger
+from app.services.similarity import BlockwiseSimilarity
+from app.services.snapshot import load_csr, save_csr
+
+# Matrices de solo lectura de cada proceso del pool, cargadas una única vez
+# al iniciar el proceso
+_matrix = None
+_user_similarity = None
+
+
+def _init_worker(directory: str, matrix_shape, user_similarity_shape, blockwise):
+    global _matrix, _user_similarity
+    _matrix = load_csr(directory, "matrix", matrix_shape)
+    _user_similarity = load_csr(directory, "user_similarity", user_similarity_shape)
+
+    if blockwise:
+        _user_similarity = BlockwiseSimilarity(_user_similarity)
+
+
+def _score_shard(score_function, shard_id: int, user_positions):
+    start = time.perf_counter()
+    results = list(score_function(_matrix, _user_similarity, user_positions))
+    return shard_id, results, time.perf_counter() - start
+
+
+# Reparte los usuarios en shards y los puntúa en un pool de procesos. La matriz
+# de interacciones y la de similitudes se comparten como archivos mapeados en
+# memoria en lugar de enviarse a cada proceso. Si la similitud se calcula por
+# bloques se comparten sus filas normalizadas y cada proceso calcula sus bloques.
+# Los procesos se crean con forkserver y no con fork, porque el proceso que los
+# lanza puede tener otros hilos con locks tomados (pool de la base, logging).
+# Devuelve los resultados de score_function a medida que se completa cada shard.
+def score_in_shards(score_function, matrix, user_similarity, user_positions, workers):
+    user_shards = [
+        shard
+        for shard in np.array_split(
+            np.asarray(user_positions, dtype=np.int64), workers * SHARDS_PER_WORKER
+        )
+        if len(shard) > 0
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        blockwise = isinstance(user_similarity, BlockwiseSimilarity)
+
+        save_csr(directory, "matrix", matrix)
+        if blockwise:
+            user_similarity = user_similarity.normalized
+        save_csr(directory, "user_similarity", user_similarity)
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_worker,
+            initargs=(directory, matrix.shape, user_similarity.shape, blockwise),
+        ) as executor:
+            futures = [
+                executor.submit(_score_shard, score_function, shard_id, shard)
+                for shard_id, shard in enumerate(user_shards)
+            ]
+
+            for future in as_completed(futures):
+                shard_id, results, elapsed = future.result()
+                Logger().info(
+                    msg=f"Shard {shard_id + 1}/{len(user_shards)} scored {len(results)} users in {elapsed:.2f}s"
+                )
+                yield from results
@@ -0,0 +1,283 @@
+import time
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from app.services.constants import (
+    LSH_BUCKET_SIZE,
+    LSH_MAX_BUCKET_SIZE,
+    LSH_NEIGHBOURS,
+    LSH_TABLES,
+    RECOMMENDATIONS_MEMORY_BUDGET_MB,
+)
+from app.services.logger import Logger
+
+
+# Similitud coseno exacta de todos los usuarios con todos
+def exact_user_similarity(matrix):
+    return cosine_similarity(matrix, dense_output=False).tocsr()
+
+
+# Similitud coseno exacta que nunca se arma completa: al indexarla con un bloque
+# de filas se calcula la similitud de esas filas con todas, en float32, a partir
+# de las filas normalizadas.
+class BlockwiseSimilarity:
+    def __init__(self, normalized):
+        self.normalized = normalized.tocsr()
+        self._normalized_t = self.normalized.T.tocsr()
+        self.shape = (normalized.shape[0], normalized.shape[0])
+
+    def __getitem__(self, positions):
+        return (self.normalized[positions] @ self._normalized_t).tocsr()
+
+
+def blockwise_user_similarity(matrix):
+    return BlockwiseSimilarity(
+        normalize(matrix, norm="l2", axis=1).astype(np.float32)
+    )
+
+
+# Cantidad de filas por bloque para que un bloque de bytes_per_row bytes por fila
+# entre en RECOMMENDATIONS_MEMORY_BUDGET_MB
+def block_size(bytes_per_row: int) -> int:
+    return max(1, RECOMMENDATIONS_MEMORY_BUDGET_MB * 1024 * 1024 // bytes_per_row)
+
+
+# Recorre las filas de la similitud en bloques que entren en la memoria
+# disponible. Devuelve la posición de la primera fila de cada bloque y el bloque.
+def iter_blocks(user_similarity, positions=None):
+    if positions is None:
+        positions = np.arange(user_similarity.shape[0])
+
+    # El bloque puede quedar denso: 4 bytes del valor y 4 del índice por columna
+    size = block_size(8 * user_similarity.shape[1])
+
+    for start in range(0, len(positions), size):
+        yield start, user_similarity[positions[start : start + size]].tocsr()
+
+
+# Cantidad de hiperplanos para que n_users usuarios queden repartidos en grupos
+# de bucket_size usuarios en promedio: cada hiperplano duplica los grupos
+def lsh_planes(n_users: int, bucket_size: int = LSH_BUCKET_SIZE) -> int:
+    return max(0, int(np.ceil(np.log2(max(n_users, 1) / bucket_size))))
+
+
+# Une los candidatos de cada usuario con los de una nueva tabla. Cada fila tiene
+# las columnas (-1 si no hay candidato) y similitudes (-inf) de hasta k
+# candidatos. Los repetidos se dejan una sola vez y se conservan los k más
+# similares.
+def _merge_candidates(columns, values, table_columns, table_values):
+    k = columns.shape[1]
+
+    columns = np.concatenate([columns, table_columns], axis=1)
+    values = np.concatenate([values, table_values], axis=1)
+
+    order = np.argsort(columns, axis=1, kind="stable")
+    columns = np.take_along_axis(columns, order, axis=1)
+    values = np.take_along_axis(values, order, axis=1)
+
+    repeated = (columns[:, 1:] == columns[:, :-1]) & (columns[:, 1:] >= 0)
+    values[:, 1:][repeated] = -np.inf
+
+    top = np.argpartition(-values, k - 1, axis=1)[:, :k]
+    columns = np.take_along_axis(columns, top, axis=1)
+    values = np.take_along_axis(values, top, axis=1)
+    columns[np.isneginf(values)] = -1
+
+    return columns, values
+
+
+# Similitud coseno aproximada usando LSH con hiperplanos aleatorios. En cada una
+# de las n_tables tablas se proyectan los usuarios sobre n_planes hiperplanos y
+# se agrupan por el signo de cada proyección; solo se calcula la similitud entre
+# usuarios que caen en el mismo grupo en al menos una tabla. Sin indicar
+# n_planes se usan los necesarios para que los grupos tengan LSH_BUCKET_SIZE
+# usuarios en promedio, y los que superan max_bucket_size se parten, así el
+# trabajo de cada tabla crece linealmente con la cantidad de usuarios. De cada
+# usuario se guardan sus n_neighbours candidatos más similares, uniendo los de
+# cada tabla a medida que se calculan.
+def lsh_user_similarity(
+    matrix,
+    n_planes: Optional[int] = None,
+    n_tables: int = LSH_TABLES,
+    max_bucket_size: int = LSH_MAX_BUCKET_SIZE,
+    n_neighbours: int = LSH_NEIGHBOURS,
+    seed: int = 0,
+):
+    n_users = matrix.shape[0]
+    normalized = normalize(matrix, norm="l2", axis=1).astype(np.float32).tocsr()
+
+    # Los usuarios sin interacciones tienen similitud cero con todos
+    active_users = np.flatnonzero(np.diff(normalized.indptr))
+
+    if n_planes is None:
+        n_planes = lsh_planes(len(active_users))
+
+    rng = np.random.default_rng(seed)
+
+    columns = np.full((n_users, n_neighbours), -1, dtype=np.int64)
+    values = np.full((n_users, n_neighbours), -np.inf, dtype=np.float32)
+
+    for _ in range(n_tables):
+        planes = rng.standard_normal((matrix.shape[1], n_planes)).astype(np.float32)
+
+        signs = np.asarray(normalized[active_users] @ planes) > 0
+
+        # Cada combinación de signos se codifica como un entero de n_planes bits.
+        # Los usuarios se mezclan para que los grupos grandes se partan al azar.
+        buckets = signs @ (1 << np.arange(n_planes, dtype=np.int64))
+        shuffled = rng.permutation(len(active_users))
+
+        order = shuffled[np.argsort(buckets[shuffled], kind="stable")]
+        boundaries = np.flatnonzero(np.diff(buckets[order])) + 1
+
+        table_columns = np.full_like(columns, -1)
+        table_values = np.full_like(values, -np.inf)
+
+        for bucket in np.split(active_users[order], boundaries):
+            for part in np.array_split(bucket, -(-len(bucket) // max_bucket_size)):
+                if len(part) < 2:
+                    continue
+
+                part_vectors = normalized[part]
+                part_similarity = (part_vectors @ part_vectors.T).toarray()
+                np.fill_diagonal(part_similarity, 0)
+                part_similarity[part_similarity == 0] = -np.inf
+
+                # Solo los n_neighbours más similares de cada usuario del grupo
+                k = min(n_neighbours, len(part) - 1)
+                neighbours = np.argpartition(-part_similarity, k - 1, axis=1)[:, :k]
+
+                table_columns[part, :k] = part[neighbours]
+                table_values[part, :k] = np.take_along_axis(
+                    part_similarity, neighbours, axis=1
+                )
+
+        table_columns[np.isneginf(table_values)] = -1
+
+        # Un mismo par puede aparecer en varias tablas, se deja una sola vez
+        columns, values = _merge_candidates(
+            columns, values, table_columns, table_values
+        )
+
+    is_neighbour = columns >= 0
+    rows = np.repeat(np.arange(n_users), n_neighbours).reshape(columns.shape)
+
+    # Cada usuario tiene similitud 1 consigo mismo
+    rows = np.concatenate([rows[is_neighbour], active_users])
+    columns = np.concatenate([columns[is_neighbour], active_users])
+    values = np.concatenate(
+        [values[is_neighbour], np.ones(len(active_users), dtype=np.float32)]
+    )
+
+    return sparse.csr_matrix((values, (rows, columns)), shape=(n_users, n_users))
+
+
+# Similitud coseno exacta de todas las atracciones con todas, a partir de las
+# columnas de la matriz de interacciones, calculada por bloques
+def item_similarity(matrix):
+    return blockwise_user_similarity(matrix.T)
+
+
+SIMILARITY_BACKENDS = {
+    "blockwise": blockwise_user_similarity,
+    "exact": exact_user_similarity,
+    "lsh": lsh_user_similarity,
+}
+
+
+def get_user_similarity(matrix, backend: str = "exact"):
+    if backend not in SIMILARITY_BACKENDS:
+        raise ValueError(f"Unknown similarity backend: {backend}")
+    return SIMILARITY_BACKENDS[backend](matrix)
+
+
+# Compara el backend LSH contra la similitud exacta. Devuelve el tiempo de cada
+# uno y el recall de los k vecinos más similares de cada usuario.
+def similarity_report(matrix, k: int = 10, **lsh_params):
+    start = time.perf_counter()
+    exact = exact_user_similarity(matrix)
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approximate = lsh_user_similarity(matrix, **lsh_params)
+    lsh_seconds = time.perf_counter() - start
+
+    found, total = 0, 0
+    for user_position in range(matrix.shape[0]):
+        exact_neighbours = top_k_neighbours(exact, user_position, k)
+        approximate_neighbours = top_k_neighbours(approximate, user_position, k)
+
+        found += len(np.intersect1d(exact_neighbours, approximate_neighbours))
+        total += len(exact_neighbours)
+
+    report = {
+        "exact_seconds": exact_seconds,
+        "lsh_seconds": lsh_seconds,
+        "recall": found / total if total else 1.0,
+        "exact_pairs": exact.nnz,
+        "lsh_pairs": approximate.nnz,
+    }
+
+    Logger().info(
+        msg=f"Similarity report: exact {exact_seconds:.2f}s, lsh {lsh_seconds:.2f}s, recall@{k} {report['recall']:.3f}"
+    )
+
+    return report
+
+
+# Devuelve las posiciones de los k usuarios más similares a un usuario,
+# excluyéndolo a él y a los usuarios con similitud cero
+def top_k_neighbours(user_similarity, user_position: int, k: int):
+    row = user_similarity.getrow(user_position)
+    is_neighbour = (row.indices != user_position) & (row.data != 0)
+
+    neighbours = row.indices[is_neighbour]
+    similarities = row.data[is_neighbour]
+
+    return neighbours[np.argsort(-similarities, kind="stable")[:k]]
+
+
+# Devuelve una matriz CSR con, para cada usuario, la similitud con sus k usuarios
+# más similares (sin incluirlo a él mismo). Con k=None se dejan todos. La
+# similitud se recorre por bloques, por lo que puede ser una BlockwiseSimilarity.
+def neighbours_matrix(user_similarity, k: Optional[int]):
+    rows, columns, values = [], [], []
+
+    for start, block in iter_blocks(user_similarity):
+        for block_row in range(block.shape[0]):
+            user_position = start + block_row
+
+            neighbours = block.indices[
+                block.indptr[block_row] : block.indptr[block_row + 1]
+            ]
+            similarities = block.data[
+                block.indptr[block_row] : block.indptr[block_row + 1]
+            ]
+
+            is_neighbour = (neighbours != user_position) & (similarities != 0)
+            neighbours = neighbours[is_neighbour]
+            similarities = similarities[is_neighbour]
+
+            if k and len(neighbours) > k:
+                top = np.argpartition(-similarities, k - 1)[:k]
+                neighbours = neighbours[top]
+                similarities = similarities[top]
+
+            rows.append(np.full(len(neighbours), user_position))
+            columns.append(neighbours)
+            values.append(similarities)
+
+    if not rows:
+        return sparse.csr_matrix(user_similarity.shape, dtype=np.float32)
+
+    return sparse.csr_matrix(
+        (
+            np.concatenate(values).astype(np.float32),
+            (np.concatenate(rows), np.concatenate(columns)),
+        ),
+        shape=user_similarity.shape,
+    )
@@ -0,0 +1,189 @@
+import datetime
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from app.services.constants import SNAPSHOT_DIR, SNAPSHOT_KEEP
+from app.services.logger import Logger
+
+CSR_PARTS = ["data", "indices", "indptr"]
+
+CURRENT = "current"
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+# Guarda las partes de una matriz CSR como archivos .npy dentro de directory
+def save_csr(directory: str, name: str, matrix):
+    for part in CSR_PARTS:
+        np.save(os.path.join(directory, f"{name}_{part}.npy"), getattr(matrix, part))
+
+
+# Carga una matriz CSR guardada con save_csr mapeando los archivos en memoria,
+# de forma que todos los procesos comparten las mismas páginas sin copiarlas
+def load_csr(directory: str, name: str, shape):
+    data, indices, indptr = [
+        np.load(os.path.join(directory, f"{name}_{part}.npy"), mmap_mode="r")
+        for part in CSR_PARTS
+    ]
+    return sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+# Modelo de recomendación guardado en disco: los ids de usuarios y atracciones
+# de cada fila y columna, la matriz de interacciones y opcionalmente la matriz
+# con las atracciones más similares a cada atracción y los factores de la
+# factorización ALS. Todo se carga mapeado en memoria.
+class Snapshot:
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "metadata.json")) as file:
+            metadata = json.load(file)
+
+        self.directory = directory
+        self.created_at = datetime.datetime.fromisoformat(metadata["created_at"])
+
+        self.user_ids = np.load(os.path.join(directory, "user_ids.npy"), mmap_mode="r")
+        self.attraction_ids = np.load(
+            os.path.join(directory, "attraction_ids.npy"), mmap_mode="r"
+        )
+        self.matrix = load_csr(directory, "matrix", metadata["matrix_shape"])
+
+        self._row_norms = None
+        self._attraction_index = None
+
+        self.item_neighbours = None
+        if metadata.get("item_neighbours_shape"):
+            self.item_neighbours = load_csr(
+                directory, "item_neighbours", metadata["item_neighbours_shape"]
+            )
+
+        self.user_factors, self.item_factors = None, None
+        if metadata.get("factors"):
+            self.user_factors = np.load(
+                os.path.join(directory, "user_factors.npy"), mmap_mode="r"
+            )
+            self.item_factors = np.load(
+                os.path.join(directory, "item_factors.npy"), mmap_mode="r"
+            )
+
+    # Norma de cada fila de la matriz, calculada la primera vez que se pide
+    def row_norms(self):
+        if self._row_norms is None:
+            self._row_norms = np.sqrt(
+                np.asarray(self.matrix.multiply(self.matrix).sum(axis=1)).ravel()
+            )
+        return self._row_norms
+
+    # Devuelve la columna de cada atracción o None si no está en el snapshot
+    def attraction_positions(self, attraction_ids):
+        if self._attraction_index is None:
+            self._attraction_index = pd.Index(np.asarray(self.attraction_ids))
+
+        positions = self._attraction_index.get_indexer(list(attraction_ids))
+        return [int(position) if position >= 0 else None for position in positions]
+
+    def age(self) -> datetime.timedelta:
+        return datetime.datetime.utcnow() - self.created_at
+
+    # Devuelve la fila del usuario en la matriz o None si no está en el snapshot.
+    # Los user_ids se guardan ordenados.
+    def user_position(self, user_id: int):
+        position = int(np.searchsorted(self.user_ids, user_id))
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return position
+        return None
+
+
+# Guarda un nuevo snapshot en un directorio propio y luego apunta el enlace
+# "current" a él de forma atómica, así los lectores nunca ven uno a medio escribir
+def save_snapshot(
+    matrix,
+    user_ids,
+    attraction_ids,
+    item_neighbours=None,
+    factors=None,
+    base=SNAPSHOT_DIR,
+):
+    os.makedirs(base, exist_ok=True)
+
+    created_at = datetime.datetime.utcnow()
+    name = f"snapshot-{created_at.strftime('%Y%m%d%H%M%S%f')}"
+    directory = os.path.join(base, name)
+    os.makedirs(directory)
+
+    np.save(os.path.join(directory, "user_ids.npy"), np.asarray(user_ids))
+    # Como texto de ancho fijo para poder mapearlos en memoria
+    np.save(
+        os.path.join(directory, "attraction_ids.npy"),
+        np.asarray(attraction_ids).astype(str),
+    )
+    save_csr(directory, "matrix", matrix)
+    if item_neighbours is not None:
+        save_csr(directory, "item_neighbours", item_neighbours)
+    if factors is not None:
+        user_factors, item_factors = factors
+        np.save(os.path.join(directory, "user_factors.npy"), user_factors)
+        np.save(os.path.join(directory, "item_factors.npy"), item_factors)
+
+    with open(os.path.join(directory, "metadata.json"), "w") as file:
+        json.dump(
+            {
+                "created_at": created_at.isoformat(),
+                "matrix_shape": list(matrix.shape),
+                "item_neighbours_shape": (
+                    list(item_neighbours.shape)
+                    if item_neighbours is not None
+                    else None
+                ),
+                "factors": factors is not None,
+            },
+            file,
+        )
+
+    link = os.path.join(base, f".{CURRENT}-{uuid.uuid4().hex}")
+    os.symlink(name, link)
+    os.replace(link, os.path.join(base, CURRENT))
+
+    _remove_old_snapshots(base)
+
+    Logger().info(msg=f"Saved recommendations snapshot {directory}")
+
+    return directory
+
+
+# Borra los snapshots más viejos dejando los últimos SNAPSHOT_KEEP. Los procesos
+# que todavía tengan mapeado uno borrado lo siguen pudiendo leer.
+def _remove_old_snapshots(base: str):
+    snapshots = sorted(
+        name for name in os.listdir(base) if name.startswith("snapshot-")
+    )
+    for name in snapshots[:-SNAPSHOT_KEEP]:
+        shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+# Devuelve el snapshot actual, mapeándolo solo si cambió desde la última carga.
+# Devuelve None si no hay snapshot o si es más viejo que max_age.
+def load_snapshot(max_age: datetime.timedelta = None, base=SNAPSHOT_DIR):
+    global _snapshot
+
+    current = os.path.join(base, CURRENT)
+    if not os.path.exists(current):
+        return None
+
+    directory = os.path.realpath(current)
+
+    with _lock:
+        if _snapshot is None or _snapshot.directory != directory:
+            _snapshot = Snapshot(directory)
+        snapshot = _snapshot
+
+    if max_age is not None and snapshot.age() > max_age:
+        return None
+
+    return snapshot
@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, List
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import crud
+from app.db.database import get_db_session
+from app.services.constants import TRANSLATION_CACHE_SIZE
+from app.services.logger import Logger
+
+
+# Normaliza el texto antes de calcular su hash, para que comentarios que solo
+# difieren en espacios o en la forma Unicode compartan la traducción. No se
+# cambian mayúsculas porque VADER las usa para la intensidad.
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+# Cache de traducciones con dos niveles: un LRU en memoria de size entradas y la
+# tabla translations en Postgres, compartida por todos los procesos. Solo se llama
+# al traductor con los textos que no están en ninguno de los dos.
+class TranslationCache:
+    def __init__(self, size: int = TRANSLATION_CACHE_SIZE, persistent: bool = True):
+        self.size = size
+        self.persistent = persistent
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+
+    def translate_batch(
+        self, texts: List[str], translate: Callable[[List[str]], List[str]]
+    ) -> List[str]:
+        hashes = [text_hash(text) for text in texts]
+        translations = {}
+
+        with self._lock:
+            for key in hashes:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    translations[key] = self._memory[key]
+            self.memory_hits += sum(key in translations for key in hashes)
+
+        # Se traduce el texto normalizado, una sola vez aunque esté repetido
+        missing = {
+            key: normalize_text(text)
+            for key, text in zip(hashes, texts)
+            if key not in translations
+        }
+
+        if missing and self.persistent:
+            found = self._load(list(missing))
+            translations.update(found)
+            self._remember(found)
+            with self._lock:
+                self.database_hits += sum(key in found for key in hashes)
+            missing = {
+                key: text for key, text in missing.items() if key not in found
+            }
+
+        if missing:
+            translated = dict(zip(missing, translate(list(missing.values()))))
+            translations.update(translated)
+            self._remember(translated)
+            with self._lock:
+                self.misses += sum(key in translated for key in hashes)
+            if self.persistent:
+                self._store(translated)
+
+        return [translations[key] for key in hashes]
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.database_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "database_hits": self.database_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, translations: dict):
+        with self._lock:
+            for key, translation in translations.items():
+                self._memory[key] = translation
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+    # Si la base no está disponible se sigue solo con el nivel en memoria
+    def _load(self, hashes: List[str]) -> dict:
+        db = get_db_session()
+        try:
+            return crud.get_translations(db=db, text_hashes=hashes)
+        except SQLAlchemyError as error:
+            Logger().err(f"Could not read cached translations: {error}")
+            return {}
+        finally:
+            db.close()
+
+    def _store(self, translations: dict):
+        db = get_db_session()
+        try:
+            crud.add_translations(db=db, translations=translations)
+        except SQLAlchemyError as error:
+            Logger().err(f"Could not cache translations: {error}")
+        finally:
+            db.close()
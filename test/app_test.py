@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from fastapi.testclient import TestClient
 
@@ -43,17 +43,24 @@ class TestSearchAttractions(unittest.TestCase):
 
 class TestGetAttractionLocation(unittest.TestCase):
 
-    @patch("app.routes.routes.requests.post")
+    @patch("app.services.places.AsyncPlacesClient.post", new_callable=AsyncMock)
     def test_get_attraction_location_status_code_200(self, mock_post):
-        mock_post.return_value.status_code = 200
+        mock_post.return_value = Mock(
+            status_code=200,
+            json=Mock(
+                return_value={
+                    "places": [{"location": {"latitude": 48.86, "longitude": 2.34}}]
+                }
+            ),
+        )
 
         response = client.get("/attractions/location?text=museum")
 
         self.assertEqual(response.status_code, 200)
 
-    @patch("app.routes.routes.requests.post")
+    @patch("app.services.places.AsyncPlacesClient.post", new_callable=AsyncMock)
     def test_get_attraction_location_status_code_404(self, mock_post):
-        mock_post.return_value.status_code = 404
+        mock_post.return_value = Mock(status_code=404)
 
         response = client.get("/attractions/location?text=museum")
 
@@ -112,3 +119,26 @@ class TestSaveAttraction(unittest.TestCase):
         response = client.post("/attractions/save", json=request_data)
 
         self.assertEqual(response.status_code, 404)
+
+
+class TestRunRecommendationSystem(unittest.TestCase):
+
+    @patch("app.routes.routes.jobs.submit_recommendation_job")
+    def test_run_recommendation_system_returns_job(self, mock_submit):
+        mock_submit.return_value.to_dict.return_value = {
+            "job_id": "abc123",
+            "phase": "queued",
+        }
+
+        response = client.post("/attractions/run-recommendation-system")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["job_id"], "abc123")
+
+    @patch("app.routes.routes.jobs.get_recommendation_job")
+    def test_get_recommendation_system_run_not_found(self, mock_get_job):
+        mock_get_job.return_value = None
+
+        response = client.get("/attractions/run-recommendation-system/abc123")
+
+        self.assertEqual(response.status_code, 404)
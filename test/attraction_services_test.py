@@ -1,7 +1,8 @@
+import asyncio
 import os
 import unittest
 from typing import List, Optional
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 import requests
 from fastapi import HTTPException
@@ -92,7 +93,7 @@ class TestSortAttractionsByRating(unittest.TestCase):
 
 
 class TestGetAttractionById(unittest.TestCase):
-    @patch("app.services.attractions_service.requests.get")
+    @patch("app.services.places.PlacesClient.get")
     @patch("os.getenv", return_value="fake_api_key")
     def test_get_attraction_by_id_success(self, mock_getenv, mock_requests_get):
         mock_response = Mock(spec=Response)
@@ -118,7 +119,7 @@ class TestGetAttractionById(unittest.TestCase):
 
         self.assertEqual(result.attraction_id, "1")
 
-    @patch("app.services.attractions_service.requests.get")
+    @patch("app.services.places.PlacesClient.get")
     @patch("os.getenv", return_value="fake_api_key")
     def test_get_attraction_by_id_failure(self, mock_getenv, mock_requests_get):
         mock_response = Mock(spec=Response)
@@ -133,7 +134,7 @@ class TestGetAttractionById(unittest.TestCase):
 
 class TestGetNearbyAttractions(unittest.TestCase):
 
-    @patch("app.services.attractions_service.requests.post")
+    @patch("app.services.places.PlacesClient.post")
     @patch("os.getenv", return_value="fake_api_key")
     def test_get_nearby_attractions_success(self, mock_getenv, mock_requests_post):
         mock_response = Mock(spec=requests.Response)
@@ -177,15 +178,13 @@ class TestGetNearbyAttractions(unittest.TestCase):
         formatted_attractions = get_nearby_attractions(10.0, 20.0, 5000, ["restaurant"])
 
         called_url = mock_requests_post.call_args[0][0]
-        self.assertEqual(
-            called_url, "https://places.googleapis.com/v1/places:searchNearby"
-        )
+        self.assertEqual(called_url, "places:searchNearby")
 
         self.assertEqual(len(formatted_attractions), 2)
         self.assertEqual(formatted_attractions[0].attraction_id, "1")
         self.assertEqual(formatted_attractions[1].attraction_id, "2")
 
-    @patch("app.services.attractions_service.requests.post")
+    @patch("app.services.places.PlacesClient.post")
     @patch("os.getenv", return_value="fake_api_key")
     def test_get_nearby_attractions_failure(self, mock_getenv, mock_requests_post):
         mock_response = Mock(spec=requests.Response)
@@ -197,14 +196,12 @@ class TestGetNearbyAttractions(unittest.TestCase):
             get_nearby_attractions(10.0, 20.0, 5000, ["restaurant"])
 
         called_url = mock_requests_post.call_args[0][0]
-        self.assertEqual(
-            called_url, "https://places.googleapis.com/v1/places:searchNearby"
-        )
+        self.assertEqual(called_url, "places:searchNearby")
 
 
 class TestSearchAttractions(unittest.TestCase):
 
-    @patch("app.services.attractions_service.requests.post")
+    @patch("app.services.places.PlacesClient.post")
     @patch("os.getenv", return_value="fake_api_key")
     def test_search_attractions_without_location(self, mock_getenv, mock_requests_post):
         mock_response = Mock(spec=requests.Response)
@@ -248,15 +245,13 @@ class TestSearchAttractions(unittest.TestCase):
         formatted_attractions = search_attractions("restaurant", "restaurant")
 
         called_url = mock_requests_post.call_args[0][0]
-        self.assertEqual(
-            called_url, "https://places.googleapis.com/v1/places:searchText"
-        )
+        self.assertEqual(called_url, "places:searchText")
 
         self.assertEqual(len(formatted_attractions), 2)
         self.assertEqual(formatted_attractions[0].attraction_id, "1")
         self.assertEqual(formatted_attractions[1].attraction_id, "2")
 
-    @patch("app.services.attractions_service.requests.post")
+    @patch("app.services.places.PlacesClient.post")
     @patch("os.getenv", return_value="fake_api_key")
     def test_search_attractions_with_location(self, mock_getenv, mock_requests_post):
         mock_response = Mock(spec=requests.Response)
@@ -300,15 +295,13 @@ class TestSearchAttractions(unittest.TestCase):
         formatted_attractions = search_attractions("museum", "museum", 40.0, -75.0)
 
         called_url = mock_requests_post.call_args[0][0]
-        self.assertEqual(
-            called_url, "https://places.googleapis.com/v1/places:searchText"
-        )
+        self.assertEqual(called_url, "places:searchText")
 
         self.assertEqual(len(formatted_attractions), 2)
         self.assertEqual(formatted_attractions[0].attraction_id, "1")
         self.assertEqual(formatted_attractions[1].attraction_id, "2")
 
-    @patch("app.services.attractions_service.requests.post")
+    @patch("app.services.places.PlacesClient.post")
     @patch("os.getenv", return_value="fake_api_key")
     def test_search_attractions_api_error(self, mock_getenv, mock_requests_post):
         mock_response = Mock(spec=requests.Response)
@@ -320,6 +313,64 @@ class TestSearchAttractions(unittest.TestCase):
             search_attractions("restaurant", "restaurant")
 
         called_url = mock_requests_post.call_args[0][0]
+        self.assertEqual(called_url, "places:searchText")
+
+
+class TestAsyncPlacesRequests(unittest.TestCase):
+
+    def places_response(self, status_code=200):
+        mock_response = Mock(spec=requests.Response)
+        mock_response.status_code = status_code
+        mock_response.json.return_value = {
+            "places": [
+                {
+                    "id": "1",
+                    "displayName": {"text": "Obelisco"},
+                    "location": {"latitude": 10.0, "longitude": 20.0},
+                    "types": ["type1"],
+                    "addressComponents": [
+                        {"types": ["locality"], "longText": "Buenos Aires"},
+                        {"types": ["country"], "longText": "Argentina"},
+                    ],
+                    "photos": [{"name": "photo1"}],
+                    "rating": 4.5,
+                }
+            ]
+        }
+        return mock_response
+
+    @patch("app.services.places.AsyncPlacesClient.post", new_callable=AsyncMock)
+    def test_search_attractions_async(self, mock_post):
+        mock_post.return_value = self.places_response()
+
+        formatted_attractions = asyncio.run(
+            search_attractions_async("museum", "museum", 40.0, -75.0)
+        )
+
+        self.assertEqual(mock_post.call_args[0][0], "places:searchText")
         self.assertEqual(
-            called_url, "https://places.googleapis.com/v1/places:searchText"
+            mock_post.call_args.kwargs["json"],
+            search_attractions_request("museum", "museum", 40.0, -75.0),
         )
+        self.assertEqual(formatted_attractions[0].attraction_id, "1")
+
+    @patch("app.services.places.AsyncPlacesClient.post", new_callable=AsyncMock)
+    def test_get_nearby_attractions_async(self, mock_post):
+        mock_post.return_value = self.places_response()
+
+        formatted_attractions = asyncio.run(
+            get_nearby_attractions_async(10.0, 20.0, 5000, ["museum"])
+        )
+
+        self.assertEqual(mock_post.call_args[0][0], "places:searchNearby")
+        self.assertEqual(len(formatted_attractions), 1)
+
+    @patch("app.services.places.AsyncPlacesClient.get", new_callable=AsyncMock)
+    def test_get_attraction_by_id_async_failure(self, mock_get):
+        mock_get.return_value = self.places_response(status_code=404)
+
+        with self.assertRaises(HTTPException) as context:
+            asyncio.run(get_attraction_by_id_async("1"))
+
+        self.assertEqual(context.exception.status_code, 404)
+        self.assertEqual(mock_get.call_args[0][0], "places/1")
@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from scipy import sparse
+
+from app.services import city_models
+from app.services.city_models import *
+
+
+def make_model(user_ids=(1, 4, 9)):
+    matrix = sparse.random(len(user_ids), 6, density=0.6, format="csr", random_state=0)
+    return CityModel(matrix, np.array(user_ids), np.array(list("abcdef")))
+
+
+class TestCityModel(unittest.TestCase):
+
+    def test_user_position(self):
+        model = make_model()
+        self.assertEqual(model.user_position(4), 1)
+        self.assertIsNone(model.user_position(5))
+        self.assertIsNone(model.user_position(10))
+
+    def test_row_norms(self):
+        model = make_model()
+        np.testing.assert_allclose(
+            model.row_norms, np.linalg.norm(model.matrix.toarray(), axis=1), atol=1e-6
+        )
+
+    def test_attraction_positions(self):
+        model = make_model()
+        self.assertEqual(model.attraction_positions(["c", "x", "a"]), [2, None, 0])
+
+    def test_empty_model(self):
+        model = CityModel(sparse.csr_matrix((0, 0)), np.array([]), np.array([]))
+        self.assertIsNone(model.user_position(1))
+
+
+class TestGetCityModel(unittest.TestCase):
+
+    def setUp(self):
+        clear_city_models()
+
+    def test_model_is_built_once(self):
+        build = MagicMock(side_effect=make_model)
+
+        first = get_city_model("Paris", build=build)
+        second = get_city_model("Paris", build=build)
+
+        self.assertIs(first, second)
+        build.assert_called_once()
+
+    def test_model_is_rebuilt_when_watermark_changes(self):
+        build = MagicMock(side_effect=make_model)
+
+        get_city_model("Paris", build=build, watermark="snapshot-1")
+        get_city_model("Paris", build=build, watermark="snapshot-2")
+
+        self.assertEqual(build.call_count, 2)
+
+    def test_model_is_rebuilt_after_ttl(self):
+        build = MagicMock(side_effect=make_model)
+
+        with patch.object(city_models, "CITY_MODEL_TTL", -1):
+            get_city_model("Paris", build=build)
+            get_city_model("Paris", build=build)
+
+        self.assertEqual(build.call_count, 2)
+
+    def test_model_built_without_snapshot_is_kept_when_one_appears(self):
+        build = MagicMock(side_effect=make_model)
+
+        first = get_city_model("Paris", build=build)
+        second = get_city_model("Paris", build=build, watermark="snapshot-1")
+
+        self.assertIs(first, second)
+        build.assert_called_once()
+
+    def test_least_recently_used_city_is_evicted(self):
+        build = MagicMock(side_effect=lambda: make_model())
+
+        for city in range(MAX_CITY_MODELS + 1):
+            get_city_model(str(city), build=build)
+        get_city_model(str(MAX_CITY_MODELS), build=build)
+        get_city_model("0", build=build)
+
+        self.assertEqual(build.call_count, MAX_CITY_MODELS + 2)
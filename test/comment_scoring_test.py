@@ -0,0 +1,172 @@
+import datetime
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services import comment_scoring
+from app.services.comment_scoring import *
+
+
+@patch.object(comment_scoring.events, "publish_interaction")
+@patch.object(comment_scoring.crud, "update_sentiment_metrics")
+@patch.object(comment_scoring, "get_db_session")
+class TestCommentScorer(unittest.TestCase):
+
+    def test_comments_are_scored_in_batches(self, mock_session, mock_update, mock_publish):
+        score_batch = MagicMock(side_effect=lambda texts: [len(text) for text in texts])
+        scorer = CommentScorer(score_batch=score_batch, batch_size=2, batch_wait=1)
+
+        scorer.enqueue(1, 10, "a")
+        scorer.enqueue(2, 10, "bb")
+        scorer.enqueue(3, 20, "ccc")
+        scorer.flush()
+
+        self.assertEqual(scorer.scored, 3)
+        self.assertEqual(score_batch.call_args_list[0].args[0], ["a", "bb"])
+
+        scored_comments = [
+            scored
+            for call in mock_update.call_args_list
+            for scored in call.kwargs["scored_comments"]
+        ]
+        self.assertEqual(scored_comments, [(1, "a", 1), (2, "bb", 2), (3, "ccc", 3)])
+        self.assertEqual(len(mock_update.call_args_list), 2)
+
+    def test_users_are_refreshed_after_scoring(
+        self, mock_session, mock_update, mock_publish
+    ):
+        scorer = CommentScorer(score_batch=lambda texts: [0] * len(texts), batch_wait=0)
+
+        scorer.enqueue(1, 10, "a")
+        scorer.flush()
+
+        mock_publish.assert_called_once_with(user_id=10)
+
+    def test_errors_do_not_block_flush(self, mock_session, mock_update, mock_publish):
+        score_batch = MagicMock(side_effect=[RuntimeError("boom"), [0.5]])
+        scorer = CommentScorer(score_batch=score_batch, batch_wait=0, max_retries=0)
+
+        scorer.enqueue(1, 10, "a")
+        scorer.flush()
+        scorer.enqueue(2, 10, "b")
+        scorer.flush()
+
+        self.assertEqual(scorer.scored, 1)
+        mock_update.assert_called_once()
+
+    def test_failed_batches_are_retried(self, mock_session, mock_update, mock_publish):
+        score_batch = MagicMock(side_effect=[RuntimeError("boom"), [0.5]])
+        scorer = CommentScorer(score_batch=score_batch, batch_wait=0, retry_backoff=0)
+
+        scorer.enqueue(1, 10, "a")
+        scorer.flush()
+
+        self.assertEqual(scorer.scored, 1)
+        mock_update.assert_called_once_with(
+            db=mock_session.return_value, scored_comments=[(1, "a", 0.5)]
+        )
+
+    def test_retries_are_limited(self, mock_session, mock_update, mock_publish):
+        score_batch = MagicMock(side_effect=RuntimeError("boom"))
+        scorer = CommentScorer(
+            score_batch=score_batch, batch_wait=0, max_retries=2, retry_backoff=0
+        )
+
+        scorer.enqueue(1, 10, "a")
+        scorer.flush()
+
+        self.assertEqual(score_batch.call_count, 3)
+        mock_update.assert_not_called()
+
+        # Después de descartarlo se puede volver a encolar
+        scorer.enqueue(1, 10, "a")
+        scorer.flush()
+        self.assertEqual(score_batch.call_count, 6)
+
+    def test_pending_comments_are_not_enqueued_twice(
+        self, mock_session, mock_update, mock_publish
+    ):
+        score_batch = MagicMock(side_effect=lambda texts: [0] * len(texts))
+        scorer = CommentScorer(score_batch=score_batch, batch_wait=1)
+
+        scorer.enqueue(1, 10, "a")
+        scorer.enqueue(1, 10, "a")
+        scorer.flush()
+
+        self.assertEqual(score_batch.call_args.args[0], ["a"])
+
+    def test_flush_without_comments(self, mock_session, mock_update, mock_publish):
+        CommentScorer().flush()
+        mock_update.assert_not_called()
+
+
+class TestEnqueueUnscoredComments(unittest.TestCase):
+
+    @patch.object(comment_scoring, "enqueue_comment")
+    @patch.object(comment_scoring.crud, "get_unscored_comments")
+    @patch.object(comment_scoring, "get_db_session")
+    def test_enqueues_comments_without_sentiment(
+        self, mock_session, mock_unscored, mock_enqueue
+    ):
+        mock_unscored.return_value = [(1, 10, "a"), (2, 20, "b")]
+
+        self.assertEqual(enqueue_unscored_comments(), 2)
+        mock_enqueue.assert_any_call(comment_id=2, user_id=20, comment="b")
+
+
+@patch.object(comment_scoring, "enqueue_unscored_comments")
+@patch.object(comment_scoring.crud, "try_advisory_lock")
+class TestUnscoredCommentsSweeper(unittest.TestCase):
+
+    def test_sweeps_while_holding_the_lock(self, mock_lock, mock_enqueue):
+        mock_lock.return_value = True
+        connect = MagicMock()
+        sweeper = UnscoredCommentsSweeper(interval=60, connect=connect)
+
+        sweeper.sweep()
+        sweeper.sweep()
+
+        # El lock se toma una sola vez y la conexión queda abierta
+        connect.assert_called_once()
+        mock_lock.assert_called_once_with(connect.return_value, SWEEP_LOCK_ID)
+        connect.return_value.close.assert_not_called()
+        self.assertEqual(mock_enqueue.call_count, 2)
+
+        created_before = mock_enqueue.call_args.kwargs["created_before"]
+        self.assertLess(
+            created_before, datetime.datetime.utcnow() - datetime.timedelta(seconds=59)
+        )
+
+    def test_does_not_sweep_without_the_lock(self, mock_lock, mock_enqueue):
+        mock_lock.return_value = False
+        connect = MagicMock()
+        sweeper = UnscoredCommentsSweeper(connect=connect)
+
+        self.assertEqual(sweeper.sweep(), 0)
+        mock_enqueue.assert_not_called()
+        connect.return_value.close.assert_called_once()
+
+    def test_lock_is_taken_again_after_losing_the_connection(
+        self, mock_lock, mock_enqueue
+    ):
+        mock_lock.return_value = True
+        first, second = MagicMock(), MagicMock()
+        first.exec_driver_sql.side_effect = RuntimeError("connection closed")
+        sweeper = UnscoredCommentsSweeper(connect=MagicMock(side_effect=[first, second]))
+
+        sweeper.sweep()
+        sweeper.sweep()
+
+        first.close.assert_called_once()
+        mock_lock.assert_called_with(second, SWEEP_LOCK_ID)
+        self.assertEqual(mock_enqueue.call_count, 2)
+
+    def test_stop_releases_the_lock(self, mock_lock, mock_enqueue):
+        mock_lock.return_value = True
+        connect = MagicMock()
+        sweeper = UnscoredCommentsSweeper(interval=60, connect=connect)
+
+        sweeper.start()
+        sweeper.stop()
+
+        mock_enqueue.assert_called_once()
+        connect.return_value.close.assert_called_once()
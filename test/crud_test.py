@@ -0,0 +1,195 @@
+import datetime
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.crud import *
+from app.db.database import Base
+from app.services import recommendations
+
+
+class CrudTestCase(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+
+        for attraction_id, city in [("a", "Paris"), ("b", "Paris"), ("c", "Rome")]:
+            self.db.add(
+                models.Attractions(attraction_id=attraction_id, city=city, types="")
+            )
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+
+class TestGetUsersWithInteractionsSince(CrudTestCase):
+
+    def setUp(self):
+        super().setUp()
+        like_attraction(db=self.db, user_id=1, attraction_id="a")
+        self.comment = add_comment(
+            db=self.db, user_id=2, attraction_id="a", comment="Great"
+        )
+        rate_attraction(db=self.db, user_id=3, attraction_id="b", rating=4)
+        self.since = datetime.datetime.utcnow()
+
+    def test_new_interactions(self):
+        save_attraction(db=self.db, user_id=4, attraction_id="c")
+        self.assertEqual(
+            get_users_with_interactions_since(db=self.db, since=self.since), {4}
+        )
+
+    def test_removed_interactions(self):
+        unlike_attraction(
+            db=self.db,
+            attraction_to_unlike=get_liked_attraction(
+                db=self.db, user_id=1, attraction_id="a"
+            ),
+        )
+        delete_comment(db=self.db, comment_to_delete=self.comment)
+
+        self.assertEqual(
+            get_users_with_interactions_since(db=self.db, since=self.since), {1, 2}
+        )
+
+    def test_edited_interactions(self):
+        update_comment(
+            db=self.db, comment_to_edit=self.comment, updated_comment="Awful"
+        )
+        update_rating(
+            db=self.db,
+            rating_to_update=get_rating(db=self.db, user_id=3, attraction_id="b"),
+            new_rating=1,
+        )
+
+        self.assertEqual(
+            get_users_with_interactions_since(db=self.db, since=self.since), {2, 3}
+        )
+
+    def test_scored_sentiment(self):
+        update_sentiment_metrics(
+            db=self.db,
+            scored_comments=[(self.comment.comment_id, "Great", 0.8)],
+        )
+        self.assertEqual(
+            get_users_with_interactions_since(db=self.db, since=self.since), {2}
+        )
+
+    def test_recommendation_run_removes_older_changes(self):
+        add_recommendation_run(
+            db=self.db, started_at=self.since, incremental=False, users_updated=3
+        )
+        self.assertEqual(self.db.query(models.InteractionChanges).count(), 0)
+
+
+class TestNumberOfInteractionsOfUsers(CrudTestCase):
+
+    def setUp(self):
+        super().setUp()
+        like_attraction(db=self.db, user_id=1, attraction_id="a")
+        save_attraction(db=self.db, user_id=1, attraction_id="a")
+        mark_as_done_attraction(db=self.db, user_id=1, attraction_id="b")
+        rate_attraction(db=self.db, user_id=1, attraction_id="c", rating=5)
+        add_comment(db=self.db, user_id=1, attraction_id="a", comment="Nice")
+        add_comment(db=self.db, user_id=1, attraction_id="a", comment="Again")
+        like_attraction(db=self.db, user_id=2, attraction_id="b")
+        add_comment(db=self.db, user_id=3, attraction_id="c", comment="Meh")
+
+    def test_matches_counts_of_each_user(self):
+        counts = number_of_interactions_of_users(db=self.db)
+
+        self.assertEqual(counts, {1: 6, 2: 1, 3: 1})
+        for user_id, count in counts.items():
+            self.assertEqual(
+                number_of_interactions_of_user(db=self.db, user_id=user_id), count
+            )
+
+    def test_filters_users(self):
+        self.assertEqual(
+            number_of_interactions_of_users(db=self.db, user_ids=[2, 4]), {2: 1}
+        )
+
+
+class TestGetInteractionScores(CrudTestCase):
+
+    def setUp(self):
+        super().setUp()
+        like_attraction(db=self.db, user_id=1, attraction_id="a")
+        save_attraction(db=self.db, user_id=1, attraction_id="a")
+        rate_attraction(db=self.db, user_id=1, attraction_id="a", rating=3)
+        mark_as_done_attraction(db=self.db, user_id=1, attraction_id="b")
+        rate_attraction(db=self.db, user_id=2, attraction_id="b", rating=1)
+        for user_id, attraction_id, comment, sentiment_metric in [
+            (2, "b", "Bad", -0.5),
+            (2, "b", "Ok", 0.25),
+            (2, "c", "Unscored", None),
+            (3, "c", "Good", 0.75),
+        ]:
+            add_comment(
+                db=self.db,
+                user_id=user_id,
+                attraction_id=attraction_id,
+                comment=comment,
+                sentiment_metric=sentiment_metric,
+            )
+
+    # Solo los scores distintos de cero llegan a la matriz de interacciones. La
+    # consulta devuelve con score 0 los pares que solo tienen comentarios sin
+    # sentimiento, que el loader de pandas descarta.
+    def scores(self, df):
+        return {
+            (int(user_id), str(attraction_id)): float(score)
+            for user_id, attraction_id, score in zip(
+                df["user_id"], df["attraction_id"], df["score"]
+            )
+            if score != 0
+        }
+
+    def test_sql_loader_matches_pandas_loader(self):
+        expected = self.scores(recommendations.get_merged_df(db=self.db))
+        result = self.scores(recommendations.get_scores_df(db=self.db))
+
+        self.assertEqual(result.keys(), expected.keys())
+        for key, score in expected.items():
+            self.assertAlmostEqual(result[key], score, places=4)
+
+    def test_scores_of_one_user(self):
+        rows = get_interaction_scores(db=self.db, user_id=2).all()
+
+        self.assertEqual(
+            {attraction_id: score for _, attraction_id, score in rows},
+            {"b": RATING_WEIGHT * -1 + SENTIMENT_WEIGHT * -0.125, "c": 0.0},
+        )
+
+
+class TestGetUnscoredComments(CrudTestCase):
+
+    def test_filters_by_creation(self):
+        old = add_comment(db=self.db, user_id=1, attraction_id="a", comment="Old")
+        old.created_at = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        add_comment(db=self.db, user_id=1, attraction_id="a", comment="New")
+        add_comment(
+            db=self.db,
+            user_id=1,
+            attraction_id="a",
+            comment="Scored",
+            sentiment_metric=0.5,
+        )
+        self.db.commit()
+
+        self.assertEqual(
+            [comment for _, _, comment in get_unscored_comments(db=self.db)],
+            ["Old", "New"],
+        )
+        self.assertEqual(
+            get_unscored_comments(
+                db=self.db,
+                created_before=datetime.datetime.utcnow() - datetime.timedelta(minutes=5),
+            ),
+            [(old.comment_id, 1, "Old")],
+        )
@@ -0,0 +1,89 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+from app.services.dynamodb import *
+
+
+@mock_aws
+class TestRecommendationsWriter(unittest.TestCase):
+
+    def setUp(self):
+        os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+
+        boto3.resource("dynamodb", region_name="us-east-2").create_table(
+            TableName="recommendations",
+            KeySchema=[{"AttributeName": "user_id", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "user_id", "AttributeType": "N"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        self.table = get_recommendations_table()
+
+    def write(self, n_users, background):
+        with RecommendationsWriter(self.table, background=background) as writer:
+            for user_id in range(n_users):
+                writer.put(user_id=user_id, attraction_ids=[f"a{user_id}", "b"])
+        return writer
+
+    def test_writes_all_items_in_background(self):
+        writer = self.write(60, background=True)
+        self.assertEqual(writer.items_written, 60)
+        self.assertEqual(self.table.scan()["Count"], 60)
+
+    def test_writes_all_items_in_foreground(self):
+        writer = self.write(30, background=False)
+        self.assertEqual(writer.items_written, 30)
+        item = self.table.get_item(Key={"user_id": 7})["Item"]
+        self.assertEqual(item["attraction_ids"], ["a7", "b"])
+
+    def test_batches_of_25_items(self):
+        client = self.table.meta.client
+        with patch.object(
+            client, "batch_write_item", wraps=client.batch_write_item
+        ) as batch_write_item:
+            self.write(60, background=False)
+
+        batch_sizes = [
+            len(call.kwargs["RequestItems"]["recommendations"])
+            for call in batch_write_item.call_args_list
+        ]
+        self.assertEqual(batch_sizes, [25, 25, 10])
+
+    def test_retries_unprocessed_items(self):
+        client = self.table.meta.client
+        first_item = {"user_id": 1, "attraction_ids": ["a"]}
+        responses = [
+            {
+                "UnprocessedItems": {
+                    "recommendations": [{"PutRequest": {"Item": first_item}}]
+                }
+            },
+            {"UnprocessedItems": {}},
+        ]
+        with patch.object(
+            client, "batch_write_item", side_effect=responses
+        ) as batch_write_item, patch("app.services.dynamodb.time.sleep"):
+            batch_put_items(self.table, [first_item, {"user_id": 2, "attraction_ids": []}])
+
+        self.assertEqual(batch_write_item.call_count, 2)
+        self.assertEqual(
+            batch_write_item.call_args.kwargs["RequestItems"]["recommendations"],
+            [{"PutRequest": {"Item": first_item}}],
+        )
+
+    def test_raises_when_items_are_never_processed(self):
+        client = self.table.meta.client
+        unprocessed = {
+            "UnprocessedItems": {
+                "recommendations": [{"PutRequest": {"Item": {"user_id": 1}}}]
+            }
+        }
+        with patch.object(
+            client, "batch_write_item", return_value=unprocessed
+        ), patch("app.services.dynamodb.time.sleep"):
+            with self.assertRaises(RuntimeError):
+                self.write(1, background=True)
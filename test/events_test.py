@@ -0,0 +1,59 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from app.services.events import *
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestRecommendationRefresher(unittest.TestCase):
+
+    def test_interactions_of_a_user_are_debounced(self):
+        refresh = MagicMock(return_value=True)
+        refresher = RecommendationRefresher(refresh, debounce=0.1)
+
+        for _ in range(3):
+            refresher.publish(1)
+        refresher.publish(2)
+
+        wait_until(lambda: refresher.refreshed == 2)
+        time.sleep(0.15)
+
+        self.assertEqual(sorted(call.args[0] for call in refresh.call_args_list), [1, 2])
+
+    def test_refresh_waits_for_debounce(self):
+        refresh = MagicMock(return_value=True)
+        refresher = RecommendationRefresher(refresh, debounce=10)
+
+        refresher.publish(1)
+        time.sleep(0.05)
+
+        refresh.assert_not_called()
+
+    def test_flush_refreshes_pending_users(self):
+        refresh = MagicMock(return_value=True)
+        refresher = RecommendationRefresher(refresh, debounce=10)
+
+        refresher.publish(1)
+        refresher.publish(2)
+        refresher.flush()
+
+        self.assertEqual(refresh.call_count, 2)
+        self.assertEqual(refresher.refreshed, 2)
+
+    def test_errors_do_not_stop_the_consumer(self):
+        refresh = MagicMock(side_effect=[RuntimeError("boom"), True])
+        refresher = RecommendationRefresher(refresh, debounce=0)
+
+        refresher.publish(1)
+        wait_until(lambda: refresh.call_count == 1)
+        refresher.publish(2)
+        wait_until(lambda: refresher.refreshed == 1)
+
+        self.assertEqual(refresher.refreshed, 1)
+        self.assertEqual(refresh.call_count, 2)
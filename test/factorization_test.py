@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+from app.services.factorization import *
+
+
+class TestAls(unittest.TestCase):
+
+    def setUp(self):
+        # Dos grupos de usuarios con gustos distintos y un usuario sin interacciones
+        self.matrix = sparse.csr_matrix(
+            np.array(
+                [
+                    [100.0, 50.0, 0.0, 0.0],
+                    [100.0, 0.0, 0.0, 0.0],
+                    [0.0, 0.0, 200.0, 50.0],
+                    [0.0, 0.0, 100.0, 0.0],
+                    [0.0, 0.0, 0.0, 0.0],
+                ],
+                dtype=np.float32,
+            )
+        )
+
+    def test_factors_are_compact_float32(self):
+        user_factors, item_factors = als(self.matrix, factors=3, iterations=5)
+
+        self.assertEqual(user_factors.shape, (5, 3))
+        self.assertEqual(item_factors.shape, (4, 3))
+        self.assertEqual(user_factors.dtype, np.float32)
+        self.assertEqual(item_factors.dtype, np.float32)
+
+    def test_users_without_interactions_have_zero_factors(self):
+        user_factors, _ = als(self.matrix, factors=3, iterations=5)
+        self.assertFalse(user_factors[4].any())
+
+    def test_recommends_attractions_of_similar_users(self):
+        user_factors, item_factors = als(self.matrix, factors=2, iterations=10)
+        scores = user_factors @ item_factors.T
+
+        self.assertGreater(scores[1, 1], scores[1, 3])
+        self.assertGreater(scores[3, 3], scores[3, 1])
+
+    def test_negative_scores_are_not_preferred(self):
+        matrix = sparse.csr_matrix(np.array([[100.0, -100.0], [100.0, 0.0]]))
+        user_factors, item_factors = als(matrix, factors=2, iterations=10)
+        scores = user_factors @ item_factors.T
+
+        self.assertGreater(scores[0, 0], scores[0, 1])
@@ -0,0 +1,73 @@
+import os
+import time
+import unittest
+
+from app.services import jobs
+from app.services.jobs import *
+
+
+# Corridas que se ejecutan en el proceso de cada job, por lo que tienen que estar
+# definidas a nivel de módulo
+def run_with_progress(incremental, on_progress):
+    on_progress(phase="scoring", users_scored=0, users_total=10)
+    for users_scored in range(1, 4):
+        on_progress(users_scored=users_scored)
+    time.sleep(0.5)
+
+
+def run_and_fail(incremental, on_progress):
+    raise RuntimeError("boom")
+
+
+def run_and_crash(incremental, on_progress):
+    os._exit(3)
+
+
+class TestRecommendationJobs(unittest.TestCase):
+
+    def tearDown(self):
+        self.wait_for_runs()
+
+    def wait_for_runs(self):
+        jobs._executor.submit(lambda: None).result()
+
+    def test_reports_progress_and_finishes(self):
+        job = submit_recommendation_job(run=run_with_progress)
+        self.wait_for_runs()
+
+        status = get_recommendation_job(job.job_id).to_dict()
+        self.assertEqual(status["phase"], "done")
+        self.assertEqual(status["users_scored"], 3)
+        self.assertEqual(status["users_total"], 10)
+        self.assertIsNotNone(status["finished_at"])
+        self.assertGreater(status["peak_memory_mb"], 0)
+
+    def test_coalesces_runs_while_active(self):
+        first = submit_recommendation_job(run=run_with_progress)
+        second = submit_recommendation_job(incremental=True, run=run_with_progress)
+
+        self.assertEqual(first.job_id, second.job_id)
+
+        self.wait_for_runs()
+
+        third = submit_recommendation_job(run=run_with_progress)
+        self.assertNotEqual(first.job_id, third.job_id)
+
+    def test_failed_run(self):
+        job = submit_recommendation_job(run=run_and_fail)
+        self.wait_for_runs()
+
+        status = job.to_dict()
+        self.assertEqual(status["phase"], "failed")
+        self.assertEqual(status["error"], "boom")
+
+    def test_crashed_process(self):
+        job = submit_recommendation_job(run=run_and_crash)
+        self.wait_for_runs()
+
+        status = job.to_dict()
+        self.assertEqual(status["phase"], "failed")
+        self.assertIn("exited with code 3", status["error"])
+
+    def test_unknown_job(self):
+        self.assertIsNone(get_recommendation_job("unknown"))
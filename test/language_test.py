@@ -0,0 +1,37 @@
+import unittest
+
+from app.services.language import *
+
+
+class TestNgrams(unittest.TestCase):
+
+    def test_ngrams_mark_word_boundaries(self):
+        self.assertEqual(ngrams("Ab, cd!"), [" ab", "ab ", "b c", " cd", "cd "])
+
+    def test_text_without_letters(self):
+        self.assertEqual(ngrams("123 !!"), [])
+
+
+class TestIsEnglish(unittest.TestCase):
+
+    def test_english_comments(self):
+        for text in [
+            "Highly recommended!",
+            "The best pizza in town",
+            "Very disappointing, too crowded",
+        ]:
+            self.assertTrue(is_english(text), text)
+
+    def test_other_languages(self):
+        for text in [
+            "Muy recomendable, volvería",
+            "Péssimo atendimento",
+            "Très beau endroit",
+            "Bellissimo posto",
+            "Sehr schön",
+        ]:
+            self.assertFalse(is_english(text), text)
+
+    def test_text_without_letters_is_translated(self):
+        self.assertFalse(is_english("10/10 !!!"))
+        self.assertEqual(language_scores(""), {})
@@ -0,0 +1,27 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+from app.services.lazy import *
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def setUp(self):
+        sys.modules.pop("colorsys", None)
+
+    def test_module_is_imported_on_first_use(self):
+        colorsys = lazy_import("colorsys")
+        self.assertNotIn("colorsys", sys.modules)
+
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertIn("colorsys", sys.modules)
+
+    def test_attributes_can_be_patched(self):
+        colorsys = lazy_import("colorsys")
+
+        with patch.object(colorsys, "rgb_to_hsv", return_value="patched"):
+            self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), "patched")
+            self.assertEqual(sys.modules["colorsys"].rgb_to_hsv(0, 0, 0), "patched")
+
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fastapi import HTTPException
+
+from app.services import places
+from app.services.places import *
+
+
+# Servidor local que responde como la API de Places. Las primeras `failures`
+# respuestas de cada prueba son 503, con el header Retry-After si se indica
+# `retry_after`, y las rutas "slow" tardan un segundo.
+class PlacesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.respond()
+
+    def respond(self):
+        server = self.server
+        server.received.append((self.command, self.path, dict(self.headers)))
+
+        if "slow" in self.path:
+            time.sleep(1)
+
+        status = 503 if len(server.received) <= server.failures else 200
+        body = json.dumps({"places": []}).encode()
+
+        self.send_response(status)
+        if status == 503 and server.retry_after:
+            self.send_header("Retry-After", server.retry_after)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPlacesClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PlacesHandler)
+        self.server.received = []
+        self.server.failures = 0
+        self.server.retry_after = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.client = PlacesClient(
+            base_url=f"http://127.0.0.1:{self.server.server_port}/v1",
+            api_key="key",
+            read_timeout=0.3,
+            retry_backoff=0,
+        )
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            response = self.client.post(
+                "places:searchText", field_mask="places.id", json={"textQuery": "a"}
+            )
+            self.assertEqual(response.status_code, 200)
+
+        stats = self.client.stats()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["idle_connections"], 1)
+
+        method, path, headers = self.server.received[0]
+        self.assertEqual((method, path), ("POST", "/v1/places:searchText"))
+        self.assertEqual(headers["X-Goog-Api-Key"], "key")
+        self.assertEqual(headers["X-Goog-FieldMask"], "places.id")
+
+    def test_server_errors_are_retried(self):
+        self.server.failures = 2
+
+        response = self.client.get("places/1", field_mask="id")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.received), 3)
+        self.assertEqual(self.client.stats()["retries"], 2)
+
+    def test_retries_are_bounded(self):
+        self.server.failures = 100
+
+        response = self.client.get("places/1", field_mask="id")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.received), PLACES_MAX_RETRIES + 1)
+        self.assertEqual(self.client.stats()["failures"], 1)
+
+    def test_slow_responses_time_out(self):
+        with self.assertRaises(HTTPException) as context:
+            self.client.get("places/slow", field_mask="id")
+
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(self.client.stats()["failures"], 1)
+
+    def test_retry_after_is_capped(self):
+        self.server.failures = 1
+        self.server.retry_after = "3600"
+        client = PlacesClient(
+            base_url=f"http://127.0.0.1:{self.server.server_port}/v1",
+            max_retry_delay=0.1,
+        )
+
+        start = time.perf_counter()
+        try:
+            response = client.get("places/1", field_mask="id")
+        finally:
+            client.close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.perf_counter() - start, 2)
+
+    def test_retries_stop_at_deadline(self):
+        client = PlacesClient(
+            base_url=f"http://127.0.0.1:{self.server.server_port}/v1",
+            read_timeout=0.3,
+            retry_backoff=0,
+            deadline=0.5,
+        )
+
+        try:
+            with self.assertRaises(HTTPException):
+                client.post("places:slow", field_mask="places.id", json={})
+        finally:
+            client.close()
+
+        self.assertEqual(len(self.server.received), 1)
+
+
+class TestAsyncPlacesClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PlacesHandler)
+        self.server.received = []
+        self.server.failures = 0
+        self.server.retry_after = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_with_client(self, requests, **options):
+        async def run():
+            client = AsyncPlacesClient(
+                base_url=f"http://127.0.0.1:{self.server.server_port}/v1",
+                api_key="key",
+                retry_backoff=0,
+                **options,
+            )
+            try:
+                return await requests(client), client.stats()
+            finally:
+                await client.close()
+
+        return asyncio.run(run())
+
+    def test_requests_run_concurrently(self):
+        async def search(client):
+            return await asyncio.gather(
+                *[
+                    client.post(
+                        "places:slow", field_mask="places.id", json={"textQuery": "a"}
+                    )
+                    for _ in range(10)
+                ]
+            )
+
+        start = time.perf_counter()
+        responses, stats = self.run_with_client(search)
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(stats["max_in_flight"], 10)
+        self.assertEqual(stats["in_flight"], 0)
+
+        method, path, headers = self.server.received[0]
+        self.assertEqual((method, path), ("POST", "/v1/places:slow"))
+        self.assertEqual(headers["X-Goog-FieldMask"], "places.id")
+
+    def test_server_errors_are_retried(self):
+        self.server.failures = 2
+
+        response, stats = self.run_with_client(
+            lambda client: client.get("places/1", field_mask="id")
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stats["retries"], 2)
+
+    def test_retries_are_bounded(self):
+        self.server.failures = 100
+
+        response, stats = self.run_with_client(
+            lambda client: client.get("places/1", field_mask="id")
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.received), PLACES_MAX_RETRIES + 1)
+        self.assertEqual(stats["failures"], 1)
+
+    def test_slow_responses_time_out(self):
+        with self.assertRaises(HTTPException) as context:
+            self.run_with_client(
+                lambda client: client.get("places/slow", field_mask="id"),
+                read_timeout=0.3,
+                max_retries=0,
+            )
+
+        self.assertEqual(context.exception.status_code, 503)
+
+    def test_retry_after_is_capped(self):
+        self.server.failures = 1
+        self.server.retry_after = "3600"
+
+        start = time.perf_counter()
+        response, stats = self.run_with_client(
+            lambda client: client.get("places/1", field_mask="id"),
+            max_retry_delay=0.1,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stats["retries"], 1)
+        self.assertLess(time.perf_counter() - start, 2)
+
+    def test_retries_stop_at_deadline(self):
+        with self.assertRaises(HTTPException):
+            self.run_with_client(
+                lambda client: client.post(
+                    "places:slow", field_mask="places.id", json={}
+                ),
+                read_timeout=0.3,
+                deadline=0.5,
+            )
+
+        self.assertEqual(len(self.server.received), 1)
+
+
+class TestSetPlacesClient(unittest.TestCase):
+
+    def test_client_can_be_replaced(self):
+        client = PlacesClient(base_url="http://127.0.0.1:1")
+        previous = set_places_client(client)
+        try:
+            self.assertIs(get_places_client(), client)
+        finally:
+            set_places_client(previous)
@@ -1,7 +1,13 @@
+import tempfile
+import tracemalloc
 import unittest
 from unittest.mock import Mock, patch
 
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
 import app
+from app.db.database import Base
 from app.services.recommendations import *
 
 
@@ -50,3 +56,387 @@ class TestCreateRatingScore(unittest.TestCase):
     def test_rating_5(self):
         result = create_rating_score(5)
         self.assertEqual(result, 1)
+
+
+class TestBuildInteractionMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "user_id": [2, 1, 1, 3],
+                "attraction_id": ["b", "a", "c", "a"],
+                "score": [100.0, 50.0, 0.0, 20.0],
+            }
+        )
+
+    def test_matrix_shape_and_ids(self):
+        matrix, user_ids, attraction_ids = build_interaction_matrix(self.df)
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertEqual(user_ids.tolist(), [1, 2, 3])
+        self.assertEqual(attraction_ids.tolist(), ["a", "b", "c"])
+
+    def test_matrix_values(self):
+        matrix, _, _ = build_interaction_matrix(self.df)
+        self.assertEqual(
+            matrix.toarray().tolist(),
+            [[50.0, 0.0, 0.0], [0.0, 100.0, 0.0], [20.0, 0.0, 0.0]],
+        )
+
+    def test_zero_scores_are_not_stored(self):
+        matrix, _, _ = build_interaction_matrix(self.df)
+        self.assertEqual(matrix.nnz, 3)
+
+
+class TestScoreBlock(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = sparse.csr_matrix(
+            np.array(
+                [
+                    [1.0, 0.0, 0.0, 0.0],
+                    [1.0, 5.0, 2.0, 0.0],
+                    [0.0, 1.0, 0.0, 3.0],
+                ],
+                dtype=np.float32,
+            )
+        )
+
+    def test_scores_are_weighted_sum_of_similar_users(self):
+        scores = score_block([[1.0, 0.5, 1.0]], self.matrix, [0])
+        self.assertEqual(scores[0, 1:].tolist(), [3.5, 1.0, 3.0])
+
+    def test_masks_interacted_attractions(self):
+        scores = score_block([[1.0, 0.5, 0.0]], self.matrix, [0])
+        self.assertEqual(scores[0, 0], -np.inf)
+
+    def test_ignores_own_similarity(self):
+        scores = score_block([[1.0, 1.0, 0.0]], self.matrix, [1])
+        self.assertEqual(scores[0, 3], 0.0)
+
+    def test_scores_multiple_users(self):
+        scores = score_block([[1.0, 0.5, 1.0], [0.0, 1.0, 1.0]], self.matrix, [0, 2])
+        self.assertEqual(scores.shape, (2, 4))
+        self.assertEqual(scores[1, 0], 1.0)
+        self.assertEqual(scores[1, 2], 2.0)
+
+    def test_only_top_k_similar_users_contribute(self):
+        scores = score_block([[1.0, 0.5, 1.0]], self.matrix, [0], n_similar_users=1)
+        self.assertEqual(scores[0, 1:].tolist(), [1.0, 0.0, 3.0])
+
+
+class TestScoreItems(unittest.TestCase):
+
+    def setUp(self):
+        self.item_neighbours = sparse.csr_matrix(
+            np.array(
+                [
+                    [0.0, 0.5, 0.2, 0.0],
+                    [0.5, 0.0, 0.0, 0.4],
+                    [0.2, 0.0, 0.0, 0.0],
+                    [0.0, 0.4, 0.0, 0.0],
+                ],
+                dtype=np.float32,
+            )
+        )
+
+    def test_sums_weighted_neighbour_lists(self):
+        user_row = sparse.csr_matrix(np.array([[2.0, 0.0, 1.0, 0.0]]))
+        positions, scores = score_items(self.item_neighbours, user_row)
+        self.assertEqual(dict(zip(positions.tolist(), scores.tolist())), {1: 1.0})
+
+    def test_only_neighbours_are_candidates(self):
+        user_row = sparse.csr_matrix(np.array([[0.0, 0.0, 0.0, 1.0]]))
+        positions, scores = score_items(self.item_neighbours, user_row)
+        self.assertEqual(positions.tolist(), [1])
+        self.assertAlmostEqual(scores[0], 0.4, places=6)
+
+
+class TestScoreUserRow(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = sparse.random(
+            30, 12, density=0.4, format="csr", random_state=0, dtype=np.float32
+        )
+        self.row_norms = np.sqrt(
+            np.asarray(self.matrix.multiply(self.matrix).sum(axis=1)).ravel()
+        )
+
+    def test_matches_batch_scoring_for_existing_user(self):
+        user_similarity = similarity.exact_user_similarity(self.matrix)
+        expected = dict(score_users(self.matrix, user_similarity, [4]))[4]
+
+        user_row = self.matrix[4].toarray()[0]
+        result = score_user_row(self.matrix, self.row_norms, user_row, user_position=4)
+
+        self.assertEqual(result.tolist(), expected.tolist())
+
+    def test_user_without_interactions(self):
+        user_row = np.zeros(12, dtype=np.float32)
+        self.assertIsNone(score_user_row(self.matrix, self.row_norms, user_row))
+
+
+class TestScoreUsersWithFactors(unittest.TestCase):
+
+    def test_ranks_by_factor_product_without_interacted(self):
+        matrix = sparse.csr_matrix(np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]))
+        user_factors = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        item_factors = np.array(
+            [[2.0, 0.0], [1.0, 0.5], [0.0, 3.0]], dtype=np.float32
+        )
+
+        result = dict(
+            score_users_with_factors(matrix, user_factors, item_factors, [0, 1])
+        )
+
+        self.assertEqual(result[0].tolist(), [1, 2])
+        self.assertEqual(result[1].tolist(), [1, 0])
+
+
+class TestScoreUsers(unittest.TestCase):
+
+    def test_blocks_stay_within_memory_budget(self):
+        matrix = sparse.random(
+            500, 20000, density=0.01, format="csr", random_state=0, dtype=np.float32
+        )
+        user_similarity = similarity.blockwise_user_similarity(matrix)
+
+        for n_similar_users in (None, 30):
+            with patch.object(
+                similarity, "RECOMMENDATIONS_MEMORY_BUDGET_MB", 1
+            ), patch(
+                "app.services.recommendations.N_SIMILAR_USERS", n_similar_users
+            ):
+                tracemalloc.start()
+                try:
+                    for _ in score_users(matrix, user_similarity, np.arange(500)):
+                        pass
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+
+            self.assertLessEqual(peak, 1024 * 1024)
+
+
+class TestKeepTopK(unittest.TestCase):
+
+    def test_keep_top_k_basic(self):
+        block = np.array([[0.1, 0.9, 0.5, 0.7], [0.3, 0.2, 0.8, 0.0]])
+        result = keep_top_k(block, 2)
+        self.assertEqual(
+            result.tolist(), [[0.0, 0.9, 0.0, 0.7], [0.3, 0.0, 0.8, 0.0]]
+        )
+
+    def test_keep_top_k_larger_than_row(self):
+        block = np.array([[0.1, 0.9]])
+        result = keep_top_k(block, 5)
+        self.assertEqual(result.tolist(), [[0.1, 0.9]])
+
+
+class TestTopNPositions(unittest.TestCase):
+
+    def test_top_n_positions_basic(self):
+        scores = np.array([[8.0, 3.0, 2.0, 9.0, 7.0]])
+        self.assertEqual(top_n_positions(scores, 3)[0].tolist(), [3, 0, 4])
+
+    def test_top_n_positions_skips_masked(self):
+        scores = np.array([[-np.inf, 3.0, -np.inf], [1.0, 2.0, 3.0]])
+        result = top_n_positions(scores, 3)
+        self.assertEqual(result[0].tolist(), [1])
+        self.assertEqual(result[1].tolist(), [2, 1, 0])
+
+    def test_top_n_positions_fewer_than_n(self):
+        scores = np.array([[1.0, 5.0]])
+        self.assertEqual(top_n_positions(scores, 10)[0].tolist(), [1, 0])
+
+    def test_top_n_positions_breaks_ties_by_position(self):
+        numbers = [5, 1, 5, 1, 5, 5, 5, 5, 1, 0, 5, 2]
+        scores = np.array([numbers, numbers[::-1]], dtype=float)
+
+        for n in range(1, len(numbers) + 2):
+            for row, result in zip(scores, top_n_positions(scores, n)):
+                expected = sorted(
+                    range(len(row)), key=lambda i: row[i], reverse=True
+                )[:n]
+                self.assertEqual(result.tolist(), expected)
+
+        self.assertEqual(n_greatest_positions(numbers, 4), [0, 2, 4, 5])
+
+
+class TestBuildItemNeighbours(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = sparse.csr_matrix(
+            np.array([[1, 1, 0], [0, 1, 1], [1, 0, 1]], dtype=np.float32)
+        )
+
+    @patch("app.services.recommendations.PLAN_RECOMMENDER", "item")
+    def test_built_for_item_plans(self):
+        self.assertEqual(build_item_neighbours(self.matrix).shape, (3, 3))
+
+    @patch("app.services.similarity.item_similarity")
+    def test_skipped_for_other_plans(self, mock_item_similarity):
+        for plan_recommender in ("user", "als"):
+            with patch(
+                "app.services.recommendations.PLAN_RECOMMENDER", plan_recommender
+            ):
+                self.assertIsNone(build_item_neighbours(self.matrix))
+
+        mock_item_similarity.assert_not_called()
+
+
+class TestGetAffectedUserPositions(unittest.TestCase):
+
+    def setUp(self):
+        self.user_similarity = sparse.csr_matrix(
+            np.array(
+                [
+                    [1.0, 0.4, 0.0, 0.0],
+                    [0.4, 1.0, 0.0, 0.0],
+                    [0.0, 0.0, 1.0, 0.2],
+                    [0.0, 0.0, 0.2, 1.0],
+                ]
+            )
+        )
+        self.user_ids = np.array([10, 20, 30, 40])
+
+    def test_includes_changed_users_and_neighbours(self):
+        result = get_affected_user_positions(self.user_similarity, self.user_ids, {20})
+        self.assertEqual(result.tolist(), [0, 1])
+
+    def test_no_changed_users(self):
+        result = get_affected_user_positions(self.user_similarity, self.user_ids, set())
+        self.assertEqual(result.tolist(), [])
+
+    def test_ignores_unknown_users(self):
+        result = get_affected_user_positions(
+            self.user_similarity, self.user_ids, {30, 99}
+        )
+        self.assertEqual(result.tolist(), [2, 3])
+
+
+class TestGetScoresDf(unittest.TestCase):
+
+    @patch("app.services.recommendations.crud.stream_interaction_scores")
+    def test_builds_compact_columns_from_chunks(self, mock_stream):
+        mock_stream.return_value = iter(
+            [
+                [(1, "a", 100.0), (1, "b", 50.0)],
+                [(2, "a", -200.0)],
+            ]
+        )
+
+        df = get_scores_df(db=Mock())
+
+        self.assertEqual(df["user_id"].dtype, np.int32)
+        self.assertEqual(df["score"].dtype, np.float32)
+        self.assertIsInstance(df["attraction_id"].dtype, pd.CategoricalDtype)
+        self.assertEqual(df["user_id"].tolist(), [1, 1, 2])
+        self.assertEqual(df["attraction_id"].astype(str).tolist(), ["a", "b", "a"])
+        self.assertEqual(df["score"].tolist(), [100.0, 50.0, -200.0])
+
+    @patch("app.services.recommendations.crud.stream_interaction_scores")
+    def test_without_interactions(self, mock_stream):
+        mock_stream.return_value = iter([])
+
+        df = get_scores_df(db=Mock())
+
+        self.assertEqual(len(df), 0)
+
+
+class TestGetRecommendationsForUserInCity(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+
+        for attraction_id in "abcde":
+            self.db.add(
+                models.Attractions(attraction_id=attraction_id, city="Paris", types="")
+            )
+        self.db.add(models.Attractions(attraction_id="z", city="Rome", types=""))
+        self.db.commit()
+
+        for user_id, attraction_ids in [(1, "ab"), (2, "abcz"), (3, "abcd")]:
+            for attraction_id in attraction_ids:
+                crud.like_attraction(
+                    db=self.db, user_id=user_id, attraction_id=attraction_id
+                )
+
+        self.base = tempfile.TemporaryDirectory()
+        city_models.clear_city_models()
+
+    def tearDown(self):
+        self.base.cleanup()
+        self.db.close()
+
+    def save_snapshot(self):
+        matrix, user_ids, attraction_ids = build_interaction_matrix(
+            get_scores_df(db=self.db)
+        )
+        snapshot.save_snapshot(
+            matrix,
+            user_ids,
+            attraction_ids,
+            item_neighbours=similarity.neighbours_matrix(
+                similarity.item_similarity(matrix), ITEM_NEIGHBOURS
+            ),
+            factors=factorization.als(matrix),
+            base=self.base.name,
+        )
+
+    def recommendations(self, user_id):
+        load_snapshot = snapshot.load_snapshot
+        with patch.object(
+            snapshot,
+            "load_snapshot",
+            lambda max_age: load_snapshot(max_age=max_age, base=self.base.name),
+        ):
+            return get_recommendations_for_user_in_city(
+                db=self.db, user_id=user_id, city="Paris"
+            )
+
+    def test_attractions_liked_after_the_snapshot_are_not_recommended(self):
+        self.save_snapshot()
+        self.assertEqual(self.recommendations(1), ["c", "d"])
+
+        crud.like_attraction(db=self.db, user_id=1, attraction_id="c")
+
+        self.assertEqual(self.recommendations(1), ["d"])
+
+    @patch("app.services.recommendations.build_city_matrix")
+    def test_users_missing_from_the_snapshot_use_it(self, mock_build_city_matrix):
+        self.save_snapshot()
+        self.recommendations(1)
+
+        for attraction_id in "ab":
+            crud.like_attraction(db=self.db, user_id=4, attraction_id=attraction_id)
+
+        self.assertEqual(self.recommendations(4), ["c", "d"])
+        mock_build_city_matrix.assert_not_called()
+
+    def test_without_snapshot_only_city_scores_are_loaded(self):
+        matrix, user_ids, attraction_ids = build_city_matrix(db=self.db, city="Paris")
+
+        self.assertEqual(attraction_ids.tolist(), list("abcd"))
+        self.assertEqual(user_ids.tolist(), [1, 2, 3])
+        self.assertEqual(self.recommendations(1), ["c", "d"])
+
+    @patch("app.services.recommendations.PLAN_RECOMMENDER", "item")
+    def test_item_plans_use_live_interactions(self):
+        self.save_snapshot()
+        self.assertEqual(self.recommendations(1), ["c", "d"])
+
+        crud.like_attraction(db=self.db, user_id=1, attraction_id="c")
+
+        self.assertEqual(self.recommendations(1), ["d"])
+
+    @patch("app.services.recommendations.PLAN_RECOMMENDER", "als")
+    def test_factor_plans_use_live_interactions(self):
+        self.save_snapshot()
+        self.assertIn("c", self.recommendations(1))
+
+        crud.like_attraction(db=self.db, user_id=1, attraction_id="c")
+
+        self.assertNotIn("c", self.recommendations(1))
+        self.assertNotIn("a", self.recommendations(1))
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services import rescoring
+from app.services.rescoring import *
+
+
+@patch.object(rescoring.crud, "update_sentiment_metrics")
+@patch.object(rescoring.crud, "get_comments_after")
+@patch.object(rescoring, "_score_texts")
+class TestRescoreComments(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.watermark_file = os.path.join(self.directory.name, "watermark")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def comments(self, rows):
+        def get_comments_after(db, after_comment_id, limit):
+            return [row for row in rows if row[0] > after_comment_id][:limit]
+
+        return get_comments_after
+
+    def test_identical_texts_are_scored_once(
+        self, mock_score, mock_comments, mock_update
+    ):
+        mock_comments.side_effect = self.comments(
+            [(1, "Great!"), (2, "Great! "), (3, "Bad"), (4, None)]
+        )
+        mock_score.side_effect = lambda texts: [float(len(text)) for text in texts]
+
+        report = rescore_comments(
+            db=MagicMock(), workers=1, chunk_size=10, watermark_file=self.watermark_file
+        )
+
+        mock_score.assert_called_once_with(["Great!", "Bad"])
+        mock_update.assert_called_once_with(
+            db=unittest.mock.ANY,
+            scored_comments=[(1, "Great!", 6.0), (2, "Great! ", 6.0), (3, "Bad", 3.0)],
+        )
+        self.assertEqual(report["comments"], 4)
+        self.assertEqual(report["distinct_texts"], 2)
+
+    def test_rescoring_resumes_from_watermark(
+        self, mock_score, mock_comments, mock_update
+    ):
+        mock_comments.side_effect = self.comments([(1, "a"), (2, "b"), (3, "c")])
+        mock_score.side_effect = lambda texts: [0.0] * len(texts)
+        write_watermark(self.watermark_file, 2)
+
+        report = rescore_comments(
+            db=MagicMock(), workers=1, chunk_size=10, watermark_file=self.watermark_file
+        )
+
+        self.assertEqual(report["comments"], 1)
+        mock_score.assert_called_once_with(["c"])
+        self.assertFalse(os.path.exists(self.watermark_file))
+
+    def test_interrupted_rescoring_keeps_watermark(
+        self, mock_score, mock_comments, mock_update
+    ):
+        mock_comments.side_effect = self.comments([(1, "a"), (2, "b"), (3, "c")])
+        mock_score.side_effect = [[0.0], RuntimeError("boom")]
+
+        with self.assertRaises(RuntimeError):
+            rescore_comments(
+                db=MagicMock(),
+                workers=1,
+                chunk_size=1,
+                watermark_file=self.watermark_file,
+            )
+
+        self.assertEqual(read_watermark(self.watermark_file), 1)
+
+    @patch.object(rescoring, "ProcessPoolExecutor")
+    def test_chunks_without_texts_are_skipped(
+        self, mock_executor, mock_score, mock_comments, mock_update
+    ):
+        mock_comments.side_effect = self.comments([(1, None), (2, None), (3, "a")])
+        mock_executor.return_value.map.side_effect = map
+        mock_score.side_effect = lambda texts: [0.0] * len(texts)
+
+        report = rescore_comments(
+            db=MagicMock(),
+            workers=2,
+            chunk_size=2,
+            watermark_file=self.watermark_file,
+        )
+
+        mock_score.assert_called_once_with(["a"])
+        self.assertEqual(report["comments"], 3)
+
+    def test_restart_ignores_watermark(self, mock_score, mock_comments, mock_update):
+        mock_comments.side_effect = self.comments([(1, "a"), (2, "b")])
+        mock_score.side_effect = lambda texts: [0.0] * len(texts)
+        write_watermark(self.watermark_file, 2)
+
+        report = rescore_comments(
+            db=MagicMock(),
+            workers=1,
+            chunk_size=10,
+            watermark_file=self.watermark_file,
+            restart=True,
+        )
+
+        self.assertEqual(report["comments"], 2)
+
+
+class TestWatermark(unittest.TestCase):
+
+    def test_watermark_directory_is_created(self):
+        with tempfile.TemporaryDirectory() as directory:
+            watermark_file = os.path.join(directory, "data", "watermark")
+            write_watermark(watermark_file, 7)
+            self.assertEqual(read_watermark(watermark_file), 7)
+
+    def test_missing_watermark_starts_from_the_beginning(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(read_watermark(os.path.join(directory, "missing")), 0)
@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services import sentiment
+from app.services.sentiment import *
+from app.services.translations import TranslationCache
+
+
+class TestSentimentMetric(unittest.TestCase):
+
+    def test_positive(self):
+        self.assertEqual(sentiment_metric({"pos": 0.6, "neg": 0.1}), 0.6)
+
+    def test_negative(self):
+        self.assertEqual(sentiment_metric({"pos": 0.1, "neg": 0.4}), -0.4)
+
+    def test_neutral(self):
+        self.assertEqual(sentiment_metric({"pos": 0.2, "neg": 0.2}), 0)
+
+
+@patch.object(sentiment.nltk, "download")
+@patch.object(sentiment, "SentimentIntensityAnalyzer")
+class TestLoadAnalyzer(unittest.TestCase):
+
+    def test_local_lexicon_is_not_downloaded(self, mock_analyzer, mock_download):
+        self.assertIs(load_analyzer(), mock_analyzer.return_value)
+        mock_download.assert_not_called()
+
+    def test_missing_lexicon_is_downloaded(self, mock_analyzer, mock_download):
+        analyzer = MagicMock()
+        mock_analyzer.side_effect = [LookupError("vader_lexicon"), analyzer]
+
+        self.assertIs(load_analyzer(), analyzer)
+        mock_download.assert_called_once_with("vader_lexicon", quiet=True)
+
+
+@patch.object(sentiment, "GoogleTranslator")
+@patch.object(sentiment, "SentimentIntensityAnalyzer")
+class TestSentimentService(unittest.TestCase):
+
+    def test_score_batch(self, mock_analyzer, mock_translator):
+        mock_translator.return_value.translate_batch.side_effect = lambda texts: [
+            text.upper() for text in texts
+        ]
+        mock_analyzer.return_value.polarity_scores.side_effect = lambda text: (
+            {"pos": 0.5, "neg": 0.0}
+            if text == "MUY LINDO"
+            else {"pos": 0.0, "neg": 0.3}
+        )
+
+        service = SentimentService(TranslationCache(persistent=False))
+
+        self.assertEqual(service.score_batch(["muy lindo", "una estafa"]), [0.5, -0.3])
+        self.assertEqual(service.score("muy lindo"), 0.5)
+
+    def test_analyzer_and_translator_are_reused(self, mock_analyzer, mock_translator):
+        mock_translator.return_value.translate_batch.side_effect = lambda texts: texts
+        mock_analyzer.return_value.polarity_scores.return_value = {"pos": 0, "neg": 0}
+
+        service = SentimentService(TranslationCache(persistent=False))
+        for _ in range(3):
+            service.score("hermoso lugar")
+
+        mock_analyzer.assert_called_once()
+        mock_translator.assert_called_once()
+
+    def test_repeated_texts_are_translated_once(self, mock_analyzer, mock_translator):
+        mock_translator.return_value.translate_batch.side_effect = lambda texts: texts
+        mock_analyzer.return_value.polarity_scores.return_value = {"pos": 0, "neg": 0}
+
+        service = SentimentService(TranslationCache(persistent=False))
+        service.score_batch(["¡Vale la pena!", "¡Vale  la pena! "])
+        service.score("¡Vale la pena!")
+
+        mock_translator.return_value.translate_batch.assert_called_once_with(
+            ["¡Vale la pena!"]
+        )
+
+    def test_english_texts_are_not_translated(self, mock_analyzer, mock_translator):
+        mock_translator.return_value.translate_batch.side_effect = lambda texts: [
+            "Beautiful place" for _ in texts
+        ]
+        mock_analyzer.return_value.polarity_scores.side_effect = lambda text: (
+            {"pos": 0.5, "neg": 0.0} if "eautiful" in text else {"pos": 0, "neg": 0}
+        )
+
+        service = SentimentService(TranslationCache(persistent=False))
+
+        self.assertEqual(
+            service.score_batch(["Beautiful views from the top", "Hermoso lugar"]),
+            [0.5, 0.5],
+        )
+        mock_translator.return_value.translate_batch.assert_called_once_with(
+            ["Hermoso lugar"]
+        )
+        self.assertEqual(service.stats()["translation_bypassed"], 1)
+        self.assertEqual(service.stats()["bypass_rate"], 0.5)
+
+    def test_english_batch_does_not_use_translator(
+        self, mock_analyzer, mock_translator
+    ):
+        mock_analyzer.return_value.polarity_scores.return_value = {"pos": 0, "neg": 0}
+
+        service = SentimentService(TranslationCache(persistent=False))
+        service.score_batch(["Highly recommended for families"])
+
+        mock_translator.return_value.translate_batch.assert_not_called()
+
+    @patch.object(sentiment, "TranslationCache")
+    def test_service_is_created_once_per_process(
+        self, mock_cache, mock_analyzer, mock_translator
+    ):
+        with patch.object(sentiment, "_service", None):
+            self.assertIs(get_sentiment_service(), get_sentiment_service())
+
+        mock_analyzer.assert_called_once()
@@ -0,0 +1,47 @@
+import unittest
+
+from scipy import sparse
+
+from app.services.shards import *
+from app.services.similarity import blockwise_user_similarity
+
+
+def sum_rows(matrix, user_similarity, user_positions):
+    for user_position in user_positions:
+        yield int(user_position), float(
+            matrix[user_position].sum() + user_similarity[user_position].sum()
+        )
+
+
+class TestScoreInShards(unittest.TestCase):
+
+    def test_results_match_single_process(self):
+        matrix = sparse.random(50, 20, density=0.3, format="csr", random_state=0)
+        user_similarity = sparse.random(50, 50, density=0.3, format="csr", random_state=1)
+        user_positions = list(range(0, 50, 3))
+
+        expected = dict(sum_rows(matrix, user_similarity, user_positions))
+        result = dict(
+            score_in_shards(
+                sum_rows, matrix, user_similarity, user_positions, workers=2
+            )
+        )
+
+        self.assertEqual(result.keys(), expected.keys())
+        for user_position, value in expected.items():
+            self.assertAlmostEqual(result[user_position], value, places=4)
+
+    def test_blockwise_similarity_is_computed_in_workers(self):
+        matrix = sparse.random(50, 20, density=0.3, format="csr", random_state=0)
+        user_similarity = blockwise_user_similarity(matrix)
+        user_positions = list(range(0, 50, 3))
+
+        expected = dict(sum_rows(matrix, user_similarity, user_positions))
+        result = dict(
+            score_in_shards(
+                sum_rows, matrix, user_similarity, user_positions, workers=2
+            )
+        )
+
+        for user_position, value in expected.items():
+            self.assertAlmostEqual(result[user_position], value, places=4)
@@ -0,0 +1,164 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from scipy import sparse
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.services import similarity
+from app.services.similarity import *
+
+
+class TestExactUserSimilarity(unittest.TestCase):
+
+    def test_matches_cosine_similarity(self):
+        matrix = sparse.random(20, 10, density=0.4, format="csr", random_state=0)
+        result = exact_user_similarity(matrix)
+        np.testing.assert_allclose(
+            result.toarray(), cosine_similarity(matrix), atol=1e-6
+        )
+
+
+class TestBlockwiseUserSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = sparse.random(20, 10, density=0.4, format="csr", random_state=0)
+
+    def test_blocks_match_cosine_similarity(self):
+        result = blockwise_user_similarity(self.matrix)
+        expected = cosine_similarity(self.matrix)
+
+        self.assertEqual(result.shape, (20, 20))
+        np.testing.assert_allclose(
+            result[[3, 7, 1]].toarray(), expected[[3, 7, 1]], atol=1e-6
+        )
+
+    def test_blocks_are_float32(self):
+        result = blockwise_user_similarity(self.matrix)
+        self.assertEqual(result[[0]].dtype, np.float32)
+
+    def test_iter_blocks_respects_memory_budget(self):
+        result = blockwise_user_similarity(self.matrix)
+
+        # 8 bytes por columna y 20 columnas: 1 MB alcanza para todas las filas
+        with patch.object(similarity, "RECOMMENDATIONS_MEMORY_BUDGET_MB", 1):
+            self.assertEqual(len(list(iter_blocks(result))), 1)
+
+        with patch.object(similarity, "block_size", return_value=6):
+            blocks = list(iter_blocks(result))
+
+        self.assertEqual([start for start, _ in blocks], [0, 6, 12, 18])
+        self.assertEqual([block.shape[0] for _, block in blocks], [6, 6, 6, 2])
+
+
+class TestBlockSize(unittest.TestCase):
+
+    def test_block_size(self):
+        with patch.object(similarity, "RECOMMENDATIONS_MEMORY_BUDGET_MB", 1):
+            self.assertEqual(block_size(1024), 1024)
+            self.assertEqual(block_size(4 * 1024 * 1024), 1)
+
+
+class TestLshUserSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = sparse.random(
+            200, 50, density=0.2, format="csr", random_state=0, dtype=np.float32
+        )
+
+    def test_values_are_exact_cosine(self):
+        result = lsh_user_similarity(self.matrix).tocoo()
+        exact = cosine_similarity(self.matrix)
+        np.testing.assert_allclose(result.data, exact[result.row, result.col], atol=1e-5)
+
+    def test_identical_users_are_always_neighbours(self):
+        matrix = sparse.vstack([self.matrix, self.matrix[0]]).tocsr()
+        result = lsh_user_similarity(matrix)
+        self.assertAlmostEqual(result[0, 200], 1.0, places=5)
+
+    def test_users_without_interactions_have_no_neighbours(self):
+        matrix = sparse.vstack(
+            [self.matrix, sparse.csr_matrix((1, 50), dtype=np.float32)]
+        ).tocsr()
+        result = lsh_user_similarity(matrix)
+        self.assertEqual(result.getrow(200).nnz, 0)
+
+    def test_self_similarity_is_one(self):
+        result = lsh_user_similarity(self.matrix)
+        active = np.flatnonzero(np.diff(self.matrix.indptr))
+        np.testing.assert_allclose(result.diagonal()[active], 1.0)
+
+    def test_planes_grow_with_users(self):
+        self.assertEqual(lsh_planes(10, bucket_size=64), 0)
+        self.assertEqual(lsh_planes(4096, bucket_size=64), 6)
+        self.assertEqual(lsh_planes(100000, bucket_size=64), 11)
+
+    def test_candidates_are_subquadratic(self):
+        n_users = 4000
+        matrix = sparse.random(
+            n_users, 50, density=0.2, format="csr", random_state=0, dtype=np.float32
+        )
+        result = lsh_user_similarity(matrix, n_tables=4, n_neighbours=10)
+
+        # A lo sumo n_neighbours candidatos y el propio usuario por fila
+        self.assertLessEqual(np.diff(result.indptr).max(), 11)
+        self.assertLessEqual(result.nnz, n_users * 11)
+
+    def test_large_buckets_are_split(self):
+        # Sin hiperplanos todos los usuarios caen en el mismo grupo
+        result = lsh_user_similarity(
+            self.matrix, n_planes=0, n_tables=1, max_bucket_size=20
+        )
+        self.assertLessEqual(np.diff(result.indptr).max(), 20)
+
+
+class TestGetUserSimilarity(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_user_similarity(sparse.csr_matrix((2, 2)), backend="unknown")
+
+
+class TestSimilarityReport(unittest.TestCase):
+
+    def test_full_recall_when_every_pair_is_a_candidate(self):
+        matrix = sparse.random(30, 10, density=0.5, format="csr", random_state=0)
+        report = similarity_report(matrix, k=5, n_planes=0, n_tables=1)
+        self.assertEqual(report["recall"], 1.0)
+
+
+class TestItemSimilarity(unittest.TestCase):
+
+    def test_matches_cosine_similarity_of_columns(self):
+        matrix = sparse.random(20, 10, density=0.4, format="csr", random_state=0)
+        np.testing.assert_allclose(
+            item_similarity(matrix)[np.arange(10)].toarray(),
+            cosine_similarity(matrix.T),
+            atol=1e-6,
+        )
+
+
+class TestNeighboursMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.similarity = sparse.csr_matrix(
+            np.array(
+                [
+                    [1.0, 0.2, 0.9, 0.5],
+                    [0.2, 1.0, 0.0, 0.7],
+                    [0.9, 0.0, 1.0, 0.1],
+                    [0.5, 0.7, 0.1, 1.0],
+                ]
+            )
+        )
+
+    def test_keeps_top_k_without_self(self):
+        result = neighbours_matrix(self.similarity, k=2).toarray()
+        np.testing.assert_allclose(
+            result[0], np.array([0.0, 0.0, 0.9, 0.5], dtype=np.float32)
+        )
+        self.assertEqual(np.count_nonzero(result, axis=1).tolist(), [2, 2, 2, 2])
+
+    def test_keeps_all_neighbours_without_k(self):
+        result = neighbours_matrix(self.similarity, k=None)
+        self.assertEqual(np.diff(result.indptr).tolist(), [3, 2, 2, 3])
@@ -0,0 +1,122 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+from app.services.snapshot import *
+
+
+def make_snapshot(base):
+    matrix = sparse.csr_matrix(
+        np.array([[1.0, 0.0, 2.0], [0.0, 0.0, 3.0]], dtype=np.float32)
+    )
+    user_ids = np.array([3, 7])
+    attraction_ids = np.array(["a", "b", "c"], dtype=object)
+    return save_snapshot(matrix, user_ids, attraction_ids, base=base)
+
+
+class TestSaveAndLoadCsr(unittest.TestCase):
+
+    def test_roundtrip(self):
+        matrix = sparse.csr_matrix(
+            np.array([[1.0, 0.0, 2.0], [0.0, 0.0, 3.0]], dtype=np.float32)
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            save_csr(directory, "matrix", matrix)
+            loaded = load_csr(directory, "matrix", matrix.shape)
+
+            self.assertEqual(loaded.toarray().tolist(), matrix.toarray().tolist())
+            self.assertFalse(loaded.data.flags.owndata)
+            self.assertFalse(loaded.data.flags.writeable)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_load_without_snapshot(self):
+        with tempfile.TemporaryDirectory() as base:
+            self.assertIsNone(load_snapshot(base=base))
+
+    def test_roundtrip(self):
+        with tempfile.TemporaryDirectory() as base:
+            make_snapshot(base)
+            snapshot = load_snapshot(base=base)
+
+            self.assertEqual(snapshot.matrix.toarray().tolist(), [[1, 0, 2], [0, 0, 3]])
+            self.assertEqual(snapshot.attraction_ids.tolist(), ["a", "b", "c"])
+            self.assertIsNone(snapshot.item_neighbours)
+            self.assertIsNone(snapshot.user_factors)
+
+    def test_roundtrip_with_neighbours(self):
+        matrix = sparse.csr_matrix(np.eye(3, dtype=np.float32))
+        item_neighbours = sparse.csr_matrix(np.ones((3, 3), dtype=np.float32))
+
+        with tempfile.TemporaryDirectory() as base:
+            save_snapshot(
+                matrix[:2],
+                np.array([1, 2]),
+                np.array(["a", "b", "c"]),
+                item_neighbours=item_neighbours,
+                factors=(np.ones((2, 4), np.float32), np.ones((3, 4), np.float32)),
+                base=base,
+            )
+            snapshot = load_snapshot(base=base)
+
+            self.assertEqual(snapshot.user_factors.shape, (2, 4))
+            self.assertEqual(snapshot.item_factors.dtype, np.float32)
+
+            self.assertEqual(snapshot.item_neighbours.shape, (3, 3))
+            self.assertIsInstance(snapshot.user_ids, np.memmap)
+
+    def test_user_position(self):
+        with tempfile.TemporaryDirectory() as base:
+            make_snapshot(base)
+            snapshot = load_snapshot(base=base)
+
+            self.assertEqual(snapshot.user_position(7), 1)
+            self.assertIsNone(snapshot.user_position(5))
+            self.assertIsNone(snapshot.user_position(10))
+
+    def test_attraction_positions(self):
+        with tempfile.TemporaryDirectory() as base:
+            make_snapshot(base)
+            snapshot = load_snapshot(base=base)
+
+            self.assertEqual(snapshot.attraction_positions(["c", "x", "a"]), [2, None, 0])
+
+    def test_row_norms(self):
+        with tempfile.TemporaryDirectory() as base:
+            make_snapshot(base)
+            snapshot = load_snapshot(base=base)
+
+            np.testing.assert_allclose(snapshot.row_norms(), [np.sqrt(5), 3.0])
+
+    def test_stale_snapshot_is_not_used(self):
+        with tempfile.TemporaryDirectory() as base:
+            make_snapshot(base)
+
+            self.assertIsNotNone(
+                load_snapshot(max_age=datetime.timedelta(hours=1), base=base)
+            )
+            self.assertIsNone(load_snapshot(max_age=datetime.timedelta(0), base=base))
+
+    def test_new_snapshot_replaces_current(self):
+        with tempfile.TemporaryDirectory() as base:
+            first = make_snapshot(base)
+            self.assertEqual(load_snapshot(base=base).directory, first)
+
+            second = make_snapshot(base)
+            self.assertEqual(load_snapshot(base=base).directory, second)
+
+    def test_old_snapshots_are_removed(self):
+        with tempfile.TemporaryDirectory() as base:
+            directories = [make_snapshot(base) for _ in range(SNAPSHOT_KEEP + 2)]
+
+            remaining = sorted(
+                os.path.join(base, name)
+                for name in os.listdir(base)
+                if name.startswith("snapshot-")
+            )
+            self.assertEqual(remaining, directories[-SNAPSHOT_KEEP:])
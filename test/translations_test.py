@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.exc import OperationalError
+
+from app.services import translations
+from app.services.translations import *
+
+
+def upper(texts):
+    return [text.upper() for text in texts]
+
+
+class TestTextHash(unittest.TestCase):
+
+    def test_whitespace_is_normalized(self):
+        self.assertEqual(text_hash(" Muy  bueno\n"), text_hash("Muy bueno"))
+
+    def test_case_is_kept(self):
+        self.assertNotEqual(text_hash("GREAT"), text_hash("great"))
+
+
+class TestTranslationCache(unittest.TestCase):
+
+    def test_memory_tier(self):
+        translate = MagicMock(side_effect=upper)
+        cache = TranslationCache(persistent=False)
+
+        self.assertEqual(cache.translate_batch(["hola", "chau"], translate), ["HOLA", "CHAU"])
+        self.assertEqual(cache.translate_batch(["hola", "bien"], translate), ["HOLA", "BIEN"])
+
+        self.assertEqual(translate.call_args_list[1].args[0], ["bien"])
+        self.assertEqual(cache.stats()["memory_hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 3)
+        self.assertEqual(cache.stats()["hit_rate"], 0.25)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        translate = MagicMock(side_effect=upper)
+        cache = TranslationCache(size=2, persistent=False)
+
+        cache.translate_batch(["a", "b"], translate)
+        cache.translate_batch(["a"], translate)
+        cache.translate_batch(["c"], translate)
+        cache.translate_batch(["a", "b"], translate)
+
+        self.assertEqual(translate.call_args_list[-1].args[0], ["b"])
+        self.assertEqual(cache.stats()["memory_entries"], 2)
+
+    @patch.object(translations, "get_db_session")
+    @patch.object(translations.crud, "add_translations")
+    @patch.object(translations.crud, "get_translations")
+    def test_database_tier(self, mock_get, mock_add, mock_session):
+        mock_get.return_value = {text_hash("hola"): "hello"}
+        translate = MagicMock(side_effect=upper)
+        cache = TranslationCache()
+
+        result = cache.translate_batch(["hola", "chau"], translate)
+
+        self.assertEqual(result, ["hello", "CHAU"])
+        translate.assert_called_once_with(["chau"])
+        mock_add.assert_called_once()
+        self.assertEqual(
+            mock_add.call_args.kwargs["translations"], {text_hash("chau"): "CHAU"}
+        )
+        self.assertEqual(cache.stats()["database_hits"], 1)
+
+        # La traducción leída de la base queda también en memoria
+        cache.translate_batch(["hola"], translate)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch.object(translations, "get_db_session")
+    @patch.object(translations.crud, "add_translations")
+    @patch.object(translations.crud, "get_translations")
+    def test_database_errors_fall_back_to_translator(
+        self, mock_get, mock_add, mock_session
+    ):
+        mock_get.side_effect = OperationalError("select", {}, Exception())
+        mock_add.side_effect = OperationalError("insert", {}, Exception())
+
+        cache = TranslationCache()
+
+        self.assertEqual(cache.translate_batch(["hola"], upper), ["HOLA"])